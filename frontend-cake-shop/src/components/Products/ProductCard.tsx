@@ -125,7 +125,7 @@ const ProductCard: React.FC<ProductCardProps> = ({ cake, onWishlistChange }) =>
           {/* نمایش امتیاز */}
           <RatingStars rating={cake.rating} />
         </div>
-        <p className="text-text-secondary text-sm mb-3 flex-grow">{cake.description ?? ''}</p>
+        <p className="text-text-secondary text-sm mb-3 flex-grow">{cake.short_description ?? cake.description ?? ''}</p>
         <div className="flex justify-between items-center mt-auto">
           {/* نمایش قیمت */}
           <span className="font-bold text-primary">{formattedPrice} تومان</span> {/* فرمت فارسی قیمت */}
@@ -106,21 +106,13 @@ const getPaymentStatusDisplayInfo = (
   return { text: 'نامشخص', className: 'bg-gray-100 text-gray-700 dark:bg-gray-700/30 dark:text-gray-400' };
 };
 
+// صفحه‌بندی لیست سفارش‌ها cursor-based است (بدون COUNT و OFFSET در بک‌اند)؛
+// پس فقط صفحه قبلی/بعدی و تعداد تقریبی صفحات نمایش داده می‌شود
 const PaginationControls: React.FC<PaginationControlsProps> = ({ currentPage, totalPages, onPageChange, hasNextPage, hasPrevPage }) => {
-  const pageNumbers = useMemo(() => {
-    const pages = [];
-    const startPage = Math.max(1, currentPage - 2);
-    const endPage = Math.min(totalPages, currentPage + 2);
-    for (let i = startPage; i <= endPage; i++) {
-      pages.push(i);
-    }
-    return pages;
-  }, [currentPage, totalPages]);
-
-  if (totalPages <= 1) return null;
+  if (!hasNextPage && !hasPrevPage) return null;
 
   return (
-    <div className="flex space-x-1 space-x-reverse">
+    <div className="flex items-center space-x-1 space-x-reverse">
       <button
         onClick={() => onPageChange(currentPage - 1)}
         disabled={!hasPrevPage}
@@ -128,27 +120,10 @@ const PaginationControls: React.FC<PaginationControlsProps> = ({ currentPage, to
       >
         <FontAwesomeIcon icon={faChevronRight} />
       </button>
-      {pageNumbers[0] > 1 && (
-        <>
-          <button onClick={() => onPageChange(1)} className="px-3 py-1 border border-gray-300 dark:border-slate-600 rounded text-gray-600 dark:text-gray-300 hover:bg-gray-100 dark:hover:bg-slate-700">1</button>
-          {pageNumbers[0] > 2 && <span className="px-3 py-1 text-gray-600 dark:text-gray-300">...</span>}
-        </>
-      )}
-      {pageNumbers.map(number => (
-        <button
-          key={number}
-          onClick={() => onPageChange(number)}
-          className={`px-3 py-1 border rounded ${currentPage === number ? 'border-amber-500 bg-amber-500 text-white' : 'border-gray-300 dark:border-slate-600 text-gray-600 dark:text-gray-300 hover:bg-gray-100 dark:hover:bg-slate-700'}`}
-        >
-          {number.toLocaleString('fa-IR')}
-        </button>
-      ))}
-      {pageNumbers[pageNumbers.length - 1] < totalPages && (
-        <>
-          {pageNumbers[pageNumbers.length - 1] < totalPages - 1 && <span className="px-3 py-1 text-gray-600 dark:text-gray-300">...</span>}
-          <button onClick={() => onPageChange(totalPages)} className="px-3 py-1 border border-gray-300 dark:border-slate-600 rounded text-gray-600 dark:text-gray-300 hover:bg-gray-100 dark:hover:bg-slate-700">{totalPages.toLocaleString('fa-IR')}</button>
-        </>
-      )}
+      <span className="px-3 py-1 text-sm text-gray-600 dark:text-gray-300">
+        صفحه {currentPage.toLocaleString('fa-IR')}
+        {totalPages > 1 && <> از حدود {totalPages.toLocaleString('fa-IR')}</>}
+      </span>
       <button
         onClick={() => onPageChange(currentPage + 1)}
         disabled={!hasNextPage}
@@ -160,12 +135,23 @@ const PaginationControls: React.FC<PaginationControlsProps> = ({ currentPage, to
   );
 };
 
+// مقدار پارامتر cursor از لینک next/previous پاسخ API
+const cursorFromUrl = (url: string | null): string | null => {
+  if (!url) return null;
+  try {
+    return new URL(url).searchParams.get('cursor');
+  } catch {
+    return null;
+  }
+};
+
 const AdminOrderListPage: React.FC = () => {
   const [orders, setOrders] = useState<Order[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
   const [currentPage, setCurrentPage] = useState(1);
+  const [cursor, setCursor] = useState<string | null>(null); // null یعنی صفحه اول
   const [itemsPerPage, setItemsPerPage] = useState(10);
   const [totalOrdersCount, setTotalOrdersCount] = useState(0);
   const [nextPageUrl, setNextPageUrl] = useState<string | null>(null);
@@ -232,7 +218,7 @@ const AdminOrderListPage: React.FC = () => {
     // نمایش پیام موفقیت به کاربر
     alert(response.detail || `${response.deleted_count || idsToDelete.length} سفارش با موفقیت حذف (نرم) شدند.`);
 
-    fetchOrders(currentPage); // بارگذاری مجدد لیست سفارشات (سفارشات حذف شده نباید نمایش داده شوند)
+    fetchOrders(cursor); // بارگذاری مجدد لیست سفارشات (سفارشات حذف شده نباید نمایش داده شوند)
     handleClearSelection();   // پاک کردن آیتم‌های انتخاب شده
     handleCloseDeleteConfirmModal(); // بستن مودال تایید حذف
 
@@ -312,7 +298,7 @@ const AdminOrderListPage: React.FC = () => {
       // نمایش پیام موفقیت به کاربر (می‌توانید از یک سیستم notification بهتر استفاده کنید)
       alert(response.detail || `${response.updated_count || idsToUpdate.length} سفارش با موفقیت به‌روز شد.`);
 
-      fetchOrders(currentPage); // بارگذاری مجدد لیست سفارشات برای نمایش تغییرات
+      fetchOrders(cursor); // بارگذاری مجدد لیست سفارشات برای نمایش تغییرات
       handleClearSelection();   // پاک کردن آیتم‌های انتخاب شده
       handleCloseChangeStatusModal(); // بستن مودال
 
@@ -390,7 +376,7 @@ const AdminOrderListPage: React.FC = () => {
       return newSelectedIds;
     });
   };
-  const fetchOrders = useCallback(async (pageToFetch: number) => {
+  const fetchOrders = useCallback(async (cursorToFetch: string | null) => {
     if (!accessToken) {
       setError("برای دسترسی به این بخش، لطفا وارد شوید.");
       setLoading(false);
@@ -401,7 +387,8 @@ const AdminOrderListPage: React.FC = () => {
 
     const params: GetAdminOrdersParams = {
       limit: itemsPerPage,
-      offset: (pageToFetch - 1) * itemsPerPage,
+      cursor: cursorToFetch || undefined,
+      with_count: 'approx', // تعداد تقریبی کل سفارش‌ها (بدون COUNT(*) در بک‌اند)
       ordering: '-created_at',
       search: searchTerm || undefined,         // خواندن از state
       status: selectedStatus || undefined,     // خواندن از state
@@ -414,14 +401,14 @@ const AdminOrderListPage: React.FC = () => {
       }
     });
 
-    console.log(`Workspaceing orders for admin - Page: ${pageToFetch}, Params:`, params);
+    console.log(`Workspaceing orders for admin - Cursor: ${cursorToFetch}, Params:`, params);
 
     try {
       const data = await getAdminOrders(accessToken, params);
       if (data && typeof data === 'object' && 'results' in data) {
         const paginatedData = data as PaginatedResponse<Order>;
         setOrders(paginatedData.results);
-        setTotalOrdersCount(paginatedData.count);
+        setTotalOrdersCount(paginatedData.approximate_count ?? paginatedData.count ?? 0);
         setNextPageUrl(paginatedData.next);
         setPrevPageUrl(paginatedData.previous);
       } else {
@@ -438,11 +425,16 @@ const AdminOrderListPage: React.FC = () => {
   }, [accessToken, itemsPerPage, searchTerm, selectedStatus, selectedDateOption]); // وابستگی‌ها اضافه شد
 
   useEffect(() => {
-    fetchOrders(currentPage);
-  }, [currentPage, fetchOrders]); // fetchOrders خودش شامل وابستگی‌های فیلتر است
+    fetchOrders(cursor);
+  }, [cursor, fetchOrders]); // fetchOrders خودش شامل وابستگی‌های فیلتر است
 
   const handlePageChange = (newPage: number) => {
-    if (newPage > 0 && newPage <= totalPages) {
+    // با cursor فقط به صفحه قبلی یا بعدی می‌توان رفت
+    if (newPage === currentPage + 1 && nextPageUrl) {
+      setCursor(cursorFromUrl(nextPageUrl));
+      setCurrentPage(newPage);
+    } else if (newPage === currentPage - 1 && prevPageUrl) {
+      setCursor(newPage === 1 ? null : cursorFromUrl(prevPageUrl));
       setCurrentPage(newPage);
     }
   };
@@ -561,6 +553,7 @@ const AdminOrderListPage: React.FC = () => {
 
   const handleFilterOrSearch = useCallback(() => {
     setCurrentPage(1); // فقط صفحه را به ۱ برگردان
+    setCursor(null);
   }, []);
 
   const totalPages = Math.ceil(totalOrdersCount / itemsPerPage);
@@ -653,7 +646,7 @@ const AdminOrderListPage: React.FC = () => {
   }, [accessToken]); // فقط با تغییر توکن (معمولاً یکبار پس از لاگین) فراخوانی شود
 
   const firstItemNum = totalOrdersCount > 0 ? (currentPage - 1) * itemsPerPage + 1 : 0;
-  const lastItemNum = Math.min(currentPage * itemsPerPage, totalOrdersCount);
+  const lastItemNum = totalOrdersCount > 0 ? (currentPage - 1) * itemsPerPage + orders.length : 0;
 
 
   return (
@@ -864,7 +857,7 @@ const AdminOrderListPage: React.FC = () => {
             <FontAwesomeIcon icon={faShoppingBag} className="text-5xl text-gray-300 dark:text-gray-600 mb-4" />
             <h3 className="text-lg font-medium text-gray-700 dark:text-gray-300">هیچ سفارشی یافت نشد</h3>
             <p className="text-gray-500 dark:text-gray-400 mt-1">با تغییر فیلترها دوباره امتحان کنید.</p>
-            <button onClick={() => fetchOrders(1)} className="mt-4 bg-amber-500 text-white px-4 py-2 rounded-lg hover:bg-amber-600 transition flex items-center mx-auto">
+            <button onClick={() => fetchOrders(cursor)} className="mt-4 bg-amber-500 text-white px-4 py-2 rounded-lg hover:bg-amber-600 transition flex items-center mx-auto">
               <FontAwesomeIcon icon={faRedo} className="ml-2" />
               <span>بارگذاری مجدد</span>
             </button>
@@ -983,7 +976,7 @@ const AdminOrderListPage: React.FC = () => {
             <div className="p-4 border-t border-gray-200 dark:border-slate-700 flex flex-col md:flex-row md:items-center md:justify-between">
               <div className="mb-4 md:mb-0">
                 <p className="text-sm text-gray-600 dark:text-gray-400">
-                  نمایش {firstItemNum.toLocaleString('fa-IR')} تا {lastItemNum.toLocaleString('fa-IR')} از {totalOrdersCount.toLocaleString('fa-IR')} سفارش
+                  نمایش {firstItemNum.toLocaleString('fa-IR')} تا {lastItemNum.toLocaleString('fa-IR')} از حدود {totalOrdersCount.toLocaleString('fa-IR')} سفارش
                 </p>
               </div>
               <PaginationControls
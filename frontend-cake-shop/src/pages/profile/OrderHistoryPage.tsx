@@ -24,7 +24,7 @@ const OrderHistoryPage: React.FC = () => {
       setLoading(true);
       setError(null);
       try {
-        const params = { page, page_size: PAGE_SIZE };
+        const params = { page, limit: PAGE_SIZE };
         const data = await getUserOrders(accessToken,params );
         
         const ordersData = data && Array.isArray(data.results) ? data.results : Array.isArray(data) ? data : [];
@@ -180,6 +180,46 @@ export const getAdminOrderDetail = async (accessToken: string, orderId: string |
   }
 };
 
+/** وضعیت یک کار ساخت PDF در صف بک‌اند (RenderJob) */
+interface RenderJobStatus {
+  id: number;
+  status: 'QUEUED' | 'RUNNING' | 'DONE' | 'FAILED';
+  error: string;
+  status_url: string;
+  download_url: string | null;
+}
+
+/**
+ * PDF ها در بک‌اند در صف ساخته می‌شوند؛ این تابع وضعیت کار را تا آماده شدن دنبال می‌کند
+ * و سپس فایل نهایی را به صورت Blob دانلود می‌کند.
+ */
+const waitForRenderJobBlob = async (
+  accessToken: string,
+  job: RenderJobStatus,
+  intervalMs = 1500,
+  timeoutMs = 5 * 60 * 1000
+): Promise<Blob> => {
+  const headers = { Authorization: `Bearer ${accessToken}` };
+  const startedAt = Date.now();
+  let current = job;
+  while (current.status !== 'DONE') {
+    if (current.status === 'FAILED') {
+      throw new Error('ساخت فایل PDF در سرور ناموفق بود.');
+    }
+    if (Date.now() - startedAt > timeoutMs) {
+      throw new Error('ساخت فایل PDF بیش از حد طول کشید. لطفاً کمی بعد دوباره تلاش کنید.');
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    const statusResponse = await apiClient.get<RenderJobStatus>(`/admin/orders/render-jobs/${current.id}/`, { headers });
+    current = statusResponse.data;
+  }
+  const fileResponse = await apiClient.get(`/admin/orders/render-jobs/${current.id}/download/`, {
+    headers,
+    responseType: 'blob',
+  });
+  return fileResponse.data;
+};
+
 /**
  * فایل PDF لیست سفارشات ادمین را از سرور دانلود می‌کند.
  * @param accessToken توکن دسترسی ادمین
@@ -194,13 +234,13 @@ export const downloadAdminOrdersPDF = async (
   try {
     // اندپوینت export-pdf (مطابق با url_path در AdminOrderViewSet بک‌اند)
     // مطمئن شوید این URL دقیقاً با چیزی که در urls.py بک‌اند تعریف کرده‌اید، مطابقت دارد.
-    const response = await apiClient.get('/admin/orders/export-pdf/', { // <--- آدرس API برای PDF
+    // این درخواست فقط کار ساخت PDF را در صف قرار می‌دهد (پاسخ 202 با شناسه کار)
+    const response = await apiClient.get<RenderJobStatus>('/admin/orders/list/export-pdf/', { // <--- آدرس API برای PDF
       headers: { Authorization: `Bearer ${accessToken}` },
       params: params, // ارسال پارامترهای فیلتر فعلی
-      responseType: 'blob', // بسیار مهم: به کلاینت HTTP می‌گوید که پاسخ یک فایل باینری (Blob) است
     });
-    console.log("API Response: downloadAdminOrdersPDF successful. Content-Type:", response.headers['content-type']);
-    return response.data; // response.data در اینجا یک Blob خواهد بود
+    console.log("API Response: downloadAdminOrdersPDF job queued:", response.data.id, response.data.status);
+    return await waitForRenderJobBlob(accessToken, response.data); // Blob فایل PDF
   } catch (error: any) {
     console.error('API Error: downloadAdminOrdersPDF failed. Full error object:', error);
     if (error.response) {
@@ -344,7 +384,9 @@ export const getCategories = async (): Promise<Category[]> => {
 
 /**
  * لیست محصولات (کیک‌ها) را از API دریافت می‌کند.
- * @param params - یک آبجکت اختیاری برای پارامترهای کوئری (مانند limit, category_id).
+ * پاسخ لیست فقط داده کارت محصول را دارد (CakeListSerializer)؛ فیلدهای بیشتر با
+ * expand (مثلاً expand: 'images,size_variants') و انتخاب فیلدها با fields (مثلاً fields: 'id,name,slug').
+ * @param params - یک آبجکت اختیاری برای پارامترهای کوئری (مانند limit, category_id, fields, expand).
  * @returns {Promise<any>} - پاسخ API (می‌توانید any را با تایپ دقیق‌تر جایگزین کنید)
  */
 export const getProducts = async (params?: { [key: string]: any }): Promise<any> => {
@@ -1646,9 +1688,10 @@ export const getAdminDashboardStats = async (accessToken: string): Promise<Admin
 export const getProductReviews = async (cakeSlug: string): Promise<Review[]> => {
   console.log(`API Call: getProductReviews for slug ${cakeSlug}`);
   try {
-    const response = await apiClient.get<Review[]>(`/products/cakes/${cakeSlug}/reviews/`);
+    // پاسخ cursor-paginated است ({ next, previous, results })؛ صفحه اول (جدیدترین نظرات) را برمی‌گردانیم
+    const response = await apiClient.get<PaginatedResponse<Review> | Review[]>(`/products/cakes/${cakeSlug}/reviews/`);
     console.log("API Response: getProductReviews successful:", response.data);
-    return response.data; // یا response.data.results اگر Pagination دارید
+    return Array.isArray(response.data) ? response.data : response.data.results;
   } catch (error: any) {
     console.error(`API Error: getProductReviews for ${cakeSlug} failed:`, error.response?.data || error.message);
     throw error;
@@ -1780,7 +1823,10 @@ export const getAdminSalesChartData = async (
 export interface BulkUpdateStatusResponse {
   detail: string;
   updated_count?: number;
-  failed_ids?: number[]; // اگر بک‌اند شما ID های ناموفق را برمی‌گرداند
+  updated_ids?: number[];
+  unchanged_ids?: number[]; // سفارش‌هایی که از قبل در همین وضعیت بودند
+  not_found_ids?: number[];
+  results?: { id: number; outcome: 'updated' | 'unchanged' | 'not_found' }[];
 }
 
 /**
@@ -1972,11 +2018,17 @@ export const downloadAdminOrderInvoicePDF = async (
   const url = `admin/orders/list/${orderId}/generate-invoice-pdf/`;
   console.log(`API Call: downloadAdminOrderInvoicePDF for Order ID: ${orderId}`);
   try {
+    // اگر فاکتور در کش سرور باشد مستقیماً PDF (200) برمی‌گردد؛
+    // در غیر این صورت کار ساخت آن در صف ثبت می‌شود (202) و تا آماده شدن دنبال می‌شود
     const response = await apiClient.get(url, {
       headers: { Authorization: `Bearer ${accessToken}` },
       responseType: 'blob',
     });
-    return response.data;
+    if (response.status === 200 && String(response.headers['content-type']).includes('application/pdf')) {
+      return response.data;
+    }
+    const job: RenderJobStatus = JSON.parse(await response.data.text());
+    return await waitForRenderJobBlob(accessToken, job);
   } catch (error: any) {
     // ... (مدیریت خطای مشابه توابع دانلود دیگر) ...
     console.error(`API Error: downloadAdminOrderInvoicePDF for Order ID ${orderId} failed:`, error);
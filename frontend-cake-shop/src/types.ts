@@ -57,6 +57,7 @@ export interface PaginatedResponse<T> {
   next: string | null;   // URL کامل برای درخواست صفحه بعدی، یا null اگر صفحه آخر است.
   previous: string | null; // URL کامل برای درخواست صفحه قبلی، یا null اگر صفحه اول است.
   results: T[];          // آرایه‌ای از آیتم‌های صفحه فعلی.
+  approximate_count?: number; // در صفحه‌بندی cursor (بدون count) با ?with_count=approx
 }
 // اینترفیس پایه برای محصول
 export interface Product {
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres', # lookup های trigram_similar و جستجوی متنی (products/search.py)
     'django_extensions',
 
     # Third-party apps
@@ -105,6 +106,21 @@ DATABASES = {
             }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMemCache برای هر پردازه (هر worker gunicorn) جداست و بین پردازه‌ها مشترک نیست:
+# - آمار داشبورد ادمین (orders/dashboard.py) و باطل شدن آن بعد از commit فقط در همان پردازه دیده می‌شود؛
+#   پردازه‌های دیگر حداکثر DASHBOARD_STATS_FRESH_SECONDS (به علاوه یک بازسازی پس‌زمینه) داده قدیمی نشان می‌دهند؛
+# - کلید پاسخ‌های کش شده کاتالوگ از نسخه داخل دیتابیس (products.CatalogVersion) ساخته می‌شود،
+#   پس آن پاسخ‌ها در همه پردازه‌ها با تغییر داده عوض می‌شوند (فقط هر پردازه کش خودش را پر می‌کند).
+# برای کش مشترک، یک backend مشترک (مثل django.core.cache.backends.redis.RedisCache) اینجا تنظیم کنید.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -245,4 +261,11 @@ else:
     ZARINPAL_VERIFY_URL = "https://api.zarinpal.com/pg/v4/payment/verify.json"
     ZARINPAL_STARTPAY_URL = "https://www.zarinpal.com/pg/StartPay/"
 
+# برای تست بدون اینترنت با فرمان run_http_stub (مثلاً http://127.0.0.1:8089)
+ZARINPAL_API_BASE_URL = os.environ.get('ZARINPAL_API_BASE_URL')
+if ZARINPAL_API_BASE_URL:
+    ZARINPAL_REQUEST_URL = f"{ZARINPAL_API_BASE_URL.rstrip('/')}/pg/v4/payment/request.json"
+    ZARINPAL_VERIFY_URL = f"{ZARINPAL_API_BASE_URL.rstrip('/')}/pg/v4/payment/verify.json"
+    ZARINPAL_STARTPAY_URL = f"{ZARINPAL_API_BASE_URL.rstrip('/')}/pg/StartPay/"
+
 SITE_NAME = "BAKEJOY"
\ No newline at end of file
@@ -3,7 +3,7 @@
 from django.contrib import admin
 # مدل‌هایی که در orders/models.py تعریف کردید رو ایمپورت کنید
 from .models import Order, OrderItem, CustomDesign, OrderAddon, Transaction, Notification
-from .models import SMSTemplate, Notification
+from .models import SMSTemplate, Notification, RenderJob, DailySalesRollup
 # ثبت ساده مدل‌ها برای نمایش اولیه در پنل ادمین
 admin.site.register(Order)
 admin.site.register(OrderItem)
@@ -40,10 +40,10 @@ class SMSTemplateAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'order_link', 'type', 'status', 'sent_at', 'created_at')
+    list_display = ('user', 'order_link', 'type', 'status', 'attempts', 'sent_at', 'created_at')
     list_filter = ('type', 'status', 'created_at', 'sent_at')
     search_fields = ('user__username', 'user__email', 'message', 'order__id')
-    readonly_fields = ('created_at', 'sent_at') # این فیلدها خودکار مقداردهی می‌شوند
+    readonly_fields = ('created_at', 'sent_at', 'attempts') # این فیلدها خودکار مقداردهی می‌شوند
 
     def order_link(self, obj):
         from django.urls import reverse
@@ -54,4 +54,17 @@ class NotificationAdmin(admin.ModelAdmin):
             link = reverse(f"admin:{obj.order._meta.app_label}_{obj.order._meta.model_name}_change", args=[obj.order.pk])
             return format_html('<a href="{}">Order #{}</a>', link, obj.order.id)
         return "-"
-    order_link.short_description = "Related Order"
\ No newline at end of file
+    order_link.short_description = "Related Order"
+@admin.register(RenderJob)
+class RenderJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'requested_by', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'created_at')
+    readonly_fields = ('params', 'params_hash', 'created_at', 'started_at', 'finished_at', 'error')
+
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    # فقط برای مشاهده؛ مقادیر توسط سیگنال‌ها و فرمان rebuild_sales_rollups نوشته می‌شوند
+    list_display = ('date', 'order_count', 'total_sales', 'updated_at')
+    date_hierarchy = 'date'
+    readonly_fields = ('date', 'order_count', 'total_sales', 'updated_at')
@@ -9,6 +9,7 @@ from .views import ( # اطمینان از اینکه views از همین اپل
     SalesDataAPIView,
     AdminSmsStatsView,
     SmsCreditBalanceView,
+    RenderJobViewSet,
 )
 from products.views import TopSellingProductsView
 
@@ -17,6 +18,7 @@ router = DefaultRouter()
 router.register(r'list', AdminOrderViewSet, basename='admin-order')
 router.register(r'sms-templates', SMSTemplateViewSet, basename='admin-sms-template')
 router.register(r'sms-logs', NotificationLogViewSet, basename='admin-sms-log') # یا 'notification-logs'
+router.register(r'render-jobs', RenderJobViewSet, basename='admin-render-job') # کارهای ساخت PDF
 
 urlpatterns = [
     path('sms-stats/', AdminSmsStatsView.as_view(), name='admin-sms-stats'),
@@ -0,0 +1,125 @@
+# orders/cart_service.py
+from collections import namedtuple
+
+from django.db import connection, transaction
+
+from .models import Order, OrderItem
+
+
+# نتیجه افزودن به سبد: ردیف به‌روز شده، اینکه ردیف جدید ساخته شد یا نه، و قیمت کل فعلی سبد
+CartLineResult = namedtuple('CartLineResult', ['item', 'created', 'cart_total'])
+
+
+def get_or_create_cart(user):
+    """سبد خرید فعال (سفارش با وضعیت CART) کاربر را برمی‌گرداند یا می‌سازد."""
+    cart, _ = Order.objects.get_or_create(user=user, status=Order.OrderStatusChoices.CART)
+    return cart
+
+
+def add_cart_line(cart, product, quantity, flavor=None, size_variant=None, notes=None):
+    """
+    یک محصول (کیک یا لوازم جشن) را به سبد اضافه می‌کند؛ اگر ردیفی با همان محصول،
+    طعم و اندازه وجود داشت فقط تعداد آن زیاد می‌شود.
+
+    روی PostgreSQL (نسخه ۱۵ به بالا) کل عملیات، یعنی درج/افزایش تعداد ردیف و
+    اعمال تفاضل به total_price سفارش، یک کوئری INSERT ... ON CONFLICT است؛
+    روی سایر دیتابیس‌ها همین کار در یک تراکنش با قفل روی سبد انجام می‌شود.
+    """
+    line = OrderItem(
+        order=cart,
+        content_object=product,
+        flavor=flavor,
+        size_variant=size_variant,
+        quantity=quantity,
+        notes=notes,
+    )
+    # قیمت روز محصول؛ برای ردیف موجود هم قیمت کل ردیف با همین قیمت به‌روز می‌شود (مثل OrderItem.save)
+    line.price_at_order = line.calculate_price()
+
+    if connection.vendor == 'postgresql' and connection.features.supports_nulls_distinct_unique_constraints:
+        return _upsert_line_postgresql(cart, line)
+    return _upsert_line_locked(cart, line)
+
+
+_UPSERT_SQL = """
+WITH line AS (
+    INSERT INTO {item_table} AS item
+        (order_id, content_type_id, object_id, flavor_id, size_variant_id, quantity, price_at_order, notes)
+    VALUES (%(order_id)s, %(content_type_id)s, %(object_id)s, %(flavor_id)s, %(size_variant_id)s,
+            %(quantity)s, %(price)s, %(notes)s)
+    ON CONFLICT ON CONSTRAINT unique_order_item_line DO UPDATE
+        SET quantity = item.quantity + EXCLUDED.quantity,
+            price_at_order = EXCLUDED.price_at_order
+    RETURNING item.id, item.quantity, item.notes, (item.xmax = 0) AS created,
+        -- زیرکوئری نسخه قبل از این دستور را می‌بیند؛ برای ردیف تازه NULL است
+        (SELECT previous.price_at_order FROM {item_table} AS previous WHERE previous.id = item.id) AS previous_price
+),
+bump AS (
+    UPDATE {order_table} AS cart
+    SET total_price = cart.total_price
+        + line.quantity * %(price)s
+        - (line.quantity - %(quantity)s) * COALESCE(line.previous_price, %(price)s)
+    FROM line
+    WHERE cart.id = %(order_id)s
+    RETURNING cart.total_price
+)
+SELECT line.id, line.quantity, line.notes, line.created, bump.total_price
+FROM line, bump
+"""
+
+
+def _upsert_line_postgresql(cart, line):
+    sql = _UPSERT_SQL.format(
+        item_table=connection.ops.quote_name(OrderItem._meta.db_table),
+        order_table=connection.ops.quote_name(Order._meta.db_table),
+    )
+    params = {
+        'order_id': cart.pk,
+        'content_type_id': line.content_type_id,
+        'object_id': line.object_id,
+        'flavor_id': line.flavor_id,
+        'size_variant_id': line.size_variant_id,
+        'quantity': line.quantity,
+        'price': line.price_at_order,
+        'notes': line.notes,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        item_id, total_quantity, notes, created, cart_total = cursor.fetchone()
+
+    line.pk = item_id
+    line.quantity = total_quantity
+    line.notes = notes
+    line._state.adding = False
+    line._state.db = connection.alias
+    line._loaded_line = (cart.pk, total_quantity, line.price_at_order)
+    cart.total_price = cart_total
+    return CartLineResult(line, created, cart_total)
+
+
+def _upsert_line_locked(cart, line):
+    with transaction.atomic():
+        # قفل روی ردیف سبد، درخواست‌های هم‌زمان (مثلاً دابل‌کلیک) را پشت سر هم اجرا می‌کند
+        Order.all_objects.select_for_update().filter(pk=cart.pk).values_list('pk').first()
+        existing = OrderItem.objects.select_for_update().filter(
+            order=cart,
+            content_type=line.content_type,
+            object_id=line.object_id,
+            flavor=line.flavor,
+            size_variant=line.size_variant,
+        ).first()
+
+        if existing is None:
+            line.save()
+            item, created = line, True
+        else:
+            existing.content_object = line.content_object
+            existing.quantity += line.quantity
+            existing.save(update_fields=['quantity'])
+            item, created = existing, False
+
+        cart_total = Order.all_objects.filter(pk=cart.pk).values_list('total_price', flat=True).get()
+
+    cart.total_price = cart_total
+    return CartLineResult(item, created, cart_total)
+
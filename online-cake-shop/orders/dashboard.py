@@ -0,0 +1,122 @@
+# orders/dashboard.py
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from products.models import Cake
+from .date_presets import THIS_MONTH, TODAY, preset_range
+from .models import Order
+
+DASHBOARD_CACHE_KEY = 'admin_dashboard_stats'
+DASHBOARD_REFRESH_LOCK_KEY = 'admin_dashboard_stats:refreshing'
+DASHBOARD_INVALIDATED_AT_KEY = 'admin_dashboard_stats:invalidated_at'
+# تا این مدت داده کش شده تازه است و مستقیماً برگردانده می‌شود
+FRESH_FOR = getattr(settings, 'DASHBOARD_STATS_FRESH_SECONDS', 30)
+# بعد از آن تا این مدت داده کهنه برگردانده می‌شود و هم‌زمان یک بار در پس‌زمینه بازسازی می‌شود
+STALE_FOR = getattr(settings, 'DASHBOARD_STATS_STALE_SECONDS', 300)
+
+# وضعیت هایی که نشانه درآمد قطعی هستند
+REVENUE_STATUSES = [Order.OrderStatusChoices.DELIVERED, Order.OrderStatusChoices.PROCESSING]
+
+
+def compute_dashboard_stats(now=None):
+    """
+    آمار داشبورد ادمین را محاسبه می‌کند: همه شمارش‌ها و جمع‌های سفارش در یک کوئری
+    (Count/Sum با filter)، به علاوه یک COUNT برای کاربران و یکی برای محصولات فعال.
+    بازه‌های زمانی به صورت [شروع، پایان) روی created_at هستند تا ایندکس آن استفاده شود
+    (برخلاف created_at__date).
+    """
+    today = timezone.localdate(now) if now else None
+    today_start, tomorrow_start = preset_range(TODAY, today)
+    current_month_start, _ = preset_range(THIS_MONTH, today)
+
+    statuses = Order.OrderStatusChoices
+    not_cart = ~Q(status=statuses.CART)
+    created_today = Q(created_at__gte=today_start, created_at__lt=tomorrow_start)
+    revenue = Q(status__in=REVENUE_STATUSES)
+
+    order_stats = Order.objects.aggregate(
+        todays_orders_count=Count('id', filter=created_today & not_cart),
+        delivered_orders_count=Count('id', filter=Q(status=statuses.DELIVERED)),
+        cancelled_orders_count=Count('id', filter=Q(status=statuses.CANCELLED)),
+        pending_orders_count=Count('id', filter=Q(status=statuses.PENDING_PAYMENT)),
+        processing_orders_count=Count('id', filter=Q(status=statuses.PROCESSING)),
+        total_orders_count=Count('id', filter=not_cart),
+        total_revenue_month=Sum(
+            'total_price', filter=revenue & Q(created_at__gte=current_month_start, created_at__lt=tomorrow_start)
+        ),
+        today_revenue=Sum('total_price', filter=revenue & created_today),
+    )
+    order_stats['total_revenue_month'] = order_stats['total_revenue_month'] or 0
+    order_stats['today_revenue'] = order_stats['today_revenue'] or 0
+
+    return {
+        **order_stats,
+        'total_users_count': get_user_model().objects.count(),
+        'active_products_count': Cake.objects.filter(is_active=True).count(),
+    }
+
+
+def _store(data, started_at):
+    """
+    آمار محاسبه شده را کش می‌کند، مگر اینکه بعد از شروع محاسبه (started_at) کش باطل شده باشد؛
+    در آن صورت محاسبه ممکن است داده قبل از commit را دیده باشد و کش نمی‌شود.
+    """
+    invalidated_at = cache.get(DASHBOARD_INVALIDATED_AT_KEY)
+    if invalidated_at is None or invalidated_at < started_at:
+        cache.set(DASHBOARD_CACHE_KEY, {'data': data, 'computed_at': started_at}, FRESH_FOR + STALE_FOR)
+    return data
+
+
+def _compute_and_store():
+    started_at = time.time()
+    return _store(compute_dashboard_stats(), started_at)
+
+
+def _refresh_in_background():
+    def run():
+        try:
+            _compute_and_store()
+        except Exception as e:
+            print(f"CRITICAL: Dashboard stats refresh failed: {e}")
+        finally:
+            cache.delete(DASHBOARD_REFRESH_LOCK_KEY)
+            connection.close()
+
+    threading.Thread(target=run, name='dashboard-stats-refresh', daemon=True).start()
+
+
+def get_dashboard_stats():
+    """
+    آمار داشبورد با کش stale-while-revalidate:
+    - داده تازه (کمتر از FRESH_FOR ثانیه) مستقیماً برگردانده می‌شود؛
+    - داده کهنه برگردانده می‌شود و فقط یک درخواست (با قفل cache.add) بازسازی را شروع می‌کند؛
+    - اگر چیزی در کش نباشد (یا باطل شده باشد) همین‌جا محاسبه می‌شود.
+    """
+    entry = cache.get(DASHBOARD_CACHE_KEY)
+    if entry is None:
+        return _compute_and_store()
+    if time.time() - entry['computed_at'] >= FRESH_FOR and cache.add(DASHBOARD_REFRESH_LOCK_KEY, 1, 60):
+        _refresh_in_background()
+    return entry['data']
+
+
+def invalidate_dashboard_stats():
+    """
+    بعد از تغییر وضعیت سفارش‌ها صدا زده می‌شود تا درخواست بعدی آمار تازه ببیند.
+    با کش پیش‌فرض (LocMemCache، جدا برای هر پردازه) فقط همین پردازه فوراً آمار تازه می‌بیند و
+    پردازه‌های دیگر حداکثر FRESH_FOR ثانیه (به علاوه یک بازسازی پس‌زمینه) بعد (نگاه کنید به CACHES در settings).
+    پاک کردن کش بعد از commit تراکنش انجام می‌شود، وگرنه درخواست هم‌زمان
+    داده قبل از commit را دوباره کش می‌کرد؛ بازسازی پس‌زمینه‌ای که قبل از آن شروع شده هم نتیجه‌اش را کش نمی‌کند.
+    """
+    def invalidate():
+        cache.set(DASHBOARD_INVALIDATED_AT_KEY, time.time(), FRESH_FOR + STALE_FOR)
+        cache.delete(DASHBOARD_CACHE_KEY)
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,72 @@
+# orders/date_presets.py
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+import jdatetime
+from django.utils import timezone
+
+# بازه‌های آماده تاریخ که در لیست سفارش‌ها (?date_filter=)، داشبورد، نمودار فروش و خروجی‌ها استفاده می‌شوند
+TODAY = 'today'
+LAST_7_DAYS = 'last_7_days'
+THIS_MONTH = 'this_month' # ماه میلادی جاری
+THIS_SHAMSI_MONTH = 'this_shamsi_month'
+LAST_SHAMSI_MONTH = 'last_shamsi_month'
+THIS_SHAMSI_YEAR = 'this_shamsi_year'
+
+PRESET_NAMES = (TODAY, LAST_7_DAYS, THIS_MONTH, THIS_SHAMSI_MONTH, LAST_SHAMSI_MONTH, THIS_SHAMSI_YEAR)
+
+
+def local_midnight(day):
+    """ابتدای روز day به وقت محلی (TIME_ZONE) به صورت datetime آگاه از منطقه زمانی."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def jalali_month_bounds(year, month):
+    """(اولین روز، اولین روز ماه بعد) یک ماه شمسی به تاریخ میلادی."""
+    first = jdatetime.date(year, month, 1)
+    next_first = jdatetime.date(year + 1, 1, 1) if month == 12 else jdatetime.date(year, month + 1, 1)
+    return first.togregorian(), next_first.togregorian()
+
+
+@lru_cache(maxsize=64)
+def _preset_days(name, today):
+    """(روز شروع، روز بعد از پایان) یک بازه آماده؛ برای هر روز فقط یک بار محاسبه می‌شود."""
+    if name == TODAY:
+        return today, today + timedelta(days=1)
+    if name == LAST_7_DAYS:
+        return today - timedelta(days=6), today + timedelta(days=1) # شامل امروز
+    if name == THIS_MONTH:
+        first = today.replace(day=1)
+        return first, (first + timedelta(days=32)).replace(day=1)
+
+    jtoday = jdatetime.date.fromgregorian(date=today)
+    if name == THIS_SHAMSI_MONTH:
+        return jalali_month_bounds(jtoday.year, jtoday.month)
+    if name == LAST_SHAMSI_MONTH:
+        if jtoday.month == 1:
+            return jalali_month_bounds(jtoday.year - 1, 12)
+        return jalali_month_bounds(jtoday.year, jtoday.month - 1)
+    if name == THIS_SHAMSI_YEAR:
+        return jdatetime.date(jtoday.year, 1, 1).togregorian(), jdatetime.date(jtoday.year + 1, 1, 1).togregorian()
+    raise ValueError(f"Unknown date preset: {name}. Allowed: {', '.join(PRESET_NAMES)}")
+
+
+def preset_dates(name, today=None):
+    """بازه آماده به صورت (روز شروع، روز پایان) هر دو شامل؛ برای جدول‌هایی که کلیدشان تاریخ است."""
+    start, end = _preset_days(name, today or timezone.localdate())
+    return start, end - timedelta(days=1)
+
+
+def preset_range(name, today=None):
+    """
+    بازه آماده به صورت [شروع، پایان) با datetime های آگاه از منطقه زمانی،
+    تا فیلتر روی خود ستون created_at (و ایندکس آن) انجام شود نه created_at__date.
+    """
+    start, end = _preset_days(name, today or timezone.localdate())
+    return local_midnight(start), local_midnight(end)
+
+
+def filter_by_preset(queryset, name, field='created_at'):
+    """queryset را به بازه آماده محدود می‌کند؛ برای نام ناشناخته ValueError می‌دهد."""
+    start, end = preset_range(name)
+    return queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end})
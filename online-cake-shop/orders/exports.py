@@ -0,0 +1,102 @@
+# orders/exports.py
+import csv
+import zlib
+
+from .models import Order
+
+
+class _Echo:
+    """pseudo-buffer برای csv.writer: به جای نوشتن در حافظه، خود رشته را برمی‌گرداند."""
+
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    return '' if value is None else value
+
+
+_STATUS_LABELS = dict(Order.OrderStatusChoices.choices)
+
+# ستون‌های قابل انتخاب در خروجی CSV سفارش‌ها (به ترتیب پیش‌فرض)
+# کلید: (عنوان ستون، فیلدهای values_list، تابع تبدیل مقادیر به مقدار سلول)
+ORDER_CSV_COLUMNS = {
+    'id': ('ID سفارش', ('id',), _plain),
+    'username': ('نام کاربری مشتری', ('user__username',), lambda v: v or 'N/A'),
+    'email': ('ایمیل مشتری', ('user__email',), lambda v: v or 'N/A'),
+    'first_name': ('نام مشتری', ('user__first_name',), _plain),
+    'last_name': ('نام خانوادگی مشتری', ('user__last_name',), _plain),
+    'status': ('وضعیت سفارش', ('status',), lambda v: _STATUS_LABELS.get(v, v)), # لیبل فارسی وضعیت
+    'total_price': ('مبلغ کل (تومان)', ('total_price',), _plain),
+    'created_date': ('تاریخ ایجاد', ('created_at',), lambda v: v.strftime('%Y-%m-%d') if v else ''),
+    'created_time': ('زمان ایجاد', ('created_at',), lambda v: v.strftime('%H:%M:%S') if v else ''),
+    'address': ('آدرس کامل', ('address__street',), _plain),
+    'city': (
+        'شهر', ('address__city__name', 'address__city__province__name'),
+        lambda city, province: f"{city} ({province})" if city else '',
+    ),
+    'postal_code': ('کد پستی', ('address__postal_code',), _plain),
+    'notes': ('یادداشت‌های سفارش', ('notes',), _plain),
+    'tracking_code': ('کد رهگیری پستی', ('tracking_code',), _plain),
+}
+
+
+def parse_columns(raw):
+    """
+    مقدار ?columns=id,status,... را به لیست کلید ستون‌ها تبدیل می‌کند.
+    خالی یعنی همه ستون‌ها؛ برای ستون ناشناخته ValueError می‌دهد.
+    """
+    if not raw:
+        return list(ORDER_CSV_COLUMNS)
+    columns = [part.strip() for part in raw.split(',') if part.strip()]
+    unknown = [column for column in columns if column not in ORDER_CSV_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}. Allowed: {', '.join(ORDER_CSV_COLUMNS)}")
+    return columns
+
+
+def iter_orders_csv(queryset, columns, chunk_size=2000):
+    """
+    سطرهای CSV سفارش‌ها را به صورت رشته (به ترتیب: BOM، هدر، داده‌ها) تولید می‌کند.
+    فقط فیلدهای ستون‌های انتخاب شده با values_list و iterator خوانده می‌شوند
+    تا مصرف حافظه مستقل از تعداد سفارش‌ها ثابت بماند.
+    """
+    # هر فیلد فقط یک بار در values_list می‌آید (مثلاً created_at برای تاریخ و زمان)
+    value_fields = []
+    for column in columns:
+        for field in ORDER_CSV_COLUMNS[column][1]:
+            if field not in value_fields:
+                value_fields.append(field)
+    positions = [
+        [value_fields.index(field) for field in ORDER_CSV_COLUMNS[column][1]]
+        for column in columns
+    ]
+    formatters = [ORDER_CSV_COLUMNS[column][2] for column in columns]
+
+    writer = csv.writer(_Echo())
+    yield '\ufeff' # BOM برای نمایش صحیح فارسی در Excel
+    yield writer.writerow([ORDER_CSV_COLUMNS[column][0] for column in columns])
+
+    # prefetch های لیست سفارش‌ها (آیتم‌ها، تراکنش‌ها و ...) در خروجی CSV لازم نیستند
+    rows = queryset.prefetch_related(None).values_list(*value_fields).iterator(chunk_size=chunk_size)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([
+            formatter(*(row[index] for index in indexes))
+            for formatter, indexes in zip(formatters, positions)
+        ]))
+        if len(buffer) >= 500:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def gzip_stream(chunks, level=6):
+    """رشته‌های تولید شده را به صورت جریانی با gzip فشرده می‌کند."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits=31 یعنی قالب gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,132 @@
+# orders/http_client.py
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# timeout اتصال کوتاه است (کمی بیشتر از مضرب ۳ ثانیه برای retransmit اول TCP)؛ timeout خواندن برای پاسخ کند درگاه
+CONNECT_TIMEOUT = getattr(settings, 'OUTBOUND_HTTP_CONNECT_TIMEOUT', 3.05)
+READ_TIMEOUT = getattr(settings, 'OUTBOUND_HTTP_READ_TIMEOUT', 15)
+# حداکثر اتصال keep-alive نگه داشته شده برای هر host (برابر یا بیشتر از thread های هم‌زمان)
+POOL_MAXSIZE = getattr(settings, 'OUTBOUND_HTTP_POOL_MAXSIZE', 10)
+# تعداد host هایی که pool آن‌ها نگه داشته می‌شود (sms.ir، زرین‌پال و ...)
+POOL_HOSTS = 8
+
+_session = None
+_session_lock = threading.Lock()
+
+_stats = defaultdict(lambda: {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+_stats_lock = threading.Lock()
+
+
+def build_retry_policy():
+    """
+    سیاست تلاش دوباره:
+    - خطای اتصال برای همه متدها (درخواست هنوز به سرور نرسیده، پس POST هم امن است)؛
+    - خطای خواندن و پاسخ‌های 429/502/503/504 فقط برای GET/HEAD (POST ارسال پیامک یا
+      درخواست پرداخت دوباره فرستاده نمی‌شود تا پیامک/تراکنش تکراری ساخته نشود).
+    """
+    return Retry(
+        total=3,
+        connect=2,
+        read=1,
+        status=2,
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        status_forcelist=(429, 502, 503, 504),
+        backoff_factor=0.3,
+        respect_retry_after_header=True,
+        raise_on_status=False, # آخرین پاسخ برگردانده می‌شود و فراخوان raise_for_status را صدا می‌زند
+    )
+
+
+def get_session():
+    """Session مشترک پردازه با pool اتصال برای هر host (thread-safe؛ بعد از fork از نو ساخته می‌شود)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=build_retry_policy()
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def _reset_session_after_fork():
+    # اتصال‌های باز پردازه والد نباید در پردازه فرزند (worker های gunicorn/spawn) استفاده شوند
+    global _session
+    _session = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_session_after_fork)
+
+
+def _record(host, elapsed_ms, failed):
+    with _stats_lock:
+        stats = _stats[host]
+        stats['calls'] += 1
+        stats['errors'] += int(failed)
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+
+def latency_stats():
+    """آمار تأخیر درخواست‌های این پردازه به تفکیک host: {host: {calls, errors, avg_ms, max_ms}}."""
+    with _stats_lock:
+        return {
+            host: {
+                'calls': stats['calls'],
+                'errors': stats['errors'],
+                'avg_ms': round(stats['total_ms'] / stats['calls'], 1) if stats['calls'] else 0.0,
+                'max_ms': round(stats['max_ms'], 1),
+            }
+            for host, stats in _stats.items()
+        }
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    مثل requests.request ولی با Session مشترک (keep-alive)، timeout های پیش‌فرض و ثبت تأخیر.
+    timeout: None (پیش‌فرض‌ها)، یک عدد (timeout خواندن) یا تاپل (اتصال، خواندن).
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    elif isinstance(timeout, (int, float)):
+        timeout = (CONNECT_TIMEOUT, timeout)
+
+    parts = urlsplit(url)
+    started = time.perf_counter()
+    response = None
+    try:
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+        return response
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        failed = response is None or response.status_code >= 500
+        _record(parts.netloc, elapsed_ms, failed)
+        result = response.status_code if response is not None else 'ERROR'
+        print(f"HTTP {method} {parts.netloc}{parts.path} -> {result} in {elapsed_ms:.0f}ms")
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+async def arequest(method, url, **kwargs):
+    """نسخه async برای کد asyncio؛ درخواست در thread pool پیش‌فرض و با همان Session/pool اجرا می‌شود."""
+    return await asyncio.to_thread(request, method, url, **kwargs)
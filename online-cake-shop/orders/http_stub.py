@@ -0,0 +1,129 @@
+# orders/http_stub.py
+import itertools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+_message_ids = itertools.count(1)
+
+
+def sms_ir_send_response(request_body):
+    """پاسخ موفق send/bulk و send/likeToLike با یک شناسه پیام برای هر شماره (به همان ترتیب mobiles)."""
+    mobiles = (request_body or {}).get('mobiles') or []
+    return {
+        'status': 1, 'message': 'موفق',
+        'data': {
+            'packId': str(uuid.uuid4()),
+            'messageIds': [next(_message_ids) for _ in mobiles],
+            'cost': float(len(mobiles)),
+        },
+    }
+
+
+def default_routes():
+    """
+    پاسخ‌های آماده موفق sms.ir و زرین‌پال: {(متد، مسیر): (status, body)}.
+    body می‌تواند تابعی از بدنه درخواست باشد.
+    """
+    return {
+        ('POST', '/v1/send/bulk'): (200, sms_ir_send_response),
+        ('POST', '/v1/send/likeToLike'): (200, sms_ir_send_response),
+        ('GET', '/v1/credit'): (200, {'status': 1, 'message': 'موفق', 'data': 1000.0}),
+        ('POST', '/pg/v4/payment/request.json'): (200, {
+            'data': {'code': 100, 'message': 'Success', 'authority': 'A' + '0' * 35, 'fee_type': 'Merchant', 'fee': 0},
+            'errors': [],
+        }),
+        ('POST', '/pg/v4/payment/verify.json'): (200, {
+            'data': {'code': 100, 'message': 'Verified', 'card_pan': '502229******5995', 'ref_id': 201, 'fee': 0},
+            'errors': [],
+        }),
+    }
+
+
+class StubHTTPServer:
+    """
+    سرور HTTP محلی (keep-alive، HTTP/1.1) با پاسخ‌های آماده sms.ir و زرین‌پال،
+    برای اجرای کد پرداخت و پیامک بدون اینترنت:
+
+        with StubHTTPServer() as stub:
+            settings.SMS_IR_API_BASE_URL = stub.url('/v1/')
+            stub.respond('POST', '/v1/send/bulk', status=503, body={}, delay=2)  # شبیه‌سازی کندی/خطا
+            ...
+            stub.calls  # [(method, path, body, connection_id), ...]
+
+    connection_id در calls نشان می‌دهد کدام درخواست‌ها روی یک اتصال TCP (keep-alive) آمده‌اند.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.routes = default_routes()
+        self.delays = {}
+        self.calls = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = raw.decode(errors='replace')
+                path = self.path.split('?', 1)[0]
+                key = (self.command, path)
+                stub.calls.append((self.command, path, body, id(self.connection)))
+
+                time.sleep(stub.delays.get(key, 0))
+                status, payload = stub.routes.get(key, (404, {'detail': 'Not stubbed'}))
+                if callable(payload):
+                    payload = payload(body)
+                content = json.dumps(payload, ensure_ascii=False).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json; charset=utf-8')
+                    self.send_header('Content-Length', str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # کلاینت زودتر (مثلاً با timeout) اتصال را بسته است
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, path=''):
+        return f'{self.base_url}{path}'
+
+    def respond(self, method, path, status=200, body=None, delay=0):
+        """پاسخ (و تأخیر) یک مسیر را عوض می‌کند؛ body یک dict یا تابعی از بدنه درخواست است."""
+        self.routes[(method, path)] = (status, body if body is not None else {})
+        self.delays[(method, path)] = delay
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='http-stub', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
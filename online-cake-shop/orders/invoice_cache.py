@@ -0,0 +1,130 @@
+# orders/invoice_cache.py
+import hashlib
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Order
+from .prefetch import GenericProductPrefetcher
+
+# فاکتورها در MEDIA_ROOT/invoices/<order_id>/<sha256 html>.pdf ذخیره می‌شوند؛
+# هر تغییری در محتوای فاکتور هش و در نتیجه فایل را عوض می‌کند
+INVOICE_CACHE_DIR = 'invoices'
+
+# اطلاعات فروشگاه که در قالب فاکتور نمایش داده می‌شود
+INVOICE_SHOP_CONTEXT = {
+    'shop_name': 'BAKEJÖY', # مثال
+    'shop_address': 'تهران، خیابان شیرینی، پلاک ۱۰', # مثال
+    'shop_phone': '۰۲۱-۱۲۳۴۵۶۷۸', # مثال
+}
+
+
+def load_invoice_order(order_id):
+    """سفارش را با همه داده‌هایی که قالب فاکتور لازم دارد (بدون N+1) بارگذاری می‌کند."""
+    return Order.all_objects.select_related('user', 'address__city__province').prefetch_related(
+        GenericProductPrefetcher().items_prefetch()
+    ).get(pk=order_id)
+
+
+def render_invoice_html(order):
+    """
+    HTML فاکتور و هش sha256 آن را برمی‌گرداند.
+    تاریخ صدور از آخرین تغییر سفارش گرفته می‌شود (نه زمان فعلی) تا HTML یک سفارش
+    تغییر نکرده همیشه یکسان و قابل کش باشد.
+    """
+    context = {'order': order, 'invoice_date': order.updated_at, **INVOICE_SHOP_CONTEXT}
+    html_string = render_to_string('orders/admin_order_invoice_pdf.html', context)
+    return html_string, hashlib.sha256(html_string.encode('utf-8')).hexdigest()
+
+
+def invoice_cache_path(order_id, content_hash):
+    return posixpath.join(INVOICE_CACHE_DIR, str(order_id), f'{content_hash}.pdf')
+
+
+def cached_invoice_path(order_id, content_hash):
+    path = invoice_cache_path(order_id, content_hash)
+    return path if default_storage.exists(path) else None
+
+
+def store_invoice_pdf(order_id, content_hash, pdf_bytes):
+    path = invoice_cache_path(order_id, content_hash)
+    if not default_storage.exists(path):
+        # نام فایل از محتوا ساخته شده، پس storage نباید آن را تغییر دهد
+        path = default_storage.save(path, ContentFile(pdf_bytes))
+    # update (نه save) تا updated_at سفارش و در نتیجه محتوای فاکتور عوض نشود
+    Order.all_objects.filter(pk=order_id, invoice_cached=False).update(invoice_cached=True)
+    return path
+
+
+def invalidate_invoice_cache(order_id):
+    """همه PDF های کش شده فاکتور یک سفارش را حذف می‌کند و تعداد آن‌ها را برمی‌گرداند."""
+    directory = posixpath.join(INVOICE_CACHE_DIR, str(order_id))
+    try:
+        _, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotADirectoryError):
+        return 0
+    for name in files:
+        default_storage.delete(posixpath.join(directory, name))
+    return len(files)
+
+
+def invalidate_invoice_cache_on_commit(orders):
+    """
+    بعد از commit تراکنش، فایل‌های کش فاکتور سفارش‌های orders (یک QuerySet از Order) را پاک می‌کند.
+    فقط سفارش‌هایی که invoice_cached دارند به storage دست می‌زنند؛ برای بقیه فقط یک SELECT
+    (بدون ردیف) بعد از commit اجرا می‌شود و ذخیره آیتم‌ها در خود تراکنش هیچ کوئری یا listdir اضافه‌ای ندارد.
+    """
+    def invalidate():
+        order_ids = list(orders.filter(invoice_cached=True).values_list('pk', flat=True))
+        if not order_ids:
+            return
+        Order.all_objects.filter(pk__in=order_ids).update(invoice_cached=False)
+        for order_id in order_ids:
+            invalidate_invoice_cache(order_id)
+
+    transaction.on_commit(invalidate)
+
+
+def invoice_file_response(request, path, filename):
+    """
+    فایل کش شده را با ETag (همان هش محتوا) و Last-Modified برمی‌گرداند
+    و برای If-None-Match / If-Modified-Since معتبر پاسخ 304 می‌دهد.
+    """
+    etag = quote_etag(posixpath.splitext(posixpath.basename(path))[0])
+    last_modified = int(default_storage.get_modified_time(path).timestamp())
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+    response = FileResponse(default_storage.open(path, 'rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
+
+
+def prewarm_invoice(order_id):
+    """
+    اگر PDF فاکتور فعلی سفارش در کش نیست، ساخت آن را در صف RenderJob قرار می‌دهد
+    (هنگام رفتن سفارش به DELIVERED صدا زده می‌شود).
+    """
+    from .models import RenderJob
+    from .render_jobs import enqueue_render_job
+
+    order = load_invoice_order(order_id)
+    _, content_hash = render_invoice_html(order)
+    if cached_invoice_path(order.id, content_hash):
+        return None
+    params = {
+        'order_id': order.id,
+        'content_hash': content_hash,
+        'base_url': getattr(settings, 'INVOICE_BASE_URL', None),
+    }
+    job, _ = enqueue_render_job(RenderJob.KindChoices.INVOICE_PDF, params)
+    return job
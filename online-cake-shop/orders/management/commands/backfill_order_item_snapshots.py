@@ -0,0 +1,47 @@
+# orders/management/commands/backfill_order_item_snapshots.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = "فیلدهای snapshot محصول را برای آیتم‌های سفارش‌های ثبت شده قبلی (غیر از سبد خرید) از روی محصول فعلی پر می‌کند."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="فقط تعداد آیتم‌های بدون snapshot را گزارش بده.")
+        parser.add_argument('--batch-size', type=int, default=500, help="تعداد آیتم در هر دسته.")
+        parser.add_argument(
+            '--include-carts', action='store_true',
+            help="آیتم‌های سبد خرید را هم snapshot کن (معمولاً لازم نیست؛ هنگام checkout پر می‌شوند).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+
+        pending = OrderItem.objects.filter(snapshot_taken_at__isnull=True)
+        if not options['include_carts']:
+            pending = pending.exclude(order__status=Order.OrderStatusChoices.CART)
+
+        pending_ids = list(pending.order_by('pk').values_list('pk', flat=True))
+        if not pending_ids:
+            self.stdout.write(self.style.SUCCESS("All order items already have a product snapshot."))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(pending_ids)} order item(s) have no product snapshot (dry run, nothing saved)."))
+            return
+
+        frozen = 0
+        for start in range(0, len(pending_ids), batch_size):
+            batch = pending_ids[start:start + batch_size]
+            items = OrderItem.with_snapshot_sources(
+                # شرط snapshot_taken_at دوباره چک می‌شود تا snapshot ثبت شده در checkout هم‌زمان بازنویسی نشود
+                OrderItem.objects.filter(pk__in=batch, snapshot_taken_at__isnull=True)
+            )
+            with transaction.atomic():
+                frozen += OrderItem.freeze_snapshots(items, batch_size=batch_size)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"Processed {min(start + batch_size, len(pending_ids))}/{len(pending_ids)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Froze product snapshot for {frozen} order item(s)."))
@@ -0,0 +1,68 @@
+# orders/management/commands/benchmark_sms_render.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.sms_templates import SMS_PLACEHOLDERS, CompiledSMSTemplate, unknown_placeholders
+
+DEFAULT_TEMPLATE = (
+    "{{customer_name}} عزیز، سفارش {{order_id}} به مبلغ {{order_total}} تومان در {{store_name}} "
+    "ثبت شد. کد رهگیری: {{tracking_number}}"
+)
+
+
+def replace_render(message_template, context):
+    """روش قبلی (یک str.replace برای هر متغیر)، فقط برای مقایسه."""
+    message = message_template
+    for key, value in context.items():
+        message = message.replace(f"{{{{{key}}}}}", value)
+    return message
+
+
+class Command(BaseCommand):
+    help = (
+        "زمان ساخت متن پیامک برای تعداد زیادی سفارش را با قالب کامپایل شده (CompiledSMSTemplate) "
+        "و روش قبلی str.replace مقایسه می‌کند (بدون دیتابیس)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10000, help="تعداد پیامک؛ پیش‌فرض: 10000.")
+        parser.add_argument('--repeat', type=int, default=5, help="تعداد تکرار (بهترین زمان گزارش می‌شود)؛ پیش‌فرض: 5.")
+        parser.add_argument('--template', default=DEFAULT_TEMPLATE, help="متن قالب؛ پیش‌فرض: قالبی با هر پنج متغیر.")
+
+    def handle(self, *args, **options):
+        if options['messages'] < 1 or options['repeat'] < 1:
+            raise CommandError("--messages and --repeat must be at least 1.")
+        unknown = unknown_placeholders(options['template'])
+        if unknown:
+            raise CommandError(f"Unknown placeholders: {', '.join(unknown)}. Allowed: {', '.join(SMS_PLACEHOLDERS)}.")
+
+        contexts = [
+            {
+                'customer_name': f'مشتری {index}',
+                'order_id': str(1000 + index),
+                'order_total': str(150000 + index),
+                'store_name': 'BAKEJÖY',
+                'tracking_number': f'TRK-{index}',
+            }
+            for index in range(options['messages'])
+        ]
+        compiled = CompiledSMSTemplate(options['template'])
+        if any(compiled.render(context) != replace_render(options['template'], context) for context in contexts[:100]):
+            raise CommandError("Compiled and str.replace renders differ for this template.")
+
+        self.stdout.write(f"{options['messages']:,} messages, best of {options['repeat']}:")
+        for title, render in (
+            ('str.replace', lambda context: replace_render(options['template'], context)),
+            ('compiled', compiled.render),
+        ):
+            best = min(self.measure(render, contexts) for _ in range(options['repeat']))
+            self.stdout.write(
+                f"  {title:<12} {best * 1000:>8.1f} ms  {best * 1e6 / options['messages']:>6.2f} us/message"
+            )
+
+    def measure(self, render, contexts):
+        started = time.perf_counter()
+        for context in contexts:
+            render(context)
+        return time.perf_counter() - started
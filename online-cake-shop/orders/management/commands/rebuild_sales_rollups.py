@@ -0,0 +1,42 @@
+# orders/management/commands/rebuild_sales_rollups.py
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.sales_rollups import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "جدول‌های DailySalesRollup و DailyProductSales را (برای همه روزها یا یک بازه) از روی سفارش‌ها از نو می‌سازد. "
+        "ویرایش آیتم‌ها/مبلغ سفارش‌هایی که از قبل فروش حساب شده‌اند تدریجی اعمال نمی‌شود، پس این فرمان را "
+        "به صورت زمان‌بندی شده اجرا کنید، مثلاً شبانه: rebuild_sales_rollups --days 30"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="اولین روز (YYYY-MM-DD)؛ پیش‌فرض: از ابتدا.")
+        parser.add_argument('--end', help="آخرین روز (YYYY-MM-DD)؛ پیش‌فرض: تا امروز.")
+        parser.add_argument('--days', type=int, help="فقط N روز اخیر (شامل امروز)؛ به جای --start و --end.")
+
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            if options['start'] or options['end']:
+                raise CommandError("--days cannot be combined with --start or --end.")
+            if options['days'] < 1:
+                raise CommandError("--days must be at least 1.")
+            end = timezone.localdate()
+            start = end - timedelta(days=options['days'] - 1)
+        else:
+            try:
+                start = date.fromisoformat(options['start']) if options['start'] else None
+                end = date.fromisoformat(options['end']) if options['end'] else None
+            except ValueError as e:
+                raise CommandError(f"Invalid date: {e}")
+        if start and end and start > end:
+            raise CommandError("--start must not be after --end.")
+
+        daily_count, product_count = rebuild_sales_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {daily_count} daily rollup(s) and {product_count} daily product row(s)."
+        ))
@@ -0,0 +1,71 @@
+# orders/management/commands/recompute_order_totals.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from orders.models import Order, OrderItem, OrderAddon
+
+
+def expected_total_expression():
+    """
+    عبارت SQL مجموع (آیتم‌ها + افزودنی‌ها) برای هر سفارش؛
+    هم برای پیدا کردن اختلاف و هم برای ترمیم در یک UPDATE استفاده می‌شود.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    items_total = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        total=Sum(F('quantity') * F('price_at_order'), output_field=money)
+    ).values('total')
+    addons_total = OrderAddon.objects.filter(order_item__order=OuterRef('pk')).order_by().values('order_item__order').annotate(
+        total=Sum(F('quantity') * F('price_at_order'), output_field=money)
+    ).values('total')
+    zero = Value(0, output_field=money)
+    return Coalesce(Subquery(items_total, output_field=money), zero) + Coalesce(Subquery(addons_total, output_field=money), zero)
+
+
+class Command(BaseCommand):
+    help = "سفارش‌هایی را که total_price آن‌ها با مجموع آیتم‌ها و افزودنی‌ها یکی نیست پیدا و به صورت دسته‌ای اصلاح می‌کند."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="فقط اختلاف‌ها را گزارش بده، چیزی ذخیره نکن.")
+        parser.add_argument('--batch-size', type=int, default=500, help="تعداد سفارش در هر UPDATE.")
+        parser.add_argument(
+            '--status', action='append', dest='statuses', default=None,
+            help="فقط سفارش‌های این وضعیت(ها) بررسی شوند (مثلاً --status CART). قابل تکرار.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        expected = expected_total_expression()
+
+        queryset = Order.all_objects.all()
+        if options['statuses']:
+            queryset = queryset.filter(status__in=options['statuses'])
+
+        drifted = queryset.annotate(expected_total=expected).exclude(
+            total_price=F('expected_total')
+        ).order_by('pk').values_list('pk', 'total_price', 'expected_total')
+
+        drifted_ids = []
+        for order_id, stored, computed in drifted.iterator(chunk_size=2000):
+            drifted_ids.append(order_id)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"Order {order_id}: stored={stored} expected={computed}")
+
+        if not drifted_ids:
+            self.stdout.write(self.style.SUCCESS("All order totals are consistent."))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drifted_ids)} order(s) have a drifted total (dry run, nothing saved)."))
+            return
+
+        repaired = 0
+        for start in range(0, len(drifted_ids), batch_size):
+            batch = drifted_ids[start:start + batch_size]
+            # مقدار درست در همان لحظه نوشتن و داخل خود UPDATE محاسبه می‌شود
+            # تا با تغییرات هم‌زمان سبد خرید تداخل نداشته باشد
+            with transaction.atomic():
+                repaired += Order.all_objects.filter(pk__in=batch).update(total_price=expected_total_expression())
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired total_price for {repaired} order(s)."))
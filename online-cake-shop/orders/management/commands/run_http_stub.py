@@ -0,0 +1,33 @@
+# orders/management/commands/run_http_stub.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.http_stub import StubHTTPServer
+
+
+class Command(BaseCommand):
+    help = "یک سرور محلی با پاسخ‌های آماده sms.ir و زرین‌پال اجرا می‌کند تا پیامک و پرداخت بدون اینترنت تست شوند."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+
+    def handle(self, *args, **options):
+        stub = StubHTTPServer(options['host'], options['port']).start()
+        self.stdout.write(self.style.SUCCESS(f"HTTP stub listening on {stub.base_url}"))
+        self.stdout.write("Point the app at it with:")
+        self.stdout.write(f"  SMS_IR_API_BASE_URL={stub.url('/v1/')}")
+        self.stdout.write(f"  ZARINPAL_API_BASE_URL={stub.base_url}")
+        seen = 0
+        try:
+            while True:
+                time.sleep(1)
+                new_calls = stub.calls[seen:]
+                seen += len(new_calls)
+                for method, path, body, _ in new_calls:
+                    self.stdout.write(f"{method} {path} {body}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping HTTP stub...")
+        finally:
+            stub.stop()
@@ -0,0 +1,73 @@
+# orders/management/commands/run_render_worker.py
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+# این دو تابع در پردازه‌های worker (spawn) اجرا می‌شوند؛ import مدل‌ها باید بعد از django.setup باشد
+def setup_worker_process():
+    import django
+    django.setup()
+
+
+def run_job(job_id):
+    from orders.render_jobs import execute_render_job
+    return execute_render_job(job_id)
+
+
+class Command(BaseCommand):
+    help = "کارهای صف RenderJob (PDF لیست سفارش‌ها و فاکتورها) را با یک process pool اجرا می‌کند."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="تعداد پردازه‌های هم‌زمان ساخت PDF.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="فاصله بررسی صف (ثانیه).")
+        parser.add_argument('--once', action='store_true', help="صف فعلی را خالی کن و خارج شو.")
+
+    def handle(self, *args, **options):
+        from orders.render_jobs import claim_jobs, requeue_stale_jobs
+
+        workers = max(options['workers'], 1)
+        poll_interval = max(options['poll_interval'], 0.1)
+
+        # پردازه‌های worker با spawn ساخته می‌شوند تا اتصال دیتابیس پردازه اصلی را به ارث نبرند
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=setup_worker_process,
+        )
+        self.stdout.write(f"Render worker started with {workers} process(es).")
+
+        in_flight = {}
+        try:
+            while True:
+                requeued, failed = requeue_stale_jobs()
+                if requeued or failed:
+                    self.stdout.write(self.style.WARNING(f"Stale jobs: {requeued} requeued, {failed} failed."))
+
+                for job_id in claim_jobs(workers - len(in_flight)):
+                    in_flight[pool.submit(run_job, job_id)] = job_id
+
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(list(in_flight), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = in_flight.pop(future)
+                    try:
+                        _, job_status = future.result()
+                        self.stdout.write(f"RenderJob {job_id}: {job_status}")
+                    except Exception as e:
+                        # خطای خود پردازه (نه خطای ساخت PDF که در execute_render_job ثبت می‌شود)؛
+                        # کار در RUNNING می‌ماند و requeue_stale_jobs دوباره آن را در صف می‌گذارد
+                        self.stderr.write(f"RenderJob {job_id} crashed: {e}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping render worker...")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,64 @@
+# orders/management/commands/run_sms_worker.py
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from orders.http_client import latency_stats
+from orders.sms_service import SMS_BATCH_SIZE, claim_pending_sms, deliver_claimed_sms, fail_exhausted_sms
+
+
+class Command(BaseCommand):
+    help = "پیامک‌های صف (Notification های PENDING) را دسته‌ای و با یک thread pool محدود به sms.ir ارسال می‌کند."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="تعداد دسته‌هایی که هم‌زمان ارسال می‌شوند.")
+        parser.add_argument(
+            '--batch-size', type=int, default=SMS_BATCH_SIZE, help="حداکثر پیامک هر دسته (هر thread).",
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="فاصله بررسی صف (ثانیه).")
+        parser.add_argument('--once', action='store_true', help="پیامک‌هایی که الان موعدشان رسیده را بفرست و خارج شو.")
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        poll_interval = max(options['poll_interval'], 0.1)
+        batch_size = max(options['batch_size'], 1)
+
+        # ارسال پیامک I/O-bound است، پس thread کافی است (هر thread اتصال دیتابیس خودش را دارد)
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sms-worker')
+        self.stdout.write(f"SMS worker started with {workers} thread(s).")
+
+        in_flight = {}
+        try:
+            while True:
+                failed = fail_exhausted_sms()
+                if failed:
+                    self.stdout.write(self.style.WARNING(f"{failed} stuck SMS marked as FAILED."))
+
+                # هر thread آزاد یک دسته برمی‌دارد که با چند درخواست bulk/likeToLike ارسال می‌شود
+                while len(in_flight) < workers:
+                    notification_ids = claim_pending_sms(batch_size)
+                    if not notification_ids:
+                        break
+                    in_flight[pool.submit(deliver_claimed_sms, notification_ids)] = notification_ids
+
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(list(in_flight), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    notification_ids = in_flight.pop(future)
+                    try:
+                        self.stdout.write(f"Batch of {len(notification_ids)} SMS: {future.result()}")
+                    except Exception as e:
+                        # پیامک‌ها PENDING می‌مانند و بعد از پایان زمان رزرو دوباره برداشته می‌شوند
+                        self.stderr.write(f"Batch of {len(notification_ids)} SMS crashed: {e}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping SMS worker...")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            for host, stats in latency_stats().items():
+                self.stdout.write(f"{host}: {stats}")
@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-18 07:35
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Min, Sum
+
+
+def merge_duplicate_order_lines(apps, schema_editor):
+    """
+    ردیف‌های تکراری (همان سفارش، محصول، طعم و اندازه) را قبل از ساخت قید یکتا
+    در ردیف با کوچک‌ترین id ادغام می‌کند و قیمت کل سفارش‌های درگیر را دوباره حساب می‌کند.
+    """
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderAddon = apps.get_model('orders', 'OrderAddon')
+    Order = apps.get_model('orders', 'Order')
+
+    line_key = ['order_id', 'content_type_id', 'object_id', 'flavor_id', 'size_variant_id']
+    duplicates = OrderItem.objects.values(*line_key).annotate(
+        keep_id=Min('id'), rows=Count('id')
+    ).filter(rows__gt=1).order_by()
+
+    affected_orders = set()
+    for group in duplicates:
+        lines = OrderItem.objects.filter(**{key: group[key] for key in line_key})
+        keeper = lines.get(pk=group['keep_id'])
+        for extra in lines.exclude(pk=keeper.pk):
+            keeper.quantity += extra.quantity
+            # افزودنی‌های ردیف تکراری به ردیف اصلی منتقل می‌شوند
+            for addon_line in OrderAddon.objects.filter(order_item=extra):
+                existing = OrderAddon.objects.filter(order_item=keeper, addon_id=addon_line.addon_id).first()
+                if existing:
+                    existing.quantity += addon_line.quantity
+                    existing.save(update_fields=['quantity'])
+                    addon_line.delete()
+                else:
+                    addon_line.order_item = keeper
+                    addon_line.save(update_fields=['order_item'])
+            extra.delete()
+        keeper.save(update_fields=['quantity'])
+        affected_orders.add(group['order_id'])
+
+    money = DecimalField(max_digits=12, decimal_places=2)
+    for order_id in affected_orders:
+        items_total = OrderItem.objects.filter(order_id=order_id).aggregate(
+            total=Sum(F('quantity') * F('price_at_order'), output_field=money)
+        )['total'] or 0
+        addons_total = OrderAddon.objects.filter(order_item__order_id=order_id).aggregate(
+            total=Sum(F('quantity') * F('price_at_order'), output_field=money)
+        )['total'] or 0
+        Order.objects.filter(pk=order_id).update(total_price=items_total + addons_total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('orders', '0007_remove_orderitem_cake_alter_orderitem_content_type_and_more'),
+        ('products', '0009_populate_initial_products'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_order_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'content_type', 'object_id', 'flavor', 'size_variant'), name='unique_order_item_line', nulls_distinct=False),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_orderitem_unique_line'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='flavor_name',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Flavor Name (snapshot)'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_category_name',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Product Category (snapshot)'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_image',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Product Image Path (snapshot)'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=200, verbose_name='Product Name (snapshot)'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_slug',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Product Slug (snapshot)'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='size_name',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='Size Name (snapshot)'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='snapshot_taken_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Snapshot Taken At'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_weight_kg',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Unit Weight kg (snapshot)'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 07:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_orderitem_product_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ORDER_LIST_PDF', 'PDF لیست سفارش\u200cها'), ('INVOICE_PDF', 'PDF فاکتور سفارش')], max_length=30, verbose_name='Kind')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Parameters')),
+                ('params_hash', models.CharField(db_index=True, max_length=64, verbose_name='Parameters Hash')),
+                ('status', models.CharField(choices=[('QUEUED', 'در صف'), ('RUNNING', 'در حال اجرا'), ('DONE', 'آماده'), ('FAILED', 'ناموفق')], default='QUEUED', max_length=10, verbose_name='Status')),
+                ('file', models.FileField(blank=True, null=True, upload_to='render_jobs/%Y/%m/', verbose_name='File')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='render_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Requested By')),
+            ],
+            options={
+                'verbose_name': 'Render Job',
+                'verbose_name_plural': 'Render Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='renderjob_status_created_idx')],
+            },
+        ),
+    ]
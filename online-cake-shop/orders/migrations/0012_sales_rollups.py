@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 07:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('orders', '0011_order_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Date')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Order Count')),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total Sales')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Rollup',
+                'verbose_name_plural': 'Daily Sales Rollups',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Product ID')),
+                ('quantity_sold', models.IntegerField(default=0, verbose_name='Quantity Sold')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Revenue')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Product Type')),
+            ],
+            options={
+                'verbose_name': 'Daily Product Sales',
+                'verbose_name_plural': 'Daily Product Sales',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['content_type', 'date'], name='dailyproductsales_ct_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'content_type', 'object_id'), name='unique_daily_product_sales')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 07:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_sales_rollups'),
+        ('users', '0008_address_phone_number'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['is_deleted', 'status', 'created_at'], name='order_deleted_status_created'),
+        ),
+    ]
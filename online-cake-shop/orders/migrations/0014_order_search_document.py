@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-18 09:10
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    # ایندکس trigram فقط روی PostgreSQL؛ LIKE '%...%' روی search_document را بدون اسکن کامل جواب می‌دهد
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS order_search_document_trgm ON orders_order USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS order_search_document_trgm')
+
+
+def backfill_search_documents(apps, schema_editor):
+    from orders.order_search import SEARCH_DOCUMENT_SOURCES, build_search_document
+
+    Order = apps.get_model('orders', 'Order')
+    batch = []
+    for row in Order._base_manager.order_by().values(*SEARCH_DOCUMENT_SOURCES).iterator(chunk_size=500):
+        batch.append(Order(pk=row['pk'], search_document=build_search_document(row)))
+        if len(batch) >= 500:
+            Order._base_manager.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        Order._base_manager.bulk_update(batch, ['search_document'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_order_deleted_status_created'),
+        ('products', '0010_cake_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Search Document'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_number'], name='order_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['tracking_code'], name='order_tracking_code_idx'),
+        ),
+        TrigramExtension(),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
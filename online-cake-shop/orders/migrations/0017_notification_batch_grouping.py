@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 08:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='line_number',
+            field=models.CharField(blank=True, default='', help_text='Empty means SMS_IR_LINE_NUMBER', max_length=20, verbose_name='Line Number'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='orders.smstemplate', verbose_name='SMS Template'),
+        ),
+    ]
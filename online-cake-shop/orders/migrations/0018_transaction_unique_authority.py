@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_notification_batch_grouping'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('gateway_reference_id__isnull', False)), fields=('gateway_reference_id',), name='unique_transaction_authority'),
+        ),
+    ]
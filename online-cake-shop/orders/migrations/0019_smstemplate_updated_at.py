@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_transaction_unique_authority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smstemplate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Updated At'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0019_smstemplate_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='invoice_cached',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Invoice Cached'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from products.models import Addon
 from django.conf import settings # برای دسترسی به AUTH_USER_MODEL
 from django.utils.translation import gettext_lazy as _
@@ -8,9 +8,57 @@ from users.models import Address
 from django.core.exceptions import ValidationError
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.utils import timezone
 # مدل Address رو بعدا به صورت رشته‌ای ('users.Address') ارجاع می‌دیم یا اگر بالاتر تعریف شده ایمپورت می‌کنیم
 
 
+def _loaded_line_snapshot(instance, parent_attr):
+    """(شناسه والد، تعداد، قیمت واحد) یک ردیف را همان‌طور که از دیتابیس خوانده شده برمی‌گرداند."""
+    data = instance.__dict__
+    if parent_attr not in data or 'quantity' not in data or 'price_at_order' not in data:
+        return None # فیلدها defer شده‌اند؛ تفاضل قابل محاسبه نیست
+    return (data[parent_attr], data['quantity'], data['price_at_order'])
+
+
+def _previous_line(instance, parent_attr):
+    """
+    مقدار ذخیره شده فعلی یک ردیف را (قبل از save) برمی‌گرداند؛ برای ردیف جدید None است.
+    """
+    if instance.pk is None:
+        return None
+    # نمونه‌ای که با pk موجود ساخته شده (نه از دیتابیس) هم adding=True دارد ولی save آن UPDATE است
+    loaded = None if instance._state.adding else getattr(instance, '_loaded_line', None)
+    if loaded is None:
+        # مقدار قبلی در حافظه نیست (مثلاً فیلدهای defer شده)؛ یک بار از دیتابیس می‌خوانیم
+        loaded = type(instance).objects.filter(pk=instance.pk).values_list(
+            parent_attr, 'quantity', 'price_at_order'
+        ).first()
+    return loaded
+
+
+def _apply_line_delta(instance, parent_attr, previous, apply_delta):
+    """
+    تفاضل مبلغ یک ردیف (OrderItem یا OrderAddon) نسبت به مقدار قبلی آن را
+    به سفارش والد اعمال می‌کند و مقدار فعلی را به عنوان مقدار ذخیره شده ثبت می‌کند.
+    """
+    parent_id = getattr(instance, parent_attr)
+    new_total = instance.quantity * instance.price_at_order
+
+    if previous is None:
+        apply_delta(parent_id, new_total)
+    else:
+        old_parent_id, old_quantity, old_price = previous
+        old_total = old_quantity * old_price if old_price is not None else 0
+        if old_parent_id == parent_id:
+            apply_delta(parent_id, new_total - old_total)
+        else:
+            apply_delta(old_parent_id, -old_total)
+            apply_delta(parent_id, new_total)
+
+    instance._loaded_line = (parent_id, instance.quantity, instance.price_at_order)
+
+
 class ActiveOrderManager(models.Manager):
     def get_queryset(self):
         # فقط سفارشاتی را برگردان که is_deleted آنها False است
@@ -112,38 +160,74 @@ class Order(models.Model):
     # زمان ایجاد و آخرین به‌روزرسانی
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True, editable=False)
     updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    # متن نرمال شده شماره سفارش، مشتری و آدرس برای جستجوی ادمین (orders/order_search.py)؛
+    # توسط سیگنال‌های سفارش، کاربر و آدرس به‌روز می‌شود
+    search_document = models.TextField(_("Search Document"), blank=True, default='', editable=False)
+    # آیا PDF فاکتوری از این سفارش در کش (orders/invoice_cache.py) ذخیره شده است؛
+    # تغییرات سفارش فقط وقتی به storage دست می‌زنند که این فیلد True باشد
+    invoice_cached = models.BooleanField(_("Invoice Cached"), default=False, editable=False)
     
     def __str__(self):
         # نمایش بهتر در پنل ادمین و ...
         return f"Order {self.id} ({self.user.username if self.user else 'No User'}) - {self.get_status_display()}"
     
     def update_total_price(self):
-        """Calculates and updates the total price based on its items."""
-        # 'items' نام related_name پیش‌فرض برای ForeignKey از OrderItem به Order است
-        # اگر related_name را تغییر داده‌اید، اینجا هم اصلاح کنید.
-        order_items = self.items.all() # گرفتن تمام آیتم‌های مرتبط با این سفارش
-
-        # محاسبه مجموع قیمت آیتم‌ها (تعداد * قیمت زمان سفارش)
-        items_total = order_items.aggregate(
+        """
+        Recalculates the total price from scratch based on its items and their addons.
+        مسیر اصلی به‌روزرسانی قیمت کل، اعمال تفاضل (apply_total_delta) است؛
+        این متد فقط برای محاسبه کامل/ترمیم استفاده می‌شود.
+        """
+        items_total = self.items.aggregate(
            total=Sum(
                F('quantity') * F('price_at_order'), # ضرب دو فیلد
                output_field=DecimalField(max_digits=12, decimal_places=2) # تعیین نوع خروجی
            )
         )['total'] or 0 # اگر هیچ آیتمی نباشد، مجموع صفر است
 
-        # TODO: اگر مدل OrderAddon دارید و می‌خواهید قیمت افزودنی‌ها را هم حساب کنید،
-        # باید آن‌ها را هم از طریق آیتم‌ها جمع بزنید.
-        # addons_total = ...
-    
-        print(f"Updating total price for Order {self.id} to: {items_total}") # لاگ برای دیباگ
-        self.total_price = items_total # + addons_total
+        # جمع افزودنی‌های تمام آیتم‌های این سفارش
+        addons_total = OrderAddon.objects.filter(order_item__order=self).aggregate(
+            total=Sum(
+                F('quantity') * F('price_at_order'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )['total'] or 0
+
+        self.total_price = items_total + addons_total
         # فقط فیلد total_price را ذخیره می‌کنیم تا updated_at بی‌دلیل عوض نشود
         self.save(update_fields=['total_price'])
+
+    @classmethod
+    def apply_total_delta(cls, order_id, delta):
+        """
+        تفاضل قیمت را در یک UPDATE اتمی (بدون خواندن سفارش) به total_price اضافه می‌کند.
+        """
+        if not order_id or not delta:
+            return 0
+        return cls.all_objects.filter(pk=order_id).update(total_price=F('total_price') + delta)
+
+    def freeze_item_snapshots(self):
+        """
+        اطلاعات فعلی محصول، طعم و اندازه آیتم‌هایی که هنوز snapshot ندارند را
+        روی خود آیتم‌ها ثابت می‌کند (هنگام رفتن سفارش به PENDING_PAYMENT).
+        """
+        items = OrderItem.with_snapshot_sources(self.items.filter(snapshot_taken_at__isnull=True))
+        return OrderItem.freeze_snapshots(items)
+
     def get_latest_successful_transaction(self):
         return self.transactions.filter(status='SUCCESS').order_by('-created_at').first()
     def get_shipping_method_display(self):
         return dict(self.SHIPPING_CHOICES).get(self.shipping_method, self.shipping_method)
     # ^^^^ --- پایان متد محاسبه قیمت کل --- ^^^^
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # وضعیت ذخیره شده، برای تشخیص ورود/خروج سفارش از وضعیت‌های فروش (sales_rollups)
+        data = instance.__dict__
+        if 'status' in data and 'is_deleted' in data:
+            instance._loaded_sales_state = (data['status'], data['is_deleted'])
+        return instance
+
     def save(self, *args, **kwargs):
         # این متغیر مشخص می‌کند که آیا آبجکت برای اولین بار در حال ایجاد است یا خیر
         is_new = self._state.adding
@@ -168,44 +252,55 @@ class Order(models.Model):
             self.save(update_fields=['order_number'])
     def change_status(self, new_status: str, changed_by=None, notes: str = ""):
         """
-        این متد به صورت اتمی وضعیت سفارش را تغییر داده، لاگ ثبت کرده و پیامک ارسال می‌کند.
+        این متد به صورت اتمی وضعیت سفارش را تغییر داده، لاگ ثبت کرده و پیامک را در صف ارسال قرار می‌دهد.
         """
+        from .sms_service import enqueue_order_status_sms
+
         # اگر وضعیت جدید با وضعیت فعلی یکسان است، هیچ کاری انجام نده
         if new_status == self.status:
             return
 
         old_status_display = self.get_status_display()
-        
-        # ۱. ابتدا وضعیت سفارش را آپدیت و ذخیره کن
-        self.status = new_status
-        self.save(update_fields=['status'])
-        print(f"Order #{self.id} status changed to {self.status}")
-
-        # ۲. سپس لاگ تغییر وضعیت را با اطلاعات کامل ثبت کن
-        if not notes:
-            notes = f"وضعیت از '{old_status_display}' به '{self.get_status_display()}' تغییر کرد."
-        
-        OrderStatusLog.objects.create(
-            order=self,
-            new_status=self.status,
-            changed_by=changed_by,
-            notes=notes
-        )
-        print(f"Log created for order #{self.id}")
-
-        # ۳. در نهایت، پیامک را ارسال کن
-        try:
-            from .sms_service import send_order_status_sms # <-- ایمپورت به اینجا منتقل شد
-            send_order_status_sms(self, self.status) # دیگر نیازی به پاس دادن وضعیت نیست، چون در خود آبجکت order هست
-            print(f"SMS service called for order #{self.id}")
-        except Exception as e:
-            # حتی اگر ارسال پیامک با خطا مواجه شد، نباید کل عملیات را متوقف کند
-            # این خطا باید در سیستم لاگ‌گیری شما ثبت شود
-            print(f"CRITICAL: Failed to send SMS for order #{self.id}. Error: {e}")
+
+        with transaction.atomic():
+            # ۱. ابتدا وضعیت سفارش را آپدیت و ذخیره کن
+            # (لاگ سیگنال post_save ثبت نمی‌شود؛ لاگ کامل با notes و changed_by در مرحله ۲ ثبت می‌شود)
+            self.status = new_status
+            self._skip_status_log = True
+            try:
+                self.save(update_fields=['status'])
+            finally:
+                self._skip_status_log = False
+            print(f"Order #{self.id} status changed to {self.status}")
+
+            # ۲. سپس لاگ تغییر وضعیت را با اطلاعات کامل ثبت کن
+            if not notes:
+                notes = f"وضعیت از '{old_status_display}' به '{self.get_status_display()}' تغییر کرد."
+
+            OrderStatusLog.objects.create(
+                order=self,
+                new_status=self.status,
+                changed_by=changed_by,
+                notes=notes
+            )
+            print(f"Log created for order #{self.id}")
+
+            # ۳. در نهایت، پیامک را در همین تراکنش در صف (outbox) ثبت کن؛
+            # ارسال واقعی با فرمان run_sms_worker انجام می‌شود و درخواست منتظر sms.ir نمی‌ماند
+            enqueue_order_status_sms(self, self.status)
     class Meta:
         verbose_name = _("Order")
         verbose_name_plural = _("Orders")
         ordering = ['-created_at'] # مرتب‌سازی پیش‌فرض
+        indexes = [
+            # برای بازه‌های زمانی (امروز، ماه جاری و ...) در آمار و گزارش‌ها و صفحه‌بندی keyset (orders/pagination.py)
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            # لیست سفارش‌های ادمین: حذف نشده + وضعیت + بازه تاریخ (date_presets)
+            models.Index(fields=['is_deleted', 'status', 'created_at'], name='order_deleted_status_created'),
+            # تطبیق دقیق در جستجوی ادمین
+            models.Index(fields=['order_number'], name='order_number_idx'),
+            models.Index(fields=['tracking_code'], name='order_tracking_code_idx'),
+        ]
 class OrderItem(models.Model):
     # سفارش والد این آیتم
     order = models.ForeignKey(
@@ -254,7 +349,24 @@ class OrderItem(models.Model):
     # این بسیار مهم است چون قیمت‌ها ممکن است در آینده تغییر کنند
     price_at_order = models.DecimalField(_("Price at Order"), max_digits=10, decimal_places=2)
     notes = models.TextField(_("Customization Notes"), null=True, blank=True)
-    
+
+    # --- نسخه ثابت اطلاعات محصول در لحظه ثبت سفارش ---
+    # هنگام رفتن سفارش به PENDING_PAYMENT پر می‌شوند تا سابقه سفارش، فاکتور و خروجی‌ها
+    # با ویرایش یا غیرفعال شدن محصول تغییر نکنند و نیازی به جداول محصولات نداشته باشند
+    product_name = models.CharField(_("Product Name (snapshot)"), max_length=200, blank=True, default='')
+    product_slug = models.CharField(_("Product Slug (snapshot)"), max_length=255, blank=True, default='')
+    product_image = models.CharField(_("Product Image Path (snapshot)"), max_length=255, blank=True, default='')
+    product_category_name = models.CharField(_("Product Category (snapshot)"), max_length=100, blank=True, default='')
+    flavor_name = models.CharField(_("Flavor Name (snapshot)"), max_length=100, blank=True, default='')
+    size_name = models.CharField(_("Size Name (snapshot)"), max_length=50, blank=True, default='')
+    unit_weight_kg = models.DecimalField(_("Unit Weight kg (snapshot)"), max_digits=5, decimal_places=2, null=True, blank=True)
+    snapshot_taken_at = models.DateTimeField(_("Snapshot Taken At"), null=True, blank=True)
+
+    SNAPSHOT_FIELDS = [
+        'product_name', 'product_slug', 'product_image', 'product_category_name',
+        'flavor_name', 'size_name', 'unit_weight_kg', 'snapshot_taken_at',
+    ]
+
     def calculate_price(self):
         """
         قیمت را بر اساس نوع محصول (کیک یا لوازم جشن) محاسبه می‌کند.
@@ -282,12 +394,40 @@ class OrderItem(models.Model):
             
         return 0 # اگر نوع محصول ناشناخته بود
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # مقادیر ذخیره شده در دیتابیس را نگه می‌داریم تا در save فقط تفاضل را اعمال کنیم
+        instance._loaded_line = _loaded_line_snapshot(instance, 'order_id')
+        return instance
+
     def save(self, *args, **kwargs):
-        """این متد بدون تغییر باقی می‌ماند و به درستی کار می‌کند."""
+        """
+        قیمت واحد را دوباره محاسبه کرده و به جای جمع‌زدن مجدد کل سبد،
+        فقط تفاضل این ردیف را به total_price سفارش اعمال می‌کند.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'quantity', 'price_at_order'} & set(update_fields):
+            # فیلدهای مؤثر در قیمت تغییر نکرده‌اند
+            super().save(*args, **kwargs)
+            return
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'price_at_order'}
+
+        previous = _previous_line(self, 'order_id')
         self.price_at_order = self.calculate_price()
         super().save(*args, **kwargs)
-        if self.order:
-            self.order.update_total_price()
+        _apply_line_delta(self, 'order_id', previous, Order.apply_total_delta)
+        if previous is not None and previous[0] != self.order_id:
+            self._move_addons_total(previous[0])
+
+    def _move_addons_total(self, old_order_id):
+        """با جابه‌جا شدن آیتم به سفارش دیگر، مبلغ افزودنی‌هایش هم از سفارش قبلی به سفارش جدید منتقل می‌شود."""
+        addons_total = self.addons.aggregate(
+            total=Sum(F('quantity') * F('price_at_order'), output_field=DecimalField(max_digits=12, decimal_places=2))
+        )['total'] or 0
+        Order.apply_total_delta(old_order_id, -addons_total)
+        Order.apply_total_delta(self.order_id, addons_total)
 
     def __str__(self):
         """
@@ -310,6 +450,83 @@ class OrderItem(models.Model):
     def total_price(self):
         return self.quantity * self.price_at_order
 
+    def fill_snapshot(self, taken_at=None):
+        """
+        فیلدهای snapshot را از محصول، طعم و اندازه فعلی پر می‌کند (بدون ذخیره).
+        """
+        product = self.content_object
+        if product is not None:
+            self.product_name = product.name
+            self.product_slug = product.slug or ''
+            self.product_image = product.image.name if product.image else ''
+            # کیک دسته‌بندی دارد و لوازم جشن نوع (SupplyType)
+            group = product.category if isinstance(product, Cake) else getattr(product, 'type', None)
+            self.product_category_name = group.name if group else ''
+        self.flavor_name = self.flavor.name if self.flavor else ''
+        if self.size_variant and self.size_variant.size:
+            self.size_name = self.size_variant.size.name
+            self.unit_weight_kg = self.size_variant.estimated_weight_kg_override or self.size_variant.size.estimated_weight_kg
+        self.snapshot_taken_at = taken_at or timezone.now()
+        return self
+
+    @classmethod
+    def freeze_snapshots(cls, items, batch_size=500):
+        """
+        snapshot آیتم‌های داده شده را پر کرده و همه را با یک bulk_update ذخیره می‌کند.
+        آیتم‌ها بهتر است با محصول، طعم و اندازه prefetch شده باشند.
+        bulk_update متد save را صدا نمی‌زند، پس total_price سفارش دست نمی‌خورد.
+        """
+        taken_at = timezone.now()
+        items = [item.fill_snapshot(taken_at) for item in items]
+        cls.objects.bulk_update(items, cls.SNAPSHOT_FIELDS, batch_size=batch_size)
+        return len(items)
+
+    @classmethod
+    def with_snapshot_sources(cls, queryset=None):
+        """کوئری‌ست آیتم‌ها به همراه داده‌های لازم برای fill_snapshot (بدون N+1)."""
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.select_related('flavor', 'size_variant__size').prefetch_related(
+            GenericPrefetch('content_object', [
+                Cake.objects.select_related('category'),
+                PartySupply.objects.select_related('type'),
+            ])
+        )
+
+    @property
+    def has_snapshot(self):
+        return self.snapshot_taken_at is not None
+
+    # نام‌های نمایشی: اول snapshot و اگر نبود (مثلاً سبد خرید) اطلاعات زنده محصول
+    @property
+    def display_name(self):
+        if self.has_snapshot:
+            return self.product_name
+        product = self.content_object
+        return product.name if product else ''
+
+    @property
+    def display_flavor_name(self):
+        if self.has_snapshot:
+            return self.flavor_name
+        return self.flavor.name if self.flavor else ''
+
+    @property
+    def display_size_name(self):
+        if self.has_snapshot:
+            return self.size_name
+        return self.size_variant.size.name if self.size_variant and self.size_variant.size else ''
+
+    class Meta:
+        constraints = [
+            # هر محصول با طعم و اندازه مشخص فقط یک ردیف در هر سفارش دارد؛
+            # افزودن دوباره فقط تعداد را زیاد می‌کند (INSERT ... ON CONFLICT در cart_service)
+            models.UniqueConstraint(
+                fields=['order', 'content_type', 'object_id', 'flavor', 'size_variant'],
+                name='unique_order_item_line',
+                nulls_distinct=False, # طعم/اندازه خالی هم باید تکراری حساب شود
+            ),
+        ]
+
 # مدل برای ذخیره جزئیات طرح سفارشی مرتبط با یک آیتم سفارش
 class CustomDesign(models.Model):
     """
@@ -392,7 +609,27 @@ class OrderAddon(models.Model):
     @property
     def total_price(self):
         return self.quantity * self.price_at_order
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_line = _loaded_line_snapshot(instance, 'order_item_id')
+        return instance
+
+    @staticmethod
+    def apply_item_total_delta(order_item_id, delta):
+        """تفاضل را به سفارشِ والدِ آیتم اعمال می‌کند (یک UPDATE با زیرکوئری)."""
+        if not order_item_id or not delta:
+            return 0
+        return Order.all_objects.filter(items__pk=order_item_id).update(total_price=F('total_price') + delta)
+
+    def save(self, *args, **kwargs):
+        if self.price_at_order is None:
+            self.price_at_order = self.addon.price
+        previous = _previous_line(self, 'order_item_id')
+        super().save(*args, **kwargs)
+        _apply_line_delta(self, 'order_item_id', previous, self.apply_item_total_delta)
+
 
 # مدل برای ثبت تراکنش‌های مالی مرتبط با سفارش‌ها
 class Transaction(models.Model):
@@ -473,6 +710,14 @@ class Transaction(models.Model):
         verbose_name = _("Transaction")
         verbose_name_plural = _("Transactions")
         ordering = ['-created_at'] # اضافه کردن این خط برای مرتب‌سازی
+        constraints = [
+            # Authority زرین‌پال کلید idempotency پردازش callback است (payment_service.process_zarinpal_callback)
+            models.UniqueConstraint(
+                fields=['gateway_reference_id'],
+                condition=models.Q(gateway_reference_id__isnull=False),
+                name='unique_transaction_authority',
+            ),
+        ]
 
     def __str__(self):
         # ارائه یک نمایش رشته‌ای خوانا
@@ -531,6 +776,14 @@ class Notification(models.Model):
         related_name='notifications'
     )
     message = models.TextField(_("Message")) # این متن نهایی پیامک خواهد بود
+    # قالب و خط فرستنده؛ ارسال دسته‌ای پیامک‌ها بر اساس این دو گروه‌بندی می‌شود
+    template = models.ForeignKey(
+        'SMSTemplate', verbose_name=_("SMS Template"), on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='notifications'
+    )
+    line_number = models.CharField(
+        _("Line Number"), max_length=20, blank=True, default='', help_text=_("Empty means SMS_IR_LINE_NUMBER")
+    )
     type = models.CharField(
         _("Type"),
         max_length=10,
@@ -551,11 +804,20 @@ class Notification(models.Model):
     gateway_pack_id = models.CharField(max_length=255, blank=True, null=True, verbose_name=_("Gateway Pack ID"))
     gateway_message_ids = models.JSONField(blank=True, null=True, verbose_name=_("Gateway Message IDs")) # یا TextField
     cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name=_("Cost"))
+    # صف ارسال (outbox): فرمان run_sms_worker پیامک‌های PENDING را که زمان تلاششان رسیده ارسال می‌کند
+    attempts = models.PositiveSmallIntegerField(_("Attempts"), default=0)
+    next_attempt_at = models.DateTimeField(_("Next Attempt At"), default=timezone.now)
 
     class Meta:
         verbose_name = _("Notification")
         verbose_name_plural = _("Notifications")
         ordering = ['-created_at']
+        indexes = [
+            # صفحه‌بندی keyset لاگ پیامک‌ها (orders/pagination.py)
+            models.Index(fields=['created_at', 'id'], name='notification_created_id_idx'),
+            # worker صف پیامک: PENDING هایی که زمان تلاششان رسیده
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_outbox_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.username} ({self.get_type_display()} - {self.get_status_display()})"
@@ -594,10 +856,23 @@ class SMSTemplate(models.Model):
     )
     is_active = models.BooleanField(default=True, verbose_name=_("Active for Sending"))
     description = models.CharField(max_length=255, blank=True, null=True, verbose_name=_("Template Description"))
+    # برای تشخیص تغییر قالب‌ها در همه پردازه‌ها (registry در orders/sms_templates.py)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
 
     def __str__(self):
         return f"SMS Template for: {self.get_event_trigger_display()}"
 
+    def clean(self):
+        super().clean()
+        # متغیر ناشناخته (مثلاً غلط تایپی) در پیامک ارسالی به مشتری دست‌نخورده می‌ماند
+        from .sms_templates import SMS_PLACEHOLDERS, unknown_placeholders
+        unknown = unknown_placeholders(self.message_template)
+        if unknown:
+            raise ValidationError({'message_template': _("Unknown placeholders: %(unknown)s. Allowed: %(allowed)s.") % {
+                'unknown': ', '.join(f'{{{{{name}}}}}' for name in unknown),
+                'allowed': ', '.join(f'{{{{{name}}}}}' for name in SMS_PLACEHOLDERS),
+            }})
+
     class Meta:
         verbose_name = _("SMS Template")
         verbose_name_plural = _("SMS Templates")
@@ -631,3 +906,102 @@ class OrderStatusLog(models.Model):
     def __str__(self):
         user_display = self.changed_by.username if self.changed_by else _("System")
         return f"Order #{self.order.id} changed to {self.new_status} by {user_display} at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+
+class RenderJob(models.Model):
+    """
+    صف کارهای پس‌زمینه برای ساخت فایل‌های سنگین (PDF لیست سفارش‌ها و فاکتور)؛
+    درخواست فقط یک ردیف در این جدول ثبت می‌کند و فرمان run_render_worker آن را اجرا می‌کند.
+    """
+    class KindChoices(models.TextChoices):
+        ORDER_LIST_PDF = 'ORDER_LIST_PDF', _('PDF لیست سفارش‌ها')
+        INVOICE_PDF = 'INVOICE_PDF', _('PDF فاکتور سفارش')
+
+    class StatusChoices(models.TextChoices):
+        QUEUED = 'QUEUED', _('در صف')
+        RUNNING = 'RUNNING', _('در حال اجرا')
+        DONE = 'DONE', _('آماده')
+        FAILED = 'FAILED', _('ناموفق')
+
+    kind = models.CharField(_("Kind"), max_length=30, choices=KindChoices.choices)
+    # پارامترهای لازم برای ساخت فایل (فیلترهای لیست یا شناسه سفارش)
+    params = models.JSONField(_("Parameters"), default=dict, blank=True)
+    # هش نوع + پارامترها؛ برای یکی کردن درخواست‌های تکراری
+    params_hash = models.CharField(_("Parameters Hash"), max_length=64, db_index=True)
+    status = models.CharField(_("Status"), max_length=10, choices=StatusChoices.choices, default=StatusChoices.QUEUED)
+    file = models.FileField(_("File"), upload_to='render_jobs/%Y/%m/', null=True, blank=True)
+    error = models.TextField(_("Error"), blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(_("Attempts"), default=0)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='render_jobs',
+        verbose_name=_("Requested By")
+    )
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+    started_at = models.DateTimeField(_("Started At"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("Finished At"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Render Job")
+        verbose_name_plural = _("Render Jobs")
+        ordering = ['-created_at']
+        indexes = [
+            # worker همیشه قدیمی‌ترین کار در صف را برمی‌دارد
+            models.Index(fields=['status', 'created_at'], name='renderjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"RenderJob #{self.id} {self.kind} ({self.status})"
+
+    @property
+    def download_filename(self):
+        if self.kind == self.KindChoices.INVOICE_PDF:
+            return f"invoice_order_{self.params.get('order_id')}.pdf"
+        return "orders_export.pdf"
+
+
+class DailySalesRollup(models.Model):
+    """
+    جمع فروش روزانه (سفارش‌های در وضعیت‌های فروش، بر اساس روز ثبت سفارش به وقت محلی).
+    با ورود/خروج سفارش از وضعیت‌های فروش به‌روز می‌شود؛ ویرایش آیتم‌های سفارش‌های فروش شده را فرمان
+    زمان‌بندی شده rebuild_sales_rollups --days N اعمال می‌کند (orders/sales_rollups.py).
+    """
+    date = models.DateField(_("Date"), unique=True)
+    order_count = models.PositiveIntegerField(_("Order Count"), default=0)
+    total_sales = models.DecimalField(_("Total Sales"), max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Daily Sales Rollup")
+        verbose_name_plural = _("Daily Sales Rollups")
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.order_count} orders, {self.total_sales}"
+
+
+class DailyProductSales(models.Model):
+    """تعداد و مبلغ فروش روزانه هر محصول (کیک یا لوازم جشن)."""
+    date = models.DateField(_("Date"))
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name=_("Product Type"))
+    object_id = models.PositiveIntegerField(_("Product ID"))
+    quantity_sold = models.IntegerField(_("Quantity Sold"), default=0)
+    revenue = models.DecimalField(_("Revenue"), max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = _("Daily Product Sales")
+        verbose_name_plural = _("Daily Product Sales")
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'content_type', 'object_id'], name='unique_daily_product_sales'),
+        ]
+        indexes = [
+            # پرفروش‌ترین‌های یک نوع محصول در یک بازه
+            models.Index(fields=['content_type', 'date'], name='dailyproductsales_ct_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.content_type_id}/{self.object_id} x {self.quantity_sold}"
@@ -0,0 +1,102 @@
+# orders/order_search.py
+import re
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q, Subquery
+from rest_framework import filters
+
+from products.search import normalize_persian
+
+# فیلدهایی (از سفارش، مشتری و آدرس) که در search_document سفارش قرار می‌گیرند
+SEARCH_DOCUMENT_SOURCES = (
+    'pk', 'order_number', 'tracking_code',
+    'user__username', 'user__first_name', 'user__last_name', 'user__email', 'user__phone',
+    'address__recipient_name', 'address__phone_number', 'address__street', 'address__postal_code',
+    'address__city__name', 'address__city__province__name',
+)
+# اگر یکی از این فیلدهای سفارش ذخیره شود، سند جستجو باید دوباره ساخته شود
+ORDER_SEARCH_FIELDS = {'user', 'address', 'order_number', 'tracking_code'}
+# و فیلدهایی از مشتری و آدرس که در سند جستجو می‌آیند (ذخیره بقیه فیلدها، مثل last_login، سند را عوض نمی‌کند)
+USER_SEARCH_FIELDS = {'username', 'first_name', 'last_name', 'email', 'phone'}
+ADDRESS_SEARCH_FIELDS = {'recipient_name', 'phone_number', 'street', 'postal_code', 'city'}
+
+_NON_DIGITS_RE = re.compile(r'\D')
+
+
+def phone_variants(value):
+    """
+    شکل‌های رایج یک شماره موبایل ایران: 09121234567 / 9121234567 / 989121234567 / +989121234567
+    (برای تطبیق دقیق شماره‌ای که به هر شکلی ذخیره یا جستجو شده باشد).
+    """
+    digits = _NON_DIGITS_RE.sub('', normalize_persian(value))
+    if digits.startswith('98'):
+        digits = digits[2:]
+    digits = digits.lstrip('0')
+    if len(digits) < 7:
+        return []
+    return [f'0{digits}', digits, f'98{digits}', f'+98{digits}']
+
+
+def build_search_document(row):
+    """
+    متن نرمال شده قابل جستجوی یک سفارش از روی یک ردیف values() با کلیدهای SEARCH_DOCUMENT_SOURCES.
+    """
+    parts = [str(row['pk'])]
+    for key in SEARCH_DOCUMENT_SOURCES[1:]:
+        value = row.get(key)
+        if value:
+            parts.append(str(value))
+    for key in ('user__phone', 'address__phone_number'):
+        parts.extend(phone_variants(row.get(key)))
+    return normalize_persian(' '.join(parts))
+
+
+def refresh_search_documents(queryset, batch_size=500):
+    """
+    search_document سفارش‌های queryset را از روی مقادیر فعلی مشتری و آدرس دوباره می‌سازد
+    (با bulk_update و بدون اجرای save/سیگنال‌ها). تعداد سفارش‌های به‌روز شده را برمی‌گرداند.
+    """
+    model = queryset.model
+    rows = queryset.order_by().values(*SEARCH_DOCUMENT_SOURCES).iterator(chunk_size=batch_size)
+    batch, updated = [], 0
+    for row in rows:
+        batch.append(model(pk=row['pk'], search_document=build_search_document(row)))
+        if len(batch) >= batch_size:
+            updated += len(batch)
+            model.all_objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        updated += len(batch)
+        model.all_objects.bulk_update(batch, ['search_document'])
+    return updated
+
+
+class AdminOrderSearchFilter(filters.SearchFilter):
+    """
+    جستجوی ادمین سفارش‌ها با ?search=:
+    - تطبیق دقیق (ایندکس btree) روی شماره سفارش، کد رهگیری و موبایل مشتری؛
+    - یا وجود همه کلمات جستجو در search_document (روی PostgreSQL با ایندکس trigram، یعنی
+      LIKE '%...%' بدون اسکن کامل و بدون join با جدول‌های کاربر و آدرس).
+    """
+
+    def get_search_terms(self, request):
+        return [term for term in (normalize_persian(term) for term in super().get_search_terms(request)) if term]
+
+    def exact_match_q(self, raw):
+        raw = normalize_persian(raw)
+        order_number = raw.upper().lstrip('#')
+        exact = Q(order_number__in=[f'#{order_number}', order_number]) | Q(tracking_code=raw)
+        phones = phone_variants(raw)
+        if phones:
+            # زیرکوئری روی ایندکس یکتای phone به جای join با users، تا OR فقط روی ایندکس‌های جدول سفارش بماند
+            exact |= Q(user_id__in=Subquery(get_user_model().objects.filter(phone__in=phones).values('pk')))
+        return exact
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        document_q = Q()
+        for term in terms:
+            document_q &= Q(search_document__contains=term)
+        return queryset.filter(self.exact_match_q(' '.join(terms)) | document_q)
@@ -0,0 +1,58 @@
+# orders/order_validators.py
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Sum
+
+from products.catalog_cache import catalog_version_subquery
+from products.conditional import make_etag
+from products.models import Cake, Flavor, PartySupply, Size
+from .models import Order, OrderItem, OrderStatusLog, Transaction
+
+# داده زنده محصولات (قیمت، تصویر، ...) در سبد خرید و با ?expand=product در سفارش دیده می‌شود
+PRODUCT_CATALOG_MODELS = (Cake, PartySupply, Flavor, Size)
+
+
+def _aggregate(queryset, expression, output_field=None):
+    """یک تجمیع روی ردیف‌های مرتبط با سفارش، به صورت Subquery (تا همه در یک کوئری بیایند)."""
+    return Subquery(
+        queryset.filter(order=OuterRef('pk')).order_by().values('order').annotate(value=expression).values('value'),
+        output_field=output_field,
+    )
+
+
+def order_validators(queryset, request):
+    """
+    (ETag، Last-Modified) سفارش queryset را با یک کوئری و بدون سریالایز کردن آن حساب می‌کند.
+    ETag همه چیزهایی را که OrderSerializer نشان می‌دهد پوشش می‌دهد: ردیف سفارش، آیتم‌ها
+    (تعداد و ترکیب شناسه/تعداد)، تراکنش‌ها، تاریخچه وضعیت، مشتری و آدرس (از طریق search_document)
+    و نسخه کاتالوگ محصولات. Last-Modified فقط برای سفارش‌های غیر از سبد خرید داده می‌شود،
+    چون تغییر آیتم‌های سبد updated_at سفارش را عوض نمی‌کند.
+    اگر سفارشی پیدا نشود None برمی‌گرداند.
+    """
+    integer = IntegerField()
+    row = queryset.order_by().annotate(
+        items_count=_aggregate(OrderItem.objects, Count('id'), integer),
+        items_signature=_aggregate(OrderItem.objects, Sum(F('id') * F('quantity')), integer),
+        items_quantity=_aggregate(OrderItem.objects, Sum('quantity'), integer),
+        transactions_count=_aggregate(Transaction.objects, Count('id'), integer),
+        transactions_updated_at=_aggregate(Transaction.objects, Max('updated_at')),
+        last_status_log_id=_aggregate(OrderStatusLog.objects, Max('id'), integer),
+        **{
+            f'catalog_version_{index}': catalog_version_subquery(model)
+            for index, model in enumerate(PRODUCT_CATALOG_MODELS)
+        },
+    ).values(
+        'pk', 'status', 'updated_at', 'total_price', 'search_document',
+        'items_count', 'items_signature', 'items_quantity',
+        'transactions_count', 'transactions_updated_at', 'last_status_log_id',
+        *(f'catalog_version_{index}' for index in range(len(PRODUCT_CATALOG_MODELS))),
+    ).first()
+    if row is None:
+        return None
+
+    etag = make_etag(
+        sorted(row.items(), key=lambda item: item[0]),
+        sorted(request.query_params.items()),
+    )
+    if row['status'] == Order.OrderStatusChoices.CART:
+        return etag, None
+    last_modified = max(filter(None, [row['updated_at'], row['transactions_updated_at']]))
+    return etag, last_modified
@@ -0,0 +1,173 @@
+# orders/pagination.py
+import base64
+import json
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def approximate_count(queryset):
+    """
+    تعداد تقریبی ردیف‌های queryset بدون COUNT(*):
+    روی PostgreSQL تخمین planner (از آمار جدول، همان pg_class.reltuples و هیستوگرام ستون‌ها)
+    با EXPLAIN؛ روی سایر دیتابیس‌ها همان count() معمولی.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class LegacyPageNumberPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class CreatedAtKeysetPagination(BasePagination):
+    """
+    صفحه‌بندی keyset روی (created_at, id) برای لیست‌های بزرگ (سفارش‌ها، لاگ پیامک‌ها، نظرات):
+    - بدون COUNT(*) و بدون OFFSET؛ هر صفحه با WHERE (created_at, id) < (مقدار آخرین ردیف)
+      و ایندکس (created_at, id) خوانده می‌شود، پس صفحه هزارم هم مثل صفحه اول سریع است.
+    - پاسخ: {"next": ..., "previous": ..., "results": [...]} و با ?with_count=approx
+      فیلد approximate_count هم اضافه می‌شود.
+    - ?ordering=created_at ترتیب صعودی و پیش‌فرض (یا -created_at) نزولی است.
+    - برای سازگاری با کلاینت‌های قدیمی، اگر ?page= فرستاده شود یا مرتب‌سازی روی فیلد دیگری
+      خواسته شود، fallback_pagination_class (صفحه‌بندی شماره‌ای) استفاده می‌شود.
+    """
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    fallback_pagination_class = LegacyPageNumberPagination
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.fallback = None
+
+    # --- انتخاب حالت ---
+
+    def _ordering(self, request):
+        ordering = request.query_params.get('ordering', '-created_at').strip()
+        if ordering in ('created_at', 'created_at,id'):
+            return False
+        if ordering in ('', '-created_at', '-created_at,-id'):
+            return True
+        return None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # --- cursor ---
+
+    def encode_cursor(self, created_at, pk, backwards=False):
+        payload = {'c': created_at.isoformat(), 'i': pk}
+        if backwards:
+            payload['b'] = 1
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def decode_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param)
+        if not raw:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(raw.encode()).decode())
+            created_at = parse_datetime(payload['c'])
+            pk = int(payload['i'])
+        except (ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, bool(payload.get('b'))
+
+    def _link(self, created_at, pk, backwards=False):
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(created_at, pk, backwards)
+        )
+
+    # --- صفحه‌بندی ---
+
+    def paginate_queryset(self, queryset, request, view=None):
+        descending = self._ordering(request)
+        if descending is None or 'page' in request.query_params:
+            self.fallback = self.fallback_pagination_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) in ('approx', 'true', '1'):
+            self.approximate_count = approximate_count(queryset)
+
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        backwards = bool(cursor and cursor[2])
+        # در جهت عقب، با ترتیب برعکس می‌خوانیم و بعد نتیجه را برمی‌گردانیم
+        scan_descending = descending != backwards
+        direction = '-' if scan_descending else ''
+        queryset = queryset.order_by(f'{direction}created_at', f'{direction}id')
+
+        if cursor:
+            created_at, pk = cursor[0], cursor[1]
+            if scan_descending:
+                queryset = queryset.filter(
+                    Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(id__lt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gte=created_at), Q(created_at__gt=created_at) | Q(id__gt=pk)
+                )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        self.next_link = self.previous_link = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            if has_more or backwards:
+                self.next_link = self._link(last.created_at, last.pk)
+            if (cursor is not None and not backwards) or (backwards and has_more):
+                self.previous_link = self._link(first.created_at, first.pk, backwards=True)
+        elif backwards:
+            # قبل از ابتدای لیست؛ صفحه اول را پیشنهاد می‌دهیم
+            self.next_link = remove_query_param(self.base_url, self.cursor_query_param)
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        payload = {'next': self.next_link, 'previous': self.previous_link, 'results': data}
+        if self.approximate_count is not None:
+            payload['approximate_count'] = self.approximate_count
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'approximate_count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,135 @@
+# orders/payment_service.py
+import json
+import os
+
+import requests
+from django.conf import settings
+from django.db import transaction
+
+from . import http_client
+from .models import Order, Transaction
+
+# کدهای پاسخ verify زرین‌پال: ۱۰۰ = موفق، ۱۰۱ = قبلاً وریفای شده
+VERIFY_SUCCESS_CODES = (100, 101)
+
+
+def _settle(payment, status, gateway_response, order_status, notes, ref_id=None):
+    """
+    تراکنش PENDING را فقط یک بار نهایی می‌کند (UPDATE شرطی روی status=PENDING) و در همان تراکنش
+    دیتابیس وضعیت سفارش را تغییر می‌دهد. اگر درخواست هم‌زمان دیگری زودتر نهایی کرده باشد False برمی‌گرداند.
+    """
+    fields = {'status': status, 'gateway_response': gateway_response}
+    if ref_id is not None:
+        fields['ref_id'] = ref_id
+    settled = Transaction.objects.filter(
+        pk=payment.pk, status=Transaction.TransactionStatusChoices.PENDING
+    ).update(**fields)
+    if not settled:
+        print(f"Payment Callback: Transaction {payment.pk} was settled by a concurrent callback.")
+        payment.refresh_from_db(fields=['status', 'ref_id', 'gateway_response'])
+        return False
+
+    for field, value in fields.items():
+        setattr(payment, field, value)
+    payment.order.change_status(new_status=order_status, notes=notes)
+    return True
+
+
+def _verify(payment, authority):
+    """
+    فراخوانی API وریفای زرین‌پال. (res_json, None) یا (None, توضیح خطا) برمی‌گرداند.
+    خطای شبکه/پاسخ نامعتبر تراکنش را PENDING نگه می‌دارد تا callback بعدی (یا رفرش کاربر) دوباره وریفای کند؛
+    وریفای زرین‌پال برای پرداخت قبلاً وریفای شده کد ۱۰۱ برمی‌گرداند، پس تکرار آن امن است.
+    """
+    merchant_id = os.environ.get('ZARINPAL_MERCHANT_ID') # یا settings.ZARINPAL_MERCHANT_ID
+    verify_url = getattr(settings, 'ZARINPAL_VERIFY_URL', None)
+    if not merchant_id or not verify_url:
+        return None, "Configuration Error: Cannot verify."
+
+    verify_payload = {
+        "merchant_id": merchant_id,
+        "amount": int(payment.amount), # مبلغ تراکنش به ریال
+        "authority": authority,
+    }
+    print(f"Sending verification request to {verify_url} with payload: {verify_payload}")
+    try:
+        response = http_client.post(
+            verify_url, data=json.dumps(verify_payload), headers={'content-type': 'application/json'}
+        )
+        response.raise_for_status()
+        return response.json(), None
+    except requests.exceptions.Timeout:
+        return None, "خطای Timeout در ارتباط با درگاه پرداخت."
+    except requests.exceptions.RequestException as e:
+        return None, f"خطای شبکه در ارتباط با درگاه پرداخت: {e}"
+    except ValueError:
+        return None, "پاسخ دریافتی از درگاه پرداخت معتبر نبود."
+
+
+def process_zarinpal_callback(authority, callback_status):
+    """
+    callback زرین‌پال را به صورت idempotent پردازش می‌کند و تراکنش (یا None اگر authority ناشناخته باشد) برمی‌گرداند.
+
+    - authority کلید idempotency است (یکتا روی Transaction.gateway_reference_id)؛
+    - ردیف تراکنش با select_for_update قفل می‌شود، پس callback های تکراری هم‌زمان (رفرش مرورگر، ارسال دوباره
+      درگاه) پشت سر هم اجرا می‌شوند و فقط اولی verify را صدا می‌زند؛
+    - تراکنشی که قبلاً SUCCESS/FAILED شده بدون هیچ درخواست خروجی همان نتیجه را برمی‌گرداند؛
+    - تغییر تراکنش، وضعیت سفارش، لاگ و پیامک صف شده همه در یک commit ثبت می‌شوند.
+    """
+    with transaction.atomic():
+        payment = (
+            Transaction.objects.select_for_update(of=('self',))
+            .select_related('order')
+            .filter(gateway_reference_id=authority)
+            .first()
+        )
+        if payment is None:
+            print(f"Callback ERROR: No transaction found for Authority: {authority}")
+            return None
+
+        if payment.status != Transaction.TransactionStatusChoices.PENDING:
+            print(f"Transaction {payment.pk} already settled as {payment.status}. Skipping verification.")
+            return payment
+
+        if callback_status != 'OK':
+            print(f"Callback status is '{callback_status}'. Payment failed or cancelled by user.")
+            _settle(
+                payment, Transaction.TransactionStatusChoices.FAILED, f"Callback Status: {callback_status}",
+                Order.OrderStatusChoices.PAYMENT_FAILED,
+                f"پرداخت توسط کاربر لغو شد یا در درگاه ناموفق بود. وضعیت بازگشتی: {callback_status}",
+            )
+            return payment
+
+        res_json, error_note = _verify(payment, authority)
+        if error_note:
+            print(f"Verification ERROR: {error_note}")
+            return payment
+
+        res_data = res_json.get('data', {})
+        res_errors = res_json.get('errors', [])
+        print(f"Verification response received: data={res_data}, errors={res_errors}")
+        verification_code = res_data.get('code') if isinstance(res_data, dict) else None
+
+        if verification_code in VERIFY_SUCCESS_CODES:
+            ref_id = res_data.get('ref_id')
+            print(f"Verification SUCCESS (code {verification_code})! Ref ID: {ref_id}")
+            notes = (
+                "پرداخت با موفقیت توسط درگاه تایید شد." if verification_code == 100
+                else "پرداخت قبلاً تایید شده بود، وضعیت سفارش همگام‌سازی شد."
+            )
+            _settle(
+                payment, Transaction.TransactionStatusChoices.SUCCESS, json.dumps(res_data),
+                Order.OrderStatusChoices.PROCESSING, notes,
+                ref_id=str(ref_id) if ref_id is not None else None,
+            )
+        else:
+            error_message = res_data.get('message') if isinstance(res_data, dict) else None
+            if not error_message and isinstance(res_errors, dict):
+                error_message = res_errors.get('message')
+            error_message = error_message or 'Verification Failed'
+            print(f"Verification FAILED! Code: {verification_code}, Message: {error_message}, Errors: {res_errors}")
+            _settle(
+                payment, Transaction.TransactionStatusChoices.FAILED, json.dumps(res_json),
+                Order.OrderStatusChoices.PAYMENT_FAILED, f"تایید پرداخت ناموفق بود: {error_message}",
+            )
+        return payment
@@ -0,0 +1,72 @@
+# orders/prefetch.py
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.db.models import Prefetch, prefetch_related_objects
+
+from products.models import Cake, PartySupply
+from .models import OrderItem
+from .serializers import requested_expansions
+
+
+class GenericProductPrefetcher:
+    """
+    محصول آیتم‌های سفارش (content_object) را به تفکیک نوع محصول، برای هر نوع با یک کوئری
+    و با plan مخصوص همان مدل (select_related/prefetch_related) بارگذاری و روی آیتم‌ها کش می‌کند
+    تا سریالایزرها دیگر سراغ دیتابیس نروند.
+
+    - حالت پیش‌فرض فقط داده‌های OrderLineProductSnapshotSerializer را بارگذاری می‌کند.
+    - با expand=True (یعنی ?expand=product) روابط لازم برای CakeSerializer و
+      PartySupplySerializer هم بارگذاری می‌شود. is_wishlisted از wishlisted_cake_ids (یک کوئری برای
+      کل درخواست) خوانده می‌شود، پس اینجا annotation جداگانه‌ای لازم نیست.
+    """
+
+    SNAPSHOT_PLANS = {
+        Cake: {'select_related': ['category']},
+        PartySupply: {'select_related': ['type']},
+    }
+    FULL_PLANS = {
+        Cake: {
+            'select_related': ['category'],
+            'prefetch_related': ['available_flavors', 'images', 'size_variants__size', 'tags'],
+        },
+        PartySupply: {
+            'select_related': ['type'],
+            'prefetch_related': ['colors', 'themes'],
+        },
+    }
+
+    def __init__(self, expand=False):
+        self.expand = expand
+
+    @classmethod
+    def for_request(cls, request):
+        """plan مناسب را بر اساس ?expand=product انتخاب می‌کند."""
+        if request is None:
+            return cls()
+        expand = 'product' in requested_expansions({'request': request})
+        return cls(expand=expand)
+
+    def queryset_for(self, model):
+        plans = self.FULL_PLANS if self.expand else self.SNAPSHOT_PLANS
+        plan = plans[model]
+        return model.objects.select_related(*plan.get('select_related', [])).prefetch_related(
+            *plan.get('prefetch_related', [])
+        )
+
+    def as_generic_prefetch(self, lookup='content_object'):
+        plans = self.FULL_PLANS if self.expand else self.SNAPSHOT_PLANS
+        return GenericPrefetch(lookup, [self.queryset_for(model) for model in plans])
+
+    def items_prefetch(self, lookup='items'):
+        """Prefetch آیتم‌های سفارش به همراه محصول، طعم و اندازه (برای Order.prefetch_related)."""
+        return Prefetch(
+            lookup,
+            queryset=OrderItem.objects.select_related('flavor', 'size_variant__size').prefetch_related(
+                self.as_generic_prefetch()
+            ),
+        )
+
+    def prefetch(self, items):
+        """برای لیستی از OrderItem های از قبل بارگذاری شده."""
+        items = list(items)
+        prefetch_related_objects(items, self.as_generic_prefetch())
+        return items
@@ -0,0 +1,163 @@
+# orders/render_jobs.py
+import hashlib
+import json
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.http import HttpRequest, QueryDict
+from django.template.loader import render_to_string
+from django.utils import timezone
+from rest_framework.request import Request
+
+from .invoice_cache import cached_invoice_path, load_invoice_order, render_invoice_html, store_invoice_pdf
+from .models import RenderJob
+
+# درخواست‌های یکسان (همان نوع و همان فیلترها) در این بازه به همان کار قبلی وصل می‌شوند
+DEDUPE_TTL = timedelta(seconds=getattr(settings, 'RENDER_JOB_DEDUPE_TTL_SECONDS', 300))
+# کارهایی که بیش از این مدت RUNNING مانده‌اند (مثلاً worker از کار افتاده) دوباره در صف قرار می‌گیرند
+STALE_AFTER = timedelta(seconds=getattr(settings, 'RENDER_JOB_STALE_AFTER_SECONDS', 900))
+MAX_ATTEMPTS = getattr(settings, 'RENDER_JOB_MAX_ATTEMPTS', 3)
+
+def normalize_query_params(query_params):
+    """QueryDict را به dict مرتب (کلید -> لیست مقادیر) تبدیل می‌کند تا فیلترهای یکسان هش یکسان بدهند."""
+    return {key: sorted(query_params.getlist(key)) for key in sorted(query_params.keys())}
+
+
+def compute_params_hash(kind, params):
+    # base_url فقط برای پیدا کردن فایل‌های استاتیک است و در محتوای خروجی اثری ندارد
+    params = {key: value for key, value in params.items() if key != 'base_url'}
+    payload = json.dumps([kind, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def enqueue_render_job(kind, params, user=None):
+    """
+    یک کار ساخت فایل در صف ثبت می‌کند و (job, created) برمی‌گرداند.
+    اگر کاری با همان نوع و پارامترها در صف/در حال اجرا باشد یا در DEDUPE_TTL اخیر
+    تمام شده باشد، همان کار برگردانده می‌شود.
+    """
+    digest = compute_params_hash(kind, params)
+    recent = RenderJob.objects.filter(kind=kind, params_hash=digest).filter(
+        Q(status__in=[RenderJob.StatusChoices.QUEUED, RenderJob.StatusChoices.RUNNING])
+        | Q(status=RenderJob.StatusChoices.DONE, finished_at__gte=timezone.now() - DEDUPE_TTL)
+    ).order_by('-created_at').first()
+    # کار تمام شده فقط وقتی قابل استفاده است که فایلش هنوز وجود داشته باشد (مثلاً کش فاکتور پاک نشده باشد)
+    if recent and (recent.status != RenderJob.StatusChoices.DONE or (recent.file and default_storage.exists(recent.file.name))):
+        return recent, False
+    job = RenderJob.objects.create(kind=kind, params=params, params_hash=digest, requested_by=user)
+    return job, True
+
+
+def claim_jobs(limit):
+    """
+    حداکثر limit کار در صف را (قدیمی‌ترین اول) به RUNNING می‌برد و شناسه‌هایشان را برمی‌گرداند.
+    روی PostgreSQL با SKIP LOCKED چند worker هم‌زمان کار تکراری برنمی‌دارند.
+    """
+    if limit <= 0:
+        return []
+    with transaction.atomic():
+        queued = RenderJob.objects.filter(status=RenderJob.StatusChoices.QUEUED).order_by('created_at')
+        if connection.features.has_select_for_update_skip_locked:
+            queued = queued.select_for_update(skip_locked=True)
+        job_ids = list(queued.values_list('pk', flat=True)[:limit])
+        if job_ids:
+            RenderJob.objects.filter(pk__in=job_ids, status=RenderJob.StatusChoices.QUEUED).update(
+                status=RenderJob.StatusChoices.RUNNING,
+                started_at=timezone.now(),
+                attempts=F('attempts') + 1,
+            )
+    return job_ids
+
+
+def requeue_stale_jobs():
+    """کارهای گیر کرده در RUNNING را دوباره در صف می‌گذارد (یا پس از MAX_ATTEMPTS ناموفق می‌کند)."""
+    stale = RenderJob.objects.filter(
+        status=RenderJob.StatusChoices.RUNNING, started_at__lt=timezone.now() - STALE_AFTER
+    )
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=RenderJob.StatusChoices.FAILED, finished_at=timezone.now(), error='Worker did not finish the job in time.'
+    )
+    requeued = stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=RenderJob.StatusChoices.QUEUED)
+    return requeued, failed
+
+
+def filtered_admin_orders(query):
+    """
+    همان کوئری‌ست فیلتر شده AdminOrderViewSet (فیلترها، جستجو، مرتب‌سازی و date_filter)
+    را از روی پارامترهای ذخیره شده در کار بازسازی می‌کند.
+    """
+    from .views import AdminOrderViewSet # جلوگیری از import چرخشی
+
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = QueryDict(mutable=True)
+    for key, values in query.items():
+        http_request.GET.setlist(key, values)
+
+    view = AdminOrderViewSet(action='export_pdf', kwargs={}, format_kwarg=None)
+    view.request = Request(http_request)
+    return view.filter_queryset(view.get_queryset())
+
+
+def html_to_pdf(html_string, base_url):
+    from weasyprint import HTML
+    # base_url برای یافتن فایل‌های استاتیک (مثل فونت یا تصاویر) مهم است
+    return HTML(string=html_string, base_url=base_url).write_pdf()
+
+
+def render_order_list_pdf(job):
+    """PDF لیست سفارش‌ها؛ (نام فایل، محتوا) برمی‌گرداند."""
+    queryset = filtered_admin_orders(job.params.get('query', {}))
+    html_string = render_to_string('orders/admin_order_list_pdf.html', {'orders': queryset})
+    return 'orders_export.pdf', html_to_pdf(html_string, job.params.get('base_url'))
+
+
+def render_invoice_pdf(job):
+    """
+    PDF فاکتور از کش محتوا-محور invoice_cache؛ فقط اگر نسخه‌ای با همین HTML وجود نداشت
+    WeasyPrint اجرا می‌شود. (مسیر فایل ذخیره شده، None) برمی‌گرداند.
+    """
+    order = load_invoice_order(job.params['order_id'])
+    html_string, content_hash = render_invoice_html(order)
+    path = cached_invoice_path(order.id, content_hash)
+    if path is None:
+        pdf_bytes = html_to_pdf(html_string, job.params.get('base_url'))
+        path = store_invoice_pdf(order.id, content_hash, pdf_bytes)
+    return path, None
+
+
+RENDERERS = {
+    RenderJob.KindChoices.ORDER_LIST_PDF: render_order_list_pdf,
+    RenderJob.KindChoices.INVOICE_PDF: render_invoice_pdf,
+}
+
+
+def execute_render_job(job_id):
+    """
+    یک کار RUNNING را اجرا کرده و فایل خروجی را در MEDIA_ROOT ذخیره می‌کند.
+    در پردازه‌های worker (ProcessPoolExecutor) اجرا می‌شود.
+    """
+    job = RenderJob.objects.get(pk=job_id)
+    try:
+        name, content = RENDERERS[job.kind](job)
+        if content is None:
+            # فایل از قبل در storage ذخیره شده (مثلاً کش فاکتور)
+            job.file.name = name
+        else:
+            job.file.save(name, ContentFile(content), save=False)
+        job.status = RenderJob.StatusChoices.DONE
+        job.error = ''
+    except Exception:
+        print(f"!!! RenderJob {job.id} failed:")
+        job.error = traceback.format_exc()
+        print(job.error)
+        job.status = RenderJob.StatusChoices.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'error', 'finished_at'])
+    return job.id, job.status
+
@@ -0,0 +1,197 @@
+# orders/sales_rollups.py
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .date_presets import PRESET_NAMES, jalali_month_bounds, local_midnight, preset_dates
+from .models import DailyProductSales, DailySalesRollup, Order, OrderItem
+
+# سفارش‌هایی که در این وضعیت‌ها (و حذف نشده) هستند فروش قطعی حساب می‌شوند
+SALES_STATUSES = (
+    Order.OrderStatusChoices.PROCESSING,
+    Order.OrderStatusChoices.SHIPPED,
+    Order.OrderStatusChoices.DELIVERED,
+)
+
+
+def counts_as_sale(status, is_deleted=False):
+    return status in SALES_STATUSES and not is_deleted
+
+
+# --- به‌روزرسانی تدریجی ---
+# فقط ورود/خروج سفارش از وضعیت‌های فروش (تغییر وضعیت، حذف نرم/کامل) تدریجی اعمال می‌شود. ویرایش آیتم‌ها
+# یا مبلغ سفارشی که از قبل فروش حساب شده (مثلاً سفارش PROCESSING که ادمین آیتمش را عوض می‌کند) در rollup ها
+# دیده نمی‌شود؛ برای همین فرمان rebuild_sales_rollups --days N باید به صورت زمان‌بندی شده (مثلاً شبانه با cron)
+# اجرا شود تا روزهایی که سفارش‌هایشان هنوز ممکن است ویرایش شوند از نو ساخته شوند.
+
+def _increment(model, keys, **deltas):
+    """ردیف rollup با کلیدهای داده شده را (در صورت نبود) می‌سازد و مقادیرش را با F() زیاد/کم می‌کند."""
+    row, _ = model.objects.get_or_create(**keys)
+    model.objects.filter(pk=row.pk).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def apply_orders_to_rollups(order_ids, sign):
+    """
+    سهم سفارش‌های داده شده را به rollup ها اضافه (sign=1) یا از آن‌ها کم (sign=-1) می‌کند.
+    برای هر روز و هر (روز، محصول) فقط یک UPDATE اجرا می‌شود، نه برای هر سفارش.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+
+    days = {}
+    per_day = defaultdict(lambda: [0, Decimal('0')])
+    for order_id, created_at, total_price in Order.all_objects.filter(pk__in=order_ids).values_list(
+        'pk', 'created_at', 'total_price'
+    ):
+        day = days[order_id] = timezone.localdate(created_at)
+        per_day[day][0] += 1
+        per_day[day][1] += total_price or 0
+
+    per_product = defaultdict(lambda: [0, Decimal('0')])
+    for order_id, content_type_id, object_id, quantity, price in OrderItem.objects.filter(
+        order_id__in=order_ids
+    ).values_list('order_id', 'content_type_id', 'object_id', 'quantity', 'price_at_order'):
+        key = (days[order_id], content_type_id, object_id)
+        per_product[key][0] += quantity
+        per_product[key][1] += quantity * (price or 0)
+
+    with transaction.atomic():
+        for day, (order_count, total_sales) in per_day.items():
+            _increment(
+                DailySalesRollup, {'date': day},
+                order_count=sign * order_count, total_sales=sign * total_sales,
+            )
+        for (day, content_type_id, object_id), (quantity, revenue) in per_product.items():
+            _increment(
+                DailyProductSales, {'date': day, 'content_type_id': content_type_id, 'object_id': object_id},
+                quantity_sold=sign * quantity, revenue=sign * revenue,
+            )
+
+
+def apply_sales_transition(order_id, previous_state, current_state):
+    """
+    previous_state / current_state: (status, is_deleted) سفارش قبل و بعد از ذخیره
+    (previous_state برای سفارش جدید None است).
+    """
+    was_sale = previous_state is not None and counts_as_sale(*previous_state)
+    is_sale = counts_as_sale(*current_state)
+    if was_sale != is_sale:
+        apply_orders_to_rollups([order_id], 1 if is_sale else -1)
+
+
+def apply_bulk_status_transition(previous_statuses, new_status):
+    """برای تغییر وضعیت گروهی: previous_statuses دیکشنری {order_id: وضعیت قبلی} است."""
+    entering = [pk for pk, old in previous_statuses.items() if not counts_as_sale(old) and counts_as_sale(new_status)]
+    leaving = [pk for pk, old in previous_statuses.items() if counts_as_sale(old) and not counts_as_sale(new_status)]
+    apply_orders_to_rollups(entering, 1)
+    apply_orders_to_rollups(leaving, -1)
+
+
+# --- ساخت دوباره از روی سفارش‌ها ---
+
+def rebuild_sales_rollups(start=None, end=None):
+    """
+    rollup های روزهای [start, end] (یا همه روزها) را پاک کرده و از روی سفارش‌ها دوباره می‌سازد.
+    تعداد ردیف‌های (روزانه، محصول-روز) ساخته شده را برمی‌گرداند.
+    """
+    orders = Order.objects.filter(status__in=SALES_STATUSES)
+    daily_rows = DailySalesRollup.objects.all()
+    product_rows = DailyProductSales.objects.all()
+    if start:
+        orders = orders.filter(created_at__gte=local_midnight(start))
+        daily_rows = daily_rows.filter(date__gte=start)
+        product_rows = product_rows.filter(date__gte=start)
+    if end:
+        orders = orders.filter(created_at__lt=local_midnight(end + timedelta(days=1)))
+        daily_rows = daily_rows.filter(date__lte=end)
+        product_rows = product_rows.filter(date__lte=end)
+
+    # TruncDate با منطقه زمانی فعلی (TIME_ZONE) کار می‌کند، مثل timezone.localdate در به‌روزرسانی تدریجی
+    daily = orders.annotate(day=TruncDate('created_at')).values('day').annotate(
+        count=Count('id'), total=Sum('total_price')
+    ).order_by()
+    products = OrderItem.objects.filter(order__in=orders).annotate(
+        day=TruncDate('order__created_at')
+    ).values('day', 'content_type_id', 'object_id').annotate(
+        sold=Sum('quantity'),
+        sold_revenue=Sum(ExpressionWrapper(F('quantity') * F('price_at_order'), output_field=DecimalField())),
+    ).order_by()
+
+    with transaction.atomic():
+        daily_rows.delete()
+        product_rows.delete()
+        created_daily = DailySalesRollup.objects.bulk_create(
+            [DailySalesRollup(date=row['day'], order_count=row['count'], total_sales=row['total'] or 0) for row in daily],
+            batch_size=1000,
+        )
+        created_products = DailyProductSales.objects.bulk_create(
+            [
+                DailyProductSales(
+                    date=row['day'], content_type_id=row['content_type_id'], object_id=row['object_id'],
+                    quantity_sold=row['sold'] or 0, revenue=row['sold_revenue'] or 0,
+                )
+                for row in products
+            ],
+            batch_size=1000,
+        )
+    return len(created_daily), len(created_products)
+
+
+# --- بازه‌های گزارش ---
+
+_PERIOD_RE = re.compile(r'^(\d{1,4})([dy])$')
+
+
+def resolve_sales_period(query_params, default='7d'):
+    """
+    بازه گزارش را به صورت (روز شروع، روز پایان) هر دو شامل برمی‌گرداند:
+    - ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
+    - ?jalali_month=1403-05 (یک ماه شمسی کامل)
+    - ?period=7d / 30d / 90d / 1y ... (N روز یا N سال اخیر تا امروز)
+    - ?period=this_shamsi_month و سایر بازه‌های آماده date_presets
+    برای مقدار نامعتبر ValueError می‌دهد.
+    """
+    today = timezone.localdate()
+
+    start_raw, end_raw = query_params.get('start_date'), query_params.get('end_date')
+    if start_raw or end_raw:
+        start = date.fromisoformat(start_raw) if start_raw else today
+        end = date.fromisoformat(end_raw) if end_raw else today
+        if start > end:
+            raise ValueError("start_date must not be after end_date.")
+        return start, end
+
+    jalali_month = query_params.get('jalali_month')
+    if jalali_month:
+        year, month = (int(part) for part in jalali_month.split('-'))
+        first, next_first = jalali_month_bounds(year, month)
+        return first, next_first - timedelta(days=1)
+
+    period = query_params.get('period') or default
+    if period in PRESET_NAMES:
+        return preset_dates(period, today)
+
+    match = _PERIOD_RE.match(period)
+    if not match:
+        raise ValueError(f"Unknown period '{period}'. Use Nd, Ny or one of: {', '.join(PRESET_NAMES)}.")
+    amount, unit = int(match.group(1)), match.group(2)
+    if amount <= 0:
+        raise ValueError("period must be positive.")
+    if unit == 'd':
+        return today - timedelta(days=amount - 1), today # شامل امروز
+    try:
+        year_ago = today.replace(year=today.year - amount)
+    except ValueError: # ۲۹ فوریه
+        year_ago = today.replace(year=today.year - amount, day=28)
+    return year_ago + timedelta(days=1), today
+
+
+def has_period_params(query_params):
+    return any(query_params.get(key) for key in ('period', 'start_date', 'end_date', 'jalali_month'))
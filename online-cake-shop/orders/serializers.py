@@ -5,11 +5,15 @@ from django.db import transaction
 # ایمپورت ValidationError برای استفاده در اعتبارسنجی
 from rest_framework.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import default_storage
+from django.urls import reverse
 
 from products.serializers import CakeSerializer, PartySupplySerializer
 from users.serializers import AddressSerializer
 # ایمپورت مدل‌ها
-from .models import CakeSizeVariant,OrderStatusLog,InternalOrderNote,Order, OrderItem, CustomDesign, OrderAddon, Transaction, Notification,SMSTemplate
+from .models import CakeSizeVariant,OrderStatusLog,InternalOrderNote,Order, OrderItem, CustomDesign, OrderAddon, Transaction, Notification,SMSTemplate,RenderJob
+from .sms_templates import SMS_PLACEHOLDERS, unknown_placeholders
 from products.models import Cake, Flavor, PartySupply, Size, Addon
 from users.models import Address,CustomUser
 
@@ -73,9 +77,79 @@ class SizeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'estimated_weight_kg'] # وزن برای نمایش احتمالی؟
         read_only_fields = fields
 
+def requested_expansions(context):
+    """
+    مقادیر پارامتر ?expand=... درخواست (مثلاً ?expand=product) را به صورت set برمی‌گرداند.
+    """
+    request = context.get('request') if context else None
+    if request is None:
+        return set()
+    raw = request.query_params.get('expand', '')
+    return {part.strip() for part in raw.split(',') if part.strip()}
+
+
+class OrderLineProductSnapshotSerializer(serializers.Serializer):
+    """
+    نمایش فشرده محصول یک آیتم سفارش (کیک یا لوازم جشن) به همراه طعم و اندازه انتخاب شده.
+    ورودی این سریالایزر خود OrderItem است؛ برای آیتم‌های دارای snapshot فقط از فیلدهای
+    ثابت شده خود آیتم می‌خواند و برای سبد خرید از محصول زنده (که باید prefetch شده باشد).
+    """
+    id = serializers.SerializerMethodField()
+    type = serializers.SerializerMethodField()
+    slug = serializers.SerializerMethodField()
+    name = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
+    category_name = serializers.SerializerMethodField()
+    flavor = serializers.SerializerMethodField()
+    size = serializers.SerializerMethodField()
+
+    def get_id(self, obj: OrderItem):
+        return obj.object_id
+
+    def get_type(self, obj: OrderItem):
+        # get_for_id از کش ContentType استفاده می‌کند
+        return ContentType.objects.get_for_id(obj.content_type_id).model
+
+    def get_slug(self, obj: OrderItem):
+        return obj.product_slug if obj.has_snapshot else obj.content_object.slug
+
+    def get_name(self, obj: OrderItem):
+        return obj.display_name
+
+    def get_thumbnail(self, obj: OrderItem):
+        image_path = obj.product_image if obj.has_snapshot else obj.content_object.image.name
+        if not image_path:
+            return None
+        url = default_storage.url(image_path)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_category_name(self, obj: OrderItem):
+        if obj.has_snapshot:
+            return obj.product_category_name or None
+        product = obj.content_object
+        # کیک دسته‌بندی دارد و لوازم جشن نوع (SupplyType)
+        group = product.category if isinstance(product, Cake) else getattr(product, 'type', None)
+        return group.name if group else None
+
+    def get_flavor(self, obj: OrderItem):
+        return {'id': obj.flavor_id, 'name': obj.display_flavor_name} if obj.flavor_id else None
+
+    def get_size(self, obj: OrderItem):
+        if not obj.size_variant_id:
+            return None
+        if obj.has_snapshot:
+            return {'id': obj.size_variant.size_id, 'name': obj.size_name, 'weight_kg': obj.unit_weight_kg}
+        if not obj.size_variant.size_id:
+            return None
+        size = obj.size_variant.size
+        return {'id': size.id, 'name': size.name, 'weight_kg': size.estimated_weight_kg}
+
+
 class OrderItemReadSerializer(serializers.ModelSerializer):
     """
-    آیتم سفارش را با جزئیات کامل محصول (کیک یا لوازم جشن) نمایش می‌دهد.
+    آیتم سفارش را به همراه خلاصه محصول (کیک یا لوازم جشن) نمایش می‌دهد.
+    جزئیات کامل محصول فقط با ?expand=product برگردانده می‌شود.
     """
     # این فیلد جدید، جزئیات محصول را به صورت داینامیک نمایش خواهد داد
     product = serializers.SerializerMethodField()
@@ -93,8 +167,15 @@ class OrderItemReadSerializer(serializers.ModelSerializer):
 
     def get_product(self, obj: OrderItem):
         """
-        بر اساس نوع محصول در OrderItem، از سریالایزر مناسب استفاده می‌کند.
+        به صورت پیش‌فرض خلاصه محصول (OrderLineProductSnapshotSerializer) را برمی‌گرداند؛
+        با ?expand=product از سریالایزر کامل مربوط به نوع محصول استفاده می‌کند.
         """
+        if 'product' not in requested_expansions(self.context):
+            # آیتم‌های دارای snapshot حتی اگر محصول حذف شده باشد نمایش داده می‌شوند
+            if obj.has_snapshot or obj.content_object is not None:
+                return OrderLineProductSnapshotSerializer(obj, context=self.context).data
+            return None
+
         product_instance = obj.content_object
 
         if isinstance(product_instance, Cake):
@@ -113,7 +194,6 @@ class OrderItemReadSerializer(serializers.ModelSerializer):
             # اگر محصول لوازم جشن است، از سریالایزر مربوط به خودش استفاده می‌کنیم
             return PartySupplySerializer(product_instance, context=self.context).data
             
-        # اگر محصول به هر دلیلی حذف شده یا در دسترس نیست
         return None
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -505,6 +585,15 @@ class SMSTemplateSerializer(serializers.ModelSerializer):
         if value not in valid_triggers:
             raise serializers.ValidationError(f"مقدار '{value}' برای event_trigger معتبر نیست.")
         return value
+    def validate_message_template(self, value):
+        """متغیرهای ناشناخته (مثلاً {{custmer_name}}) همان موقع ذخیره گزارش می‌شوند، نه در پیامک مشتری."""
+        unknown = unknown_placeholders(value)
+        if unknown:
+            raise serializers.ValidationError(
+                f"متغیرهای ناشناخته: {', '.join('{{%s}}' % name for name in unknown)}. "
+                f"متغیرهای مجاز: {', '.join('{{%s}}' % name for name in SMS_PLACEHOLDERS)}."
+            )
+        return value
     def update(self, instance, validated_data):
         """
         این متد به ما اجازه می‌دهد که فقط فیلدهایی که در درخواست PATCH آمده‌اند را آپدیت کنیم.
@@ -536,3 +625,30 @@ class InternalOrderNoteSerializer(serializers.ModelSerializer):
     # اما در این سناریو، user از request.user در ویو گرفته می‌شود، پس نیازی نیست.
     
 
+
+class RenderJobSerializer(serializers.ModelSerializer):
+    """وضعیت یک کار ساخت PDF در صف؛ download_url فقط وقتی فایل آماده است پر می‌شود."""
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RenderJob
+        fields = [
+            'id', 'kind', 'kind_display', 'status', 'status_display', 'error',
+            'created_at', 'started_at', 'finished_at', 'status_url', 'download_url',
+        ]
+        read_only_fields = fields
+
+    def _absolute(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_status_url(self, obj):
+        return self._absolute(reverse('admin-render-job-detail', args=[obj.pk]))
+
+    def get_download_url(self, obj):
+        if obj.status != RenderJob.StatusChoices.DONE or not obj.file:
+            return None
+        return self._absolute(reverse('admin-render-job-download', args=[obj.pk]))
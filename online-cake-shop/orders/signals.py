@@ -1,8 +1,10 @@
 # orders/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
 from django.dispatch import receiver
 from django.conf import settings # برای دسترسی به مدل کاربر فعلی
-from .models import Order, OrderStatusLog
+from django.db import transaction
+from .models import Order, OrderStatusLog, OrderItem, OrderAddon, SMSTemplate
+from users.models import Address
 # برای گرفتن کاربر فعلی در سیگنال‌ها (اگر تغییر توسط ادمین از پنل جنگو است یا نیاز به لاگ کردن کاربر سیستم دارید)
 # این بخش می‌تواند پیچیده باشد. ساده‌ترین حالت این است که changed_by را null بگذاریم یا از request.user در ویو بگیریم.
 # فعلاً فرض می‌کنیم changed_by می‌تواند null باشد یا در ویو ست شود.
@@ -14,6 +16,8 @@ def log_order_status_change(sender, instance, created, raw, using, update_fields
     """
     if raw: # اگر داده‌ها از fixture لود می‌شوند، کاری نکن
         return
+    if getattr(instance, '_skip_status_log', False): # Order.change_status لاگ خودش را ثبت می‌کند
+        return
 
     # اگر فیلد status در لیست فیلدهای آپدیت شده وجود دارد یا اگر یک سفارش جدید ایجاد شده
     # (برای created، فرض می‌کنیم وضعیت اولیه هم یک نوع لاگ است)
@@ -48,4 +52,168 @@ def log_order_status_change(sender, instance, created, raw, using, update_fields
             # changed_by= ؟ (نیاز به منطق برای گرفتن کاربر فعلی)
             # notes= "وضعیت به ... تغییر یافت" (می‌توانید یک یادداشت پیش‌فرض بگذارید)
         )
-        print(f"Order {instance.id} status logged as {instance.status}")
\ No newline at end of file
+        print(f"Order {instance.id} status logged as {instance.status}")
+
+
+def _deleted_with_order(origin):
+    """اگر حذف از خود سفارش شروع شده باشد، به‌روزرسانی قیمت کل آن بی‌معنی است."""
+    return isinstance(origin, Order) or getattr(origin, 'model', None) is Order
+
+
+@receiver(post_delete, sender=OrderItem)
+def subtract_deleted_item_from_order_total(sender, instance, origin=None, **kwargs):
+    """
+    مبلغ آیتم حذف شده را از total_price سفارش کم می‌کند.
+    افزودنی‌های آیتم (که به صورت cascade حذف می‌شوند) در گیرنده خودشان کم می‌شوند.
+    """
+    if _deleted_with_order(origin):
+        return
+    Order.apply_total_delta(instance.order_id, -instance.total_price)
+
+
+@receiver(post_delete, sender=OrderAddon)
+def subtract_deleted_addon_from_order_total(sender, instance, origin=None, **kwargs):
+    if _deleted_with_order(origin):
+        return
+    OrderAddon.apply_item_total_delta(instance.order_item_id, -instance.total_price)
+
+
+# --- کش PDF فاکتور (invoice_cache) ---
+# فایل‌های کش با هش محتوا نام‌گذاری شده‌اند، پس نسخه قدیمی هیچ‌وقت به اشتباه سرو نمی‌شود؛
+# این گیرنده‌ها فقط فایل‌های منسوخ را (بعد از commit و فقط برای سفارش‌های دارای invoice_cached)
+# پاک می‌کنند و فاکتور سفارش‌های تحویل شده را از قبل می‌سازند.
+
+@receiver(post_save, sender=Order)
+def refresh_invoice_cache_on_order_change(sender, instance, created, raw, update_fields, **kwargs):
+    if raw or created:
+        return
+    if update_fields is not None and not {'status', 'address'} & set(update_fields):
+        return
+    from .invoice_cache import invalidate_invoice_cache_on_commit, prewarm_invoice
+    invalidate_invoice_cache_on_commit(Order.all_objects.filter(pk=instance.pk))
+    if instance.status == Order.OrderStatusChoices.DELIVERED:
+        # بعد از commit (و بعد از پاک شدن کش قبلی)، تا worker داده نهایی سفارش را ببیند
+        transaction.on_commit(lambda: prewarm_invoice(instance.pk))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_invoice_cache_on_item_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .invoice_cache import invalidate_invoice_cache_on_commit
+    invalidate_invoice_cache_on_commit(Order.all_objects.filter(pk=instance.order_id))
+
+
+@receiver(post_save, sender=OrderAddon)
+@receiver(post_delete, sender=OrderAddon)
+def invalidate_invoice_cache_on_addon_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .invoice_cache import invalidate_invoice_cache_on_commit
+    # سفارش آیتم در همان کوئری بعد از commit پیدا می‌شود (اگر آیتم هم حذف شده باشد، گیرنده آیتم کش را پاک کرده)
+    invalidate_invoice_cache_on_commit(
+        Order.all_objects.filter(pk__in=OrderItem.objects.filter(pk=instance.order_item_id).values('order_id'))
+    )
+
+
+# --- کش آمار داشبورد ادمین (orders/dashboard.py) ---
+
+@receiver(post_save, sender=Order)
+def invalidate_dashboard_stats_on_order_change(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if created and instance.status == Order.OrderStatusChoices.CART:
+        return # سبد خرید در آمار داشبورد شمرده نمی‌شود
+    if update_fields is not None and not {'status', 'is_deleted'} & set(update_fields):
+        return
+    from .dashboard import invalidate_dashboard_stats
+    invalidate_dashboard_stats()
+
+
+# --- rollup های فروش روزانه (orders/sales_rollups.py) ---
+
+@receiver(pre_save, sender=Order)
+def remember_previous_sales_state(sender, instance, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if instance._state.adding:
+        instance._previous_sales_state = None
+    elif hasattr(instance, '_loaded_sales_state'):
+        instance._previous_sales_state = instance._loaded_sales_state
+    else:
+        # سفارش از دیتابیس خوانده نشده (یا فیلدها defer شده‌اند)
+        instance._previous_sales_state = Order.all_objects.filter(pk=instance.pk).values_list('status', 'is_deleted').first()
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollups_on_order_change(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    from .sales_rollups import apply_sales_transition
+    current_state = (instance.status, instance.is_deleted)
+    apply_sales_transition(instance.pk, getattr(instance, '_previous_sales_state', None), current_state)
+    instance._loaded_sales_state = current_state
+
+
+@receiver(pre_delete, sender=Order)
+def remove_deleted_order_from_sales_rollups(sender, instance, **kwargs):
+    # قبل از حذف، چون آیتم‌ها هم به صورت cascade حذف می‌شوند
+    from .sales_rollups import apply_orders_to_rollups, counts_as_sale
+    stored = Order.all_objects.filter(pk=instance.pk).values_list('status', 'is_deleted').first()
+    if stored and counts_as_sale(*stored):
+        apply_orders_to_rollups([instance.pk], -1)
+
+
+# --- شاخص محصولات مشابه (products/similarity.py) ---
+
+@receiver(post_save, sender=Order)
+def refresh_cake_similarities_on_payment(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    from .sales_rollups import counts_as_sale
+    previous_state = getattr(instance, '_previous_sales_state', None)
+    if counts_as_sale(instance.status, instance.is_deleted) and not (previous_state and counts_as_sale(*previous_state)):
+        from products.similarity import schedule_similarity_refresh
+        schedule_similarity_refresh([instance.pk])
+
+
+# --- سند جستجوی ادمین سفارش‌ها (orders/order_search.py) ---
+
+@receiver(post_save, sender=Order)
+def refresh_order_search_document(sender, instance, raw, update_fields, **kwargs):
+    if raw:
+        return
+    from .order_search import ORDER_SEARCH_FIELDS, refresh_search_documents
+    if update_fields is not None and not ORDER_SEARCH_FIELDS & set(update_fields):
+        return
+    refresh_search_documents(Order.all_objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_order_search_documents_on_user_change(sender, instance, created, raw, update_fields, **kwargs):
+    if raw or created:
+        return
+    from .order_search import USER_SEARCH_FIELDS, refresh_search_documents
+    if update_fields is not None and not USER_SEARCH_FIELDS & set(update_fields):
+        return
+    refresh_search_documents(Order.all_objects.filter(user=instance))
+
+
+@receiver(post_save, sender=Address)
+def refresh_order_search_documents_on_address_change(sender, instance, created, raw, update_fields, **kwargs):
+    if raw or created:
+        return
+    from .order_search import ADDRESS_SEARCH_FIELDS, refresh_search_documents
+    if update_fields is not None and not ADDRESS_SEARCH_FIELDS & set(update_fields):
+        return
+    refresh_search_documents(Order.all_objects.filter(address=instance))
+
+
+# --- registry قالب‌های پیامک کامپایل شده (orders/sms_templates.py) ---
+
+@receiver(post_save, sender=SMSTemplate)
+@receiver(post_delete, sender=SMSTemplate)
+def invalidate_sms_template_registry(sender, **kwargs):
+    from .sms_templates import invalidate_sms_templates
+    invalidate_sms_templates()
@@ -1,179 +1,379 @@
 # core/sms_service.py (یا orders/sms_service.py)
 import requests
 from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
 from django.utils import timezone # برای sent_at
 import json
 import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
 from string import Template # برای جایگزینی ساده متغیرها
 
 # مسیر مدل‌های خود را بر اساس ساختار پروژه تنظیم کنید
 # from notifications.models import SMSTemplate, Notification # اگر در اپلیکیشن notifications هستند
 # from orders.models import Order # اگر مدل Order در اپلیکیشن orders است
 # فرض می‌کنم این مدل‌ها در همان اپلیکیشن sms_service.py یا قابل دسترس هستند:
-from .models import SMSTemplate, Notification, Order # این ایمپورت‌ها را متناسب با پروژه خود تنظیم کنید
+from . import http_client
+from .models import Notification, Order # این ایمپورت‌ها را متناسب با پروژه خود تنظیم کنید
+from .sms_templates import CompiledSMSTemplate, get_compiled_template
 
-def format_sms_message(template_string: str, order: Order) -> str:
+# --- صف ارسال (outbox) ---
+# فاصله تلاش‌های دوباره بعد از خطای موقت (شبکه، timeout، HTTP 5xx/429)؛ بعد از آخرین تلاش FAILED
+SMS_RETRY_DELAYS = tuple(
+    timedelta(seconds=seconds) for seconds in getattr(settings, 'SMS_RETRY_DELAYS', (30, 120, 600, 1800))
+)
+SMS_MAX_ATTEMPTS = len(SMS_RETRY_DELAYS) + 1
+# پیامکی که worker برداشته تا این مدت برای او رزرو است؛ اگر worker وسط کار از کار بیفتد دوباره برداشته می‌شود
+SMS_CLAIM_LEASE = timedelta(minutes=5)
+# حداکثر تعداد گیرنده در هر درخواست send/bulk یا send/likeToLike
+SMS_BATCH_SIZE = getattr(settings, 'SMS_BATCH_SIZE', 100)
+
+def order_sms_context(order: Order) -> dict:
     """
-    متغیرهای داخل قالب پیامک را با اطلاعات سفارش جایگزین می‌کند.
+    مقادیر متغیرهای قالب پیامک (SMS_PLACEHOLDERS) برای یک سفارش.
     """
     customer_name = "مشتری گرامی"
     if order.user:
         customer_name = order.user.get_full_name() or order.user.username
 
-    # اطمینان از اینکه مقادیر None به رشته خالی تبدیل می‌شوند تا در replace مشکلی ایجاد نشود
+    # اطمینان از اینکه مقادیر None به رشته خالی تبدیل می‌شوند
     tracking_number_str = str(order.tracking_code) if order.tracking_code else "ثبت نشده"
     order_id_str = str(order.id)
     order_total_str = str(int(order.total_price)) if order.total_price is not None else "0" # یا فرمت دلخواه شما
 
-    # استفاده از دیکشنری برای خوانایی بیشتر
-    mapping = {
+    return {
         'customer_name': customer_name,
         'order_id': order_id_str,
         'order_total': order_total_str,
-        'store_name': settings.SITE_NAME if hasattr(settings, 'SITE_NAME') else 'فروشگاه شما', # SITE_NAME را در settings.py تعریف کنید
+        'store_name': getattr(settings, 'SITE_NAME', 'فروشگاه شما'), # SITE_NAME را در settings.py تعریف کنید
         'tracking_number': tracking_number_str,
-        # می‌توانید متغیرهای بیشتری مانند تاریخ سفارش، لینک مشاهده سفارش و ... اضافه کنید
+        # متغیر جدید را به SMS_PLACEHOLDERS در orders/sms_templates.py هم اضافه کنید
     }
-    
-    message = template_string
-    for key, value in mapping.items():
-        message = message.replace(f"{{{{{key}}}}}", value) # مثال: {{customer_name}}
-    return message
 
 
-def send_order_status_sms(order: Order, event_trigger_key: str):
-    print(f"--- DEBUG: send_order_status_sms function entered for event: '{event_trigger_key}' ---")
+def format_sms_message(template_string: str, order: Order) -> str:
     """
-    بر اساس رویداد/وضعیت سفارش، قالب پیامک مناسب را پیدا کرده،
-    آن را با اطلاعات سفارش فرمت کرده، از طریق sms.ir ارسال می‌کند
-    و نتیجه را در مدل Notification لاگ می‌کند.
+    متغیرهای داخل قالب پیامک را با اطلاعات سفارش جایگزین می‌کند.
+    (برای قالب‌های ذخیره شده از get_active_sms_template که از قبل کامپایل شده‌اند استفاده کنید.)
     """
-    try:
-        sms_template = SMSTemplate.objects.get(event_trigger=event_trigger_key, is_active=True)
-        print(f"--- DEBUG: Found active template: '{sms_template.description}' ---")
-    except SMSTemplate.DoesNotExist:
-        print(f"--- ERROR: No active SMS template found for event '{event_trigger_key}'. Aborting. ---")
-        return False, "No active template for this event.", None
-    except SMSTemplate.MultipleObjectsReturned: # اگر به اشتباه چند قالب فعال برای یک رویداد داشتید
-        print(f"SMS Service: Multiple active SMS templates found for event_trigger '{event_trigger_key}'. Using the first one.")
-        sms_template = SMSTemplate.objects.filter(event_trigger=event_trigger_key, is_active=True).first()
-        if not sms_template: # این حالت نباید اتفاق بیفتد اگر MultipleObjectsReturned رخ داده
-             return False, "Error finding template after multiple objects returned.", None
+    return CompiledSMSTemplate(template_string).render(order_sms_context(order))
 
 
-    final_message_body = format_sms_message(sms_template.message_template, order)
-    
-    recipient_number = None
-    recipient_user = order.user # کاربر مرتبط با سفارش
+def get_active_sms_template(event_trigger_key: str):
+    """قالب فعال و کامپایل شده پیامک برای یک رویداد/وضعیت سفارش (از registry، بدون کوئری)؛ اگر وجود نداشت None."""
+    sms_template = get_compiled_template(event_trigger_key)
+    if sms_template is None:
+        print(f"--- ERROR: No active SMS template found for event '{event_trigger_key}'. Aborting. ---")
+    return sms_template
 
+
+def get_recipient_number(user):
     # فقط از فیلد phone در مدل CustomUser استفاده می‌کنیم
-    if recipient_user and hasattr(recipient_user, 'phone') and recipient_user.phone:
-        recipient_number = str(recipient_user.phone)
-        print(f"SMS Service: Using phone from user profile: {recipient_number} for Order ID {order.id}")
+    if user and hasattr(user, 'phone') and user.phone:
+        return str(user.phone)
+    return None
+
 
-    if not recipient_number:
+def build_order_status_notification(order: Order, sms_template) -> Notification:
+    """
+    رکورد Notification (ذخیره نشده) پیامک وضعیت سفارش را با قالب کامپایل شده sms_template می‌سازد.
+    اگر شماره گیرنده موجود نباشد، رکورد از همین ابتدا FAILED است.
+    """
+    notification = Notification(
+        user=order.user,
+        order=order,
+        template_id=sms_template.pk,
+        message=sms_template.render(order_sms_context(order)), # متن آماده شده
+        type=Notification.NotificationTypeChoices.SMS,
+        status=Notification.NotificationStatusChoices.PENDING,
+    )
+    if not get_recipient_number(order.user):
         print(f"SMS Service: No recipient phone number found for Order ID {order.id}. SMS not sent.")
-        # ایجاد لاگ ناموفق بدون ارسال به درگاه
-        Notification.objects.create(
-            user=order.user,
-            order=order,
-            message=final_message_body, # متن آماده شده
-            type=Notification.NotificationTypeChoices.SMS,
-            status=Notification.NotificationStatusChoices.FAILED,
-            gateway_response_message="شماره تلفن گیرنده موجود نیست."
-        )
-        return False, "Recipient phone number missing.", None
+        notification.status = Notification.NotificationStatusChoices.FAILED
+        notification.gateway_response_message = "شماره تلفن گیرنده موجود نیست."
+    return notification
+
 
-    # -- انتخاب کلید API و URL پایه --
+def get_sms_gateway_config():
+    """(کلید API، URL پایه، شماره خط پیش‌فرض، حالت) sms.ir؛ اگر تنظیمات ناقص باشد کلید یا URL خالی است."""
     if settings.USE_SMS_IR_SANDBOX:
-        current_api_key = settings.SMS_IR_API_KEY_SANDBOX
-        env_mode = "Sandbox"
-    else:
-        current_api_key = settings.SMS_IR_API_KEY_PRODUCTION
-        env_mode = "Production"
-    current_base_url = settings.SMS_IR_API_BASE_URL
-    # -- پایان انتخاب کلید --
-
-    # -- بررسی تنظیمات --
-    if not current_api_key or not settings.SMS_IR_LINE_NUMBER or not current_base_url:
-        error_msg = f"تنظیمات API ({env_mode}) برای sms.ir ناقص است (کلید، شماره خط یا URL پایه)."
-        print(f"SMS Service Error: {error_msg}")
-        Notification.objects.create(user=order.user, order=order, message=final_message_body, type=Notification.NotificationTypeChoices.SMS, status=Notification.NotificationStatusChoices.FAILED, gateway_response_message=error_msg)
-        return False, error_msg, None
-    # -- پایان بررسی --
-    
-    api_url = f"{current_base_url.rstrip('/')}/send/bulk"
-    payload = {
-        "lineNumber": str(settings.SMS_IR_LINE_NUMBER),
-        "messageText": final_message_body,
-        "mobiles": [recipient_number.lstrip('0')], # یا فرمت مورد نیاز sms.ir
-    }
+        return settings.SMS_IR_API_KEY_SANDBOX, settings.SMS_IR_API_BASE_URL, settings.SMS_IR_LINE_NUMBER, "Sandbox"
+    return settings.SMS_IR_API_KEY_PRODUCTION, settings.SMS_IR_API_BASE_URL, settings.SMS_IR_LINE_NUMBER, "Production"
+
+
+def _call_sms_ir(endpoint, payload, api_key, base_url, env_mode):
+    """
+    یک درخواست POST به sms.ir.
+    خروجی: (data, کد وضعیت درگاه، پیام، retryable) که data فقط در صورت موفقیت (status == 1) پر است
+    و retryable یعنی خطای موقت (شبکه، timeout، HTTP 5xx/429) که با تلاش دوباره ممکن است برطرف شود.
+    """
+    api_url = f"{base_url.rstrip('/')}/{endpoint}"
     headers = {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
-        'X-API-KEY': current_api_key
+        'X-API-KEY': api_key
     }
-
-    print(f"SMS Service ({env_mode}): Attempting to send SMS for Order ID {order.id} to {recipient_number} for event {event_trigger_key}")
-    print(f"SMS Service ({env_mode}): Payload: {json.dumps(payload)}")
-
-    notification_status = Notification.NotificationStatusChoices.PENDING
-    gateway_status_code = None
-    gateway_message = None
-    gateway_data = None
-    sent_timestamp = None
+    print(f"SMS Service ({env_mode}): POST {endpoint} to {len(payload['mobiles'])} recipient(s)")
 
     try:
-        response = requests.post(api_url, data=json.dumps(payload), headers=headers, timeout=15)
+        response = http_client.post(api_url, data=json.dumps(payload), headers=headers)
         response.raise_for_status()
         response_data = response.json()
         print(f"SMS Service ({env_mode}): API Full Response: {response_data}")
-
-        gateway_status_code = str(response_data.get("status"))
-        gateway_message = str(response_data.get("message", ""))
-        gateway_data = response_data.get("data") # این می‌تواند شامل PackId, MessageIds, Cost باشد
-
-        if gateway_status_code == '1': # یا هر کد موفقیت دیگری از sms.ir
-            notification_status = Notification.NotificationStatusChoices.SENT
-            sent_timestamp = timezone.now()
-            success_flag = True
-        else:
-            notification_status = Notification.NotificationStatusChoices.FAILED
-            success_flag = False
-
     except requests.exceptions.HTTPError as http_err:
-        notification_status = Notification.NotificationStatusChoices.FAILED
-        gateway_message = f"HTTP error: {http_err.response.status_code if http_err.response else 'N/A'}"
+        status_code = http_err.response.status_code if http_err.response is not None else None
+        gateway_message = f"HTTP error: {status_code or 'N/A'}"
         if http_err.response is not None:
             try: gateway_message += f" - Detail: {str(http_err.response.json())}"
             except ValueError: gateway_message += f" - Detail: {http_err.response.text}"
         print(f"SMS Service ({env_mode}): HTTP error occurred: {gateway_message}")
-        success_flag = False
+        return None, None, gateway_message, status_code is None or status_code >= 500 or status_code == 429
     except requests.exceptions.RequestException as req_err:
-        notification_status = Notification.NotificationStatusChoices.FAILED
-        gateway_message = f"Request exception: {req_err}"
-        print(f"SMS Service ({env_mode}): Request exception occurred: {gateway_message}")
-        success_flag = False
+        print(f"SMS Service ({env_mode}): Request exception occurred: {req_err}")
+        return None, None, f"Request exception: {req_err}", True # timeout یا خطای اتصال
     except Exception as e:
-        notification_status = Notification.NotificationStatusChoices.FAILED
-        gateway_message = f"An unexpected error: {e}"
-        print(f"SMS Service ({env_mode}): An unexpected error occurred: {gateway_message}")
-        success_flag = False
+        print(f"SMS Service ({env_mode}): An unexpected error occurred: {e}")
+        return None, None, f"An unexpected error: {e}", False
 
-    # ایجاد رکورد لاگ در Notification
-    Notification.objects.create(
-        user=order.user,
-        order=order,
-        message=final_message_body,
+    gateway_status_code = str(response_data.get("status"))
+    gateway_message = str(response_data.get("message", ""))
+    if gateway_status_code == '1': # یا هر کد موفقیت دیگری از sms.ir
+        return response_data.get("data") or {}, gateway_status_code, gateway_message, False
+    return None, gateway_status_code, gateway_message, False
+
+
+def _record_result(notification, sent, status_code, message, retryable=False):
+    """نتیجه ارسال را روی رکورد می‌نویسد (بدون ذخیره)؛ خطای موقت تا SMS_MAX_ATTEMPTS در صف می‌ماند."""
+    notification.gateway_response_status_code = status_code
+    notification.gateway_response_message = message
+    if sent:
+        notification.status = Notification.NotificationStatusChoices.SENT
+        notification.sent_at = timezone.now()
+    elif retryable and notification.attempts < SMS_MAX_ATTEMPTS:
+        # در صف می‌ماند و worker بعد از فاصله backoff دوباره تلاش می‌کند
+        notification.status = Notification.NotificationStatusChoices.PENDING
+        notification.next_attempt_at = timezone.now() + SMS_RETRY_DELAYS[max(notification.attempts - 1, 0)]
+        print(f"SMS Service: Will retry Notification {notification.id} at {notification.next_attempt_at}")
+    else:
+        notification.status = Notification.NotificationStatusChoices.FAILED
+
+
+def _send_group(notifications, line_number, api_key, base_url, env_mode):
+    """
+    پیامک‌های یک (قالب، خط) را در دسته‌های SMS_BATCH_SIZE تایی می‌فرستد: اگر متن همه یکی باشد
+    با send/bulk و در غیر این صورت (مثلاً نام مشتری در متن) با send/likeToLike (متن جدا برای هر شماره).
+    شناسه پیام هر گیرنده (messageIds به همان ترتیب mobiles) روی رکورد همان گیرنده نوشته می‌شود.
+    """
+    for start in range(0, len(notifications), SMS_BATCH_SIZE):
+        chunk = notifications[start:start + SMS_BATCH_SIZE]
+        mobiles = [get_recipient_number(notification.user).lstrip('0') for notification in chunk] # فرمت مورد نیاز sms.ir
+        texts = [notification.message for notification in chunk]
+        if len(set(texts)) == 1:
+            endpoint = 'send/bulk'
+            payload = {"lineNumber": str(line_number), "messageText": texts[0], "mobiles": mobiles}
+        else:
+            endpoint = 'send/likeToLike'
+            payload = {"lineNumber": str(line_number), "messageTexts": texts, "mobiles": mobiles}
+
+        data, status_code, message, retryable = _call_sms_ir(endpoint, payload, api_key, base_url, env_mode)
+        if data is None:
+            for notification in chunk:
+                _record_result(notification, False, status_code, message, retryable)
+            continue
+
+        pack_id = data.get('packId')
+        message_ids = data.get('messageIds') or []
+        cost = data.get('cost')
+        per_recipient = len(message_ids) == len(chunk)
+        for index, notification in enumerate(chunk):
+            notification.gateway_pack_id = pack_id
+            if cost is not None:
+                notification.cost = round(Decimal(str(cost)) / len(chunk), 2)
+            if not per_recipient: # درگاه شناسه جداگانه برنگرداند؛ کل دسته پذیرفته شده
+                _record_result(notification, True, status_code, message)
+                continue
+            message_id = message_ids[index]
+            notification.gateway_message_ids = [message_id] if message_id else None
+            if message_id:
+                _record_result(notification, True, status_code, message)
+            else:
+                _record_result(notification, False, status_code, "Recipient rejected by gateway.")
+
+
+def deliver_sms_batch(notifications):
+    """
+    Notification های پیامکی PENDING را بر اساس (قالب، شماره خط) گروه‌بندی کرده و هر گروه را
+    با کمترین تعداد درخواست به sms.ir می‌فرستد؛ نتیجه هر گیرنده روی رکورد خودش ثبت و همه
+    رکوردها با یک bulk_update ذخیره می‌شوند. تعداد رکوردها به تفکیک وضعیت نهایی را برمی‌گرداند.
+    (مسیر مشترک تغییر وضعیت تکی/گروهی و پیامک‌های همگانی.)
+    """
+    notifications = list(notifications)
+    for notification in notifications:
+        if notification.pk is None: # رکوردی که هنوز ذخیره نشده (send_order_status_sms)
+            notification.save()
+
+    api_key, base_url, default_line, env_mode = get_sms_gateway_config()
+    groups = defaultdict(list)
+    for notification in notifications:
+        if not api_key or not base_url or not (notification.line_number or default_line):
+            error_msg = f"تنظیمات API ({env_mode}) برای sms.ir ناقص است (کلید، شماره خط یا URL پایه)."
+            print(f"SMS Service Error: {error_msg}")
+            _record_result(notification, False, None, error_msg)
+        elif not get_recipient_number(notification.user):
+            _record_result(notification, False, None, "شماره تلفن گیرنده موجود نیست.")
+        else:
+            groups[(notification.template_id, notification.line_number or default_line)].append(notification)
+
+    for (template_id, line_number), group in groups.items():
+        _send_group(group, line_number, api_key, base_url, env_mode)
+
+    Notification.objects.bulk_update(notifications, [
+        'status', 'sent_at', 'next_attempt_at', 'gateway_response_status_code', 'gateway_response_message',
+        'gateway_pack_id', 'gateway_message_ids', 'cost',
+    ])
+    return Counter(str(notification.status) for notification in notifications)
+
+
+def deliver_sms_notification(notification: Notification):
+    """
+    یک Notification پیامکی در وضعیت PENDING را از طریق sms.ir ارسال کرده
+    و نتیجه را روی همان رکورد ذخیره می‌کند.
+    """
+    deliver_sms_batch([notification])
+    success = notification.status == Notification.NotificationStatusChoices.SENT
+    return success, notification.gateway_response_message, {
+        'packId': notification.gateway_pack_id, 'messageIds': notification.gateway_message_ids,
+    }
+
+
+def send_order_status_sms(order: Order, event_trigger_key: str):
+    print(f"--- DEBUG: send_order_status_sms function entered for event: '{event_trigger_key}' ---")
+    """
+    بر اساس رویداد/وضعیت سفارش، قالب پیامک مناسب را پیدا کرده،
+    آن را با اطلاعات سفارش فرمت کرده، از طریق sms.ir ارسال می‌کند
+    و نتیجه را در مدل Notification لاگ می‌کند.
+    """
+    sms_template = get_active_sms_template(event_trigger_key)
+    if sms_template is None:
+        return False, "No active template for this event.", None
+
+    notification = build_order_status_notification(order, sms_template)
+    if notification.status == Notification.NotificationStatusChoices.FAILED:
+        # ایجاد لاگ ناموفق بدون ارسال به درگاه
+        notification.save()
+        return False, "Recipient phone number missing.", None
+    return deliver_sms_notification(notification)
+
+
+def queue_order_status_sms(orders, event_trigger_key: str):
+    """
+    برای چند سفارش که به یک وضعیت رفته‌اند، رکوردهای Notification پیامک را
+    با یک قالب و یک bulk_create در وضعیت PENDING ثبت می‌کند و شناسه‌های قابل ارسال را برمی‌گرداند.
+    (orders باید user را از قبل با select_related داشته باشند.)
+    """
+    sms_template = get_active_sms_template(event_trigger_key)
+    if sms_template is None:
+        return []
+    notifications = Notification.objects.bulk_create(
+        [build_order_status_notification(order, sms_template) for order in orders]
+    )
+    return [
+        notification.pk for notification in notifications
+        if notification.status == Notification.NotificationStatusChoices.PENDING
+    ]
+
+
+def enqueue_order_status_sms(order: Order, event_trigger_key: str):
+    """
+    پیامک وضعیت سفارش را فقط در صف (outbox) ثبت می‌کند: یک INSERT که باید در همان تراکنش
+    تغییر وضعیت انجام شود. ارسال با فرمان run_sms_worker است. اگر قالبی نباشد None برمی‌گرداند.
+    """
+    sms_template = get_active_sms_template(event_trigger_key)
+    if sms_template is None:
+        return None
+    notification = build_order_status_notification(order, sms_template)
+    notification.save()
+    return notification
+
+
+def fail_exhausted_sms():
+    """
+    پیامک‌هایی که همه تلاش‌هایشان را مصرف کرده‌اند ولی هنوز PENDING مانده‌اند
+    (worker وسط ارسال از کار افتاده و زمان رزرو تمام شده) را FAILED می‌کند.
+    """
+    return Notification.objects.filter(
         type=Notification.NotificationTypeChoices.SMS,
-        status=notification_status,
-        sent_at=sent_timestamp,
-        gateway_response_status_code=gateway_status_code,
-        gateway_response_message=gateway_message,
-        # این فیلدها را به مدل Notification اضافه کنید
-        # gateway_pack_id=gateway_data.get('PackId') if gateway_data else None,
-        # gateway_message_ids=gateway_data.get('MessageIds') if gateway_data else None,
-        # cost=gateway_data.get('Cost') if gateway_data else None,
+        status=Notification.NotificationStatusChoices.PENDING,
+        attempts__gte=SMS_MAX_ATTEMPTS,
+        next_attempt_at__lte=timezone.now(),
+    ).update(
+        status=Notification.NotificationStatusChoices.FAILED,
+        gateway_response_message="Worker did not finish sending in time.",
     )
-    
-    return success_flag, gateway_message, gateway_data
\ No newline at end of file
+
+
+def claim_pending_sms(limit):
+    """
+    حداکثر limit پیامک PENDING که زمان تلاششان رسیده را (قدیمی‌ترین اول) برای این worker رزرو می‌کند:
+    یک تلاش به attempts اضافه و next_attempt_at تا پایان SMS_CLAIM_LEASE جلو برده می‌شود.
+    روی PostgreSQL با SKIP LOCKED چند worker هم‌زمان پیامک تکراری برنمی‌دارند.
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    with transaction.atomic():
+        due = Notification.objects.filter(
+            type=Notification.NotificationTypeChoices.SMS,
+            status=Notification.NotificationStatusChoices.PENDING,
+            next_attempt_at__lte=now,
+            attempts__lt=SMS_MAX_ATTEMPTS,
+        ).order_by('next_attempt_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        notification_ids = list(due.values_list('pk', flat=True)[:limit])
+        if notification_ids:
+            Notification.objects.filter(pk__in=notification_ids).update(
+                attempts=F('attempts') + 1, next_attempt_at=now + SMS_CLAIM_LEASE,
+            )
+    return notification_ids
+
+
+def queue_sms_broadcast(users, message: str, line_number: str = ''):
+    """
+    یک پیامک یکسان (مثلاً تبلیغاتی) برای چند کاربر در صف ثبت می‌کند؛ worker آن‌ها را
+    با send/bulk در دسته‌های SMS_BATCH_SIZE تایی می‌فرستد. تعداد رکوردهای PENDING را برمی‌گرداند.
+    line_number خالی یعنی خط پیش‌فرض (SMS_IR_LINE_NUMBER).
+    """
+    notifications = []
+    for user in users:
+        notification = Notification(
+            user=user,
+            message=message,
+            line_number=line_number,
+            type=Notification.NotificationTypeChoices.SMS,
+            status=Notification.NotificationStatusChoices.PENDING,
+        )
+        if not get_recipient_number(user):
+            notification.status = Notification.NotificationStatusChoices.FAILED
+            notification.gateway_response_message = "شماره تلفن گیرنده موجود نیست."
+        notifications.append(notification)
+    Notification.objects.bulk_create(notifications, batch_size=1000)
+    return sum(1 for notification in notifications if notification.status == Notification.NotificationStatusChoices.PENDING)
+
+
+def deliver_claimed_sms(notification_ids):
+    """
+    پیامک‌های رزرو شده را با deliver_sms_batch ارسال می‌کند و تعداد آن‌ها به تفکیک وضعیت نهایی را برمی‌گرداند.
+    در threadهای worker اجرا می‌شود؛ هر thread اتصال دیتابیس خودش را دارد.
+    """
+    close_old_connections()
+    try:
+        # رکوردهایی که در این فاصله (مثلاً از پنل ادمین) تغییر کرده‌اند کنار گذاشته می‌شوند
+        pending = Notification.objects.select_related('user').filter(
+            pk__in=notification_ids, status=Notification.NotificationStatusChoices.PENDING
+        ).order_by('pk')
+        return dict(deliver_sms_batch(pending))
+    finally:
+        close_old_connections()
@@ -0,0 +1,126 @@
+# orders/sms_templates.py
+import re
+import threading
+import time
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import SMSTemplate
+
+# متغیرهایی که در متن قالب پیامک مجاز هستند (مقادیرشان در sms_service.order_sms_context ساخته می‌شود)
+SMS_PLACEHOLDERS = ('customer_name', 'order_id', 'order_total', 'store_name', 'tracking_number')
+
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+# هر چند ثانیه یک بار نسخه قالب‌ها در دیتابیس بررسی می‌شود (تغییر از پردازه دیگر حداکثر با این تأخیر دیده می‌شود)
+REGISTRY_CHECK_INTERVAL = getattr(settings, 'SMS_TEMPLATE_REGISTRY_CHECK_SECONDS', 5)
+
+
+def unknown_placeholders(text):
+    """نام متغیرهای ناشناخته در متن قالب، به ترتیب اولین ظهور."""
+    return list(dict.fromkeys(name for name in PLACEHOLDER_RE.findall(text or '') if name not in SMS_PLACEHOLDERS))
+
+
+class CompiledSMSTemplate:
+    """
+    قالب پیامک کامپایل شده: متن یک بار به فهرست قطعه‌ها (متن ثابت / نام متغیر) شکسته و به یک
+    رشته %-format و یک itemgetter تبدیل می‌شود، پس render فقط یک عملیات % تک‌گذره (در C) است.
+    متغیرهای ناشناخته مثل قبل دست‌نخورده در متن می‌مانند.
+    """
+    __slots__ = ('pk', 'event_trigger', 'description', 'message_template', 'segments', '_text', '_values')
+
+    def __init__(self, message_template, pk=None, event_trigger=None, description=None):
+        self.pk = pk
+        self.event_trigger = event_trigger
+        self.description = description
+        self.message_template = message_template
+
+        segments = [] # رشته = متن ثابت، تاپل (نام,) = متغیر
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(message_template):
+            name = match.group(1)
+            if name not in SMS_PLACEHOLDERS:
+                continue
+            if match.start() > position:
+                segments.append(message_template[position:match.start()])
+            segments.append((name,))
+            position = match.end()
+        if position < len(message_template):
+            segments.append(message_template[position:])
+        self.segments = tuple(segments)
+
+        names = [segment[0] for segment in self.segments if isinstance(segment, tuple)]
+        if not names:
+            self._text, self._values = message_template, None
+            return
+        self._text = ''.join(
+            '%s' if isinstance(segment, tuple) else segment.replace('%', '%%') for segment in self.segments
+        )
+        if len(names) == 1:
+            # itemgetter با یک نام تاپل برنمی‌گرداند
+            self._values = lambda context, name=names[0]: (context[name],)
+        else:
+            self._values = itemgetter(*names)
+
+    @classmethod
+    def from_model(cls, sms_template):
+        return cls(
+            sms_template.message_template, pk=sms_template.pk,
+            event_trigger=sms_template.event_trigger, description=sms_template.description,
+        )
+
+    def render(self, context):
+        """context: دیکشنری {نام متغیر: مقدار رشته‌ای} با همه SMS_PLACEHOLDERS."""
+        if self._values is None:
+            return self._text
+        return self._text % self._values(context)
+
+
+_registry = None # (نسخه، {event_trigger: CompiledSMSTemplate})
+_checked_at = 0.0 # زمان (monotonic) آخرین بررسی نسخه در دیتابیس
+_registry_lock = threading.Lock()
+
+
+def _templates_version():
+    """نسخه قالب‌ها در دیتابیس: (تعداد، آخرین updated_at)؛ ایجاد، ویرایش و حذف هر قالب آن را عوض می‌کند."""
+    stats = SMSTemplate.objects.aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+    return stats['count'], stats['updated_at']
+
+
+def _load_registry(version):
+    templates = {}
+    for sms_template in SMSTemplate.objects.filter(is_active=True).order_by('pk'):
+        # اگر به اشتباه چند قالب فعال برای یک رویداد باشد، اولی استفاده می‌شود (مثل قبل)
+        templates.setdefault(sms_template.event_trigger, CompiledSMSTemplate.from_model(sms_template))
+    print(f"SMS Service: Loaded {len(templates)} active SMS template(s) into the registry.")
+    return version, templates
+
+
+def get_compiled_template(event_trigger_key):
+    """
+    قالب فعال کامپایل شده یک رویداد از registry داخل پردازه (یا None).
+    همه قالب‌های فعال با یک کوئری بار می‌شوند. حداکثر هر REGISTRY_CHECK_INTERVAL ثانیه یک کوئری
+    ارزان (COUNT/MAX روی updated_at) بررسی می‌کند که قالبی در پردازه دیگری تغییر کرده است یا نه؛
+    در همین پردازه سیگنال post_save/post_delete registry را فوراً پاک می‌کند.
+    """
+    global _registry, _checked_at
+    registry = _registry
+    if registry is not None and time.monotonic() - _checked_at < REGISTRY_CHECK_INTERVAL:
+        return registry[1].get(event_trigger_key)
+
+    with _registry_lock:
+        if _registry is None or time.monotonic() - _checked_at >= REGISTRY_CHECK_INTERVAL:
+            version = _templates_version()
+            if _registry is None or _registry[0] != version:
+                _registry = _load_registry(version)
+            _checked_at = time.monotonic()
+        registry = _registry
+    return registry[1].get(event_trigger_key)
+
+
+def invalidate_sms_templates():
+    """registry این پردازه را پاک می‌کند؛ پردازه‌های دیگر تغییر را با بررسی نسخه در دیتابیس می‌بینند."""
+    global _registry
+    _registry = None
@@ -0,0 +1,115 @@
+# orders/status_service.py
+from django.db import connection, transaction
+from django.utils import timezone
+
+from products.similarity import schedule_similarity_refresh
+
+from .models import Order, OrderStatusLog
+from .sales_rollups import apply_bulk_status_transition, counts_as_sale
+
+# نتیجه هر شناسه در تغییر وضعیت گروهی
+OUTCOME_UPDATED = 'updated'
+OUTCOME_UNCHANGED = 'unchanged' # سفارش از قبل در همین وضعیت بود
+OUTCOME_NOT_FOUND = 'not_found'
+
+
+def bulk_change_status(order_ids, new_status, changed_by=None, notify=True):
+    """
+    وضعیت چند سفارش را به صورت مجموعه‌ای تغییر می‌دهد (معادل گروهی Order.change_status):
+    یک UPDATE برای همه سفارش‌هایی که وضعیتشان با new_status فرق دارد، یک bulk_create
+    برای لاگ‌های وضعیت و یک bulk_create برای پیامک‌ها (به همراه به‌روزرسانی rollup های فروش)، همه در یک تراکنش.
+    ارسال پیامک‌ها خارج از درخواست و توسط فرمان run_sms_worker انجام می‌شود.
+
+    دیکشنری {order_id: outcome} برمی‌گرداند.
+    """
+    order_ids = list(dict.fromkeys(order_ids)) # حذف تکراری‌ها با حفظ ترتیب
+    status_labels = dict(Order.OrderStatusChoices.choices)
+    new_label = status_labels.get(new_status, new_status)
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            changed = _update_returning_postgresql(order_ids, new_status)
+        else:
+            changed = _update_locked(order_ids, new_status)
+
+        existing_ids = set(Order.objects.filter(pk__in=order_ids).values_list('pk', flat=True))
+
+        changed_by_note = f" توسط ادمین {changed_by.username}" if changed_by else ""
+        OrderStatusLog.objects.bulk_create([
+            OrderStatusLog(
+                order_id=order_id,
+                new_status=new_status,
+                changed_by=changed_by,
+                notes=f"وضعیت از '{status_labels.get(old_status, old_status)}' به '{new_label}'{changed_by_note} تغییر کرد.",
+            )
+            for order_id, old_status in changed.items()
+        ])
+
+        if changed:
+            apply_bulk_status_transition(changed, new_status)
+            if counts_as_sale(new_status):
+                schedule_similarity_refresh(pk for pk, old in changed.items() if not counts_as_sale(old))
+            _after_bulk_change(list(changed), new_status, notify)
+
+    outcomes = {}
+    for order_id in order_ids:
+        if order_id in changed:
+            outcomes[order_id] = OUTCOME_UPDATED
+        elif order_id in existing_ids:
+            outcomes[order_id] = OUTCOME_UNCHANGED
+        else:
+            outcomes[order_id] = OUTCOME_NOT_FOUND
+    return outcomes
+
+
+_UPDATE_RETURNING_SQL = """
+UPDATE {order_table} AS o
+SET status = %(status)s, updated_at = %(now)s
+FROM (
+    SELECT id, status FROM {order_table}
+    WHERE id = ANY(%(ids)s) AND is_deleted = false AND status <> %(status)s
+    FOR UPDATE
+) AS previous
+WHERE o.id = previous.id
+RETURNING o.id, previous.status
+"""
+
+
+def _update_returning_postgresql(order_ids, new_status):
+    """یک UPDATE ... RETURNING؛ {order_id: old_status} سفارش‌های تغییر کرده را برمی‌گرداند."""
+    sql = _UPDATE_RETURNING_SQL.format(order_table=connection.ops.quote_name(Order._meta.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'status': new_status, 'now': timezone.now(), 'ids': order_ids})
+        return dict(cursor.fetchall())
+
+
+def _update_locked(order_ids, new_status):
+    changed = dict(
+        Order.objects.select_for_update()
+        .filter(pk__in=order_ids)
+        .exclude(status=new_status)
+        .values_list('pk', 'status')
+    )
+    if changed:
+        Order.objects.filter(pk__in=changed).update(status=new_status, updated_at=timezone.now())
+    return changed
+
+
+def _after_bulk_change(order_ids, new_status, notify):
+    """
+    کارهایی که Order.save/change_status برای هر سفارش انجام می‌داد و UPDATE گروهی
+    (که سیگنال post_save ندارد) باید خودش انجام دهد: کش آمار داشبورد، کش فاکتور و پیامک.
+    """
+    from .dashboard import invalidate_dashboard_stats
+    from .invoice_cache import invalidate_invoice_cache_on_commit, prewarm_invoice
+    from .sms_service import queue_order_status_sms
+
+    invalidate_dashboard_stats()
+    invalidate_invoice_cache_on_commit(Order.all_objects.filter(pk__in=order_ids))
+    if new_status == Order.OrderStatusChoices.DELIVERED:
+        transaction.on_commit(lambda: [prewarm_invoice(order_id) for order_id in order_ids])
+
+    if notify:
+        # پیامک‌ها در همین تراکنش در صف (outbox) ثبت می‌شوند و run_sms_worker آن‌ها را ارسال می‌کند
+        orders = Order.objects.select_related('user').filter(pk__in=order_ids)
+        queue_order_status_sms(orders, new_status)
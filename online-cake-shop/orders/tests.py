@@ -1,3 +1,905 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+
+from products.models import (
+    Addon, Cake, CakeSimilarityRefresh, CakeSizeVariant, Category, Flavor, PartySupply, Size, SupplyType,
+    WishlistItem,
+)
+from . import cart_service, http_client
+from .cart_service import add_cart_line, get_or_create_cart
+from .http_stub import StubHTTPServer, default_routes
+from .models import (
+    DailySalesRollup, Notification, Order, OrderAddon, OrderItem, OrderStatusLog, RenderJob, SMSTemplate, Transaction,
+)
+from .render_jobs import claim_jobs, execute_render_job
+from .serializers import SMSTemplateSerializer
+from .sms_service import (
+    SMS_MAX_ATTEMPTS, SMS_RETRY_DELAYS, claim_pending_sms, deliver_sms_batch, order_sms_context,
+)
+from .sms_templates import CompiledSMSTemplate, invalidate_sms_templates
+
+
+def create_catalog():
+    """یک کیک (با طعم و اندازه)، یک محصول لوازم جشن و یک افزودنی برای تست‌ها."""
+    category = Category.objects.create(name='Birthday', slug='birthday')
+    flavor = Flavor.objects.create(name='Chocolate')
+    size = Size.objects.create(name='Medium', estimated_weight_kg=Decimal('1.50'))
+    cake = Cake.objects.create(name='Chocolate Cake', slug='chocolate-cake', base_price=Decimal('100'), category=category)
+    cake.available_flavors.add(flavor)
+    size_variant = CakeSizeVariant.objects.create(cake=cake, size=size, price_modifier=Decimal('10'))
+    supply_type = SupplyType.objects.create(name='Candle', slug='candle')
+    supply = PartySupply.objects.create(name='Candle', slug='candle', price=Decimal('5'), type=supply_type)
+    addon = Addon.objects.create(name='Card', price=Decimal('3'))
+    return cake, flavor, size_variant, supply, addon
+
+
+class OrderTotalDeltaTests(TestCase):
+    """total_price که با تفاضل هر ردیف به‌روز می‌شود باید همیشه با محاسبه کامل (update_total_price) برابر باشد."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='customer', password='x', phone='09120000001')
+        cls.cake, cls.flavor, cls.size_variant, cls.supply, cls.addon = create_catalog()
+
+    def setUp(self):
+        self.order = Order.objects.create(user=self.user)
+
+    def add_cake(self, order, quantity=1):
+        return OrderItem.objects.create(
+            order=order, content_type=ContentType.objects.get_for_model(Cake), object_id=self.cake.pk,
+            flavor=self.flavor, size_variant=self.size_variant, quantity=quantity,
+        )
+
+    def add_supply(self, order, quantity=1):
+        return OrderItem.objects.create(
+            order=order, content_type=ContentType.objects.get_for_model(PartySupply), object_id=self.supply.pk,
+            quantity=quantity,
+        )
+
+    def assertTotal(self, order, expected):
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal(expected))
+        order.update_total_price()
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal(expected))
+
+    def test_add_lines(self):
+        self.add_cake(self.order, quantity=2)
+        self.assertTotal(self.order, '220')
+        self.add_supply(self.order, quantity=4)
+        self.assertTotal(self.order, '240')
+
+    def test_quantity_change(self):
+        item = self.add_cake(self.order, quantity=2)
+        item = OrderItem.objects.get(pk=item.pk)
+        item.quantity = 3
+        item.save()
+        self.assertTotal(self.order, '330')
+
+        item.quantity = 1
+        item.save(update_fields=['quantity'])
+        self.assertTotal(self.order, '110')
+
+    def test_quantity_change_on_unloaded_instance(self):
+        item = self.add_cake(self.order, quantity=2)
+        OrderItem(pk=item.pk, order=self.order, content_type=item.content_type, object_id=self.cake.pk,
+                  flavor=self.flavor, size_variant=self.size_variant, quantity=5).save()
+        self.assertTotal(self.order, '550')
+
+    def test_move_line_to_another_order(self):
+        other = Order.objects.create(user=self.user)
+        item = self.add_cake(self.order, quantity=2)
+        OrderAddon.objects.create(order_item=item, addon=self.addon, quantity=2)
+        self.add_supply(self.order)
+        self.assertTotal(self.order, '231')
+
+        item = OrderItem.objects.get(pk=item.pk)
+        item.order = other
+        item.save()
+        self.assertTotal(self.order, '5')
+        self.assertTotal(other, '226')
+
+    def test_addon_add_change_and_delete(self):
+        item = self.add_cake(self.order)
+        addon_line = OrderAddon.objects.create(order_item=item, addon=self.addon, quantity=2)
+        self.assertTotal(self.order, '116')
+
+        addon_line = OrderAddon.objects.get(pk=addon_line.pk)
+        addon_line.quantity = 5
+        addon_line.save()
+        self.assertTotal(self.order, '125')
+
+        addon_line.delete()
+        self.assertTotal(self.order, '110')
+
+    def test_item_delete_cascades_to_addons(self):
+        item = self.add_cake(self.order, quantity=2)
+        OrderAddon.objects.create(order_item=item, addon=self.addon, quantity=2)
+        self.add_supply(self.order, quantity=4)
+        self.assertTotal(self.order, '246')
+
+        item.delete()
+        self.assertTotal(self.order, '20')
+
+    def test_queryset_delete(self):
+        item = self.add_cake(self.order)
+        OrderAddon.objects.create(order_item=item, addon=self.addon)
+        self.add_supply(self.order, quantity=2)
+        OrderItem.objects.filter(order=self.order).delete()
+        self.assertTotal(self.order, '0')
+
+    def test_order_delete(self):
+        item = self.add_cake(self.order)
+        OrderAddon.objects.create(order_item=item, addon=self.addon)
+        order_id = self.order.pk
+        self.order.delete()
+        self.assertFalse(Order.all_objects.filter(pk=order_id).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=order_id).exists())
+
+
+class AdminOrderListQueryCountTests(TestCase):
+    """تعداد کوئری‌های لیست سفارش‌های ادمین نباید با تعداد سفارش‌ها (و آیتم‌هایشان) زیاد شود."""
+
+    # session و کاربر، سفارش‌ها (صفحه‌بندی keyset بدون COUNT)، تراکنش‌ها، لاگ‌ها و changed_by آن‌ها،
+    # آیتم‌ها و یک کوئری برای هر نوع محصول (کیک و لوازم جشن)
+    LIST_QUERIES = 9
+    # به علاوه طعم‌ها، تصاویر، اندازه‌ها (دو کوئری) و تگ‌های کیک، رنگ‌ها و تم‌های لوازم جشن
+    # و یک کوئری wishlisted_cake_ids برای کل درخواست در ?expand=product
+    EXPANDED_LIST_QUERIES = 17
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user(
+            username='admin', password='x', phone='09120000002', is_staff=True,
+        )
+        cls.customer = get_user_model().objects.create_user(username='customer', password='x', phone='09120000003')
+        cls.cake, cls.flavor, cls.size_variant, cls.supply, cls.addon = create_catalog()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.customer, status=Order.OrderStatusChoices.PROCESSING)
+            item = OrderItem.objects.create(
+                order=order, content_type=ContentType.objects.get_for_model(Cake), object_id=self.cake.pk,
+                flavor=self.flavor, size_variant=self.size_variant,
+            )
+            OrderAddon.objects.create(order_item=item, addon=self.addon)
+            OrderItem.objects.create(
+                order=order, content_type=ContentType.objects.get_for_model(PartySupply), object_id=self.supply.pk,
+            )
+
+    def assertListQueries(self, expected, query_string=''):
+        url = f'/api/v1/admin/orders/list/{query_string}'
+        self.create_orders(2)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+        self.create_orders(8)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_list(self):
+        self.assertListQueries(self.LIST_QUERIES)
+
+    def test_list_with_expanded_products(self):
+        self.assertListQueries(self.EXPANDED_LIST_QUERIES, '?expand=product')
+
+    def test_expanded_cake_is_wishlisted(self):
+        self.create_orders(1)
+        WishlistItem.objects.create(user=self.admin, product=self.cake)
+        response = self.client.get('/api/v1/admin/orders/list/?expand=product')
+        products = [item['product'] for item in response.json()['results'][0]['items']]
+        self.assertEqual([product.get('is_wishlisted') for product in products if 'is_wishlisted' in product], [True])
+
+
+class StubServerMixin:
+    """یک StubHTTPServer برای کلاس تست؛ reset_stub پاسخ‌های پیش‌فرض (موفق) را برمی‌گرداند."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubHTTPServer().start()
+        cls.addClassCleanup(cls.stub.stop)
+
+    def reset_stub(self):
+        self.stub.routes, self.stub.delays = default_routes(), {}
+        self.stub.calls.clear()
+
+    def stub_calls(self, path):
+        return [call for call in self.stub.calls if call[1] == path]
+
+
+class ZarinpalStubMixin(StubServerMixin):
+    """درگاه زرین‌پال جعلی برای تست‌های callback؛ setUp باید use_stub را صدا بزند."""
+
+    VERIFY_PATH = '/pg/v4/payment/verify.json'
+    AUTHORITY = 'A' + '0' * 35
+
+    def use_stub(self):
+        self.reset_stub()
+        verify_url = override_settings(ZARINPAL_VERIFY_URL=self.stub.url(self.VERIFY_PATH))
+        verify_url.enable()
+        self.addCleanup(verify_url.disable)
+        merchant_id = mock.patch.dict(os.environ, {'ZARINPAL_MERCHANT_ID': 'm' * 36})
+        merchant_id.start()
+        self.addCleanup(merchant_id.stop)
+
+    def create_payment(self, user):
+        self.order = Order.objects.create(user=user, status=Order.OrderStatusChoices.PENDING_PAYMENT)
+        self.payment = Transaction.objects.create(
+            order=self.order, amount=Decimal('1000'), gateway_reference_id=self.AUTHORITY,
+        )
+
+    def callback(self, status='OK', client=None):
+        client = client or self.client
+        return client.get('/payment/callback/', {'Authority': self.AUTHORITY, 'Status': status})
+
+    def verify_calls(self):
+        return self.stub_calls(self.VERIFY_PATH)
+
+
+class ZarinpalCallbackIdempotencyTests(ZarinpalStubMixin, TestCase):
+    """callback تکراری زرین‌پال برای یک Authority نباید دوباره verify کند یا وضعیت سفارش را دوباره تغییر دهد."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='customer', password='x', phone='09120000004')
+
+    def setUp(self):
+        self.use_stub()
+        self.create_payment(self.user)
+
+    def test_duplicate_callback_is_not_verified_again(self):
+        first = self.callback()
+        self.assertEqual(len(self.verify_calls()), 1)
+        self.assertIn('/payment/success', first['Location'])
+
+        second = self.callback()
+        self.assertEqual(len(self.verify_calls()), 1)
+        self.assertEqual(second['Location'], first['Location'])
+
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.payment.status, Transaction.TransactionStatusChoices.SUCCESS)
+        self.assertEqual(self.order.status, Order.OrderStatusChoices.PROCESSING)
+        self.assertEqual(
+            OrderStatusLog.objects.filter(order=self.order, new_status=Order.OrderStatusChoices.PROCESSING).count(), 1
+        )
+
+    def test_cancelled_payment_is_not_verified_on_replay(self):
+        self.assertIn('/payment/failure', self.callback('NOK')['Location'])
+        self.assertIn('/payment/failure', self.callback('OK')['Location'])
+        self.assertEqual(self.verify_calls(), [])
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Transaction.TransactionStatusChoices.FAILED)
+        self.assertEqual(
+            OrderStatusLog.objects.filter(order=self.order, new_status=Order.OrderStatusChoices.PAYMENT_FAILED).count(), 1
+        )
+
+    def test_gateway_error_keeps_payment_pending_for_retry(self):
+        self.stub.respond('POST', self.VERIFY_PATH, status=502, body={})
+        self.assertIn('/payment/failure', self.callback()['Location'])
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Transaction.TransactionStatusChoices.PENDING)
+
+        # درگاه دوباره در دسترس است: callback بعدی همان Authority وریفای و نهایی می‌شود
+        self.stub.routes = default_routes()
+        self.assertIn('/payment/success', self.callback()['Location'])
+        self.assertEqual(len(self.verify_calls()), 2)
+
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentZarinpalCallbackTests(ZarinpalStubMixin, TransactionTestCase):
+    """
+    callback های هم‌زمان یک Authority (هر کدام با اتصال دیتابیس خودش) پشت قفل ردیف تراکنش صف می‌شوند:
+    فقط یک verify به درگاه می‌رسد و سفارش فقط یک بار نهایی و لاگ می‌شود.
+    """
+
+    CALLBACKS = 5
+
+    def setUp(self):
+        self.use_stub()
+        # verify کند است تا callback های دیگر حتماً در حین آن برسند
+        self.stub.delays[('POST', self.VERIFY_PATH)] = 0.5
+        user = get_user_model().objects.create_user(username='customer', password='x', phone='09120000006')
+        self.create_payment(user)
+
+    def test_concurrent_callbacks_verify_once(self):
+        barrier = threading.Barrier(self.CALLBACKS)
+        responses = []
+
+        def send_callback():
+            try:
+                barrier.wait()
+                responses.append(self.callback(client=Client()))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send_callback) for _ in range(self.CALLBACKS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(responses), self.CALLBACKS)
+        for response in responses:
+            self.assertIn('/payment/success', response['Location'])
+        self.assertEqual(len(self.verify_calls()), 1)
+        self.assertEqual(
+            Transaction.objects.filter(
+                gateway_reference_id=self.AUTHORITY, status=Transaction.TransactionStatusChoices.SUCCESS,
+            ).count(), 1
+        )
+        self.assertEqual(
+            OrderStatusLog.objects.filter(order=self.order, new_status=Order.OrderStatusChoices.PROCESSING).count(), 1
+        )
+
+
+class CartConditionalGetTests(TestCase):
+    """ETag سبد خرید با یک کوئری حساب می‌شود و با تغییر کاتالوگ محصولات (مثلاً قیمت) عوض می‌شود."""
+
+    # session و کاربر، و یک کوئری برای validator ها (شامل نسخه کاتالوگ)
+    NOT_MODIFIED_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='customer', password='x', phone='09120000005')
+        cls.cake, cls.flavor, cls.size_variant, cls.supply, cls.addon = create_catalog()
+        cart = Order.objects.create(user=cls.user, status=Order.OrderStatusChoices.CART)
+        OrderItem.objects.create(
+            order=cart, content_type=ContentType.objects.get_for_model(Cake), object_id=cls.cake.pk,
+            flavor=cls.flavor, size_variant=cls.size_variant,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_not_modified_until_catalog_changes(self):
+        first = self.client.get('/api/v1/cart/')
+        self.assertEqual(first.status_code, 200)
+
+        with self.assertNumQueries(self.NOT_MODIFIED_QUERIES):
+            response = self.client.get('/api/v1/cart/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.cake.base_price = Decimal('120')
+        self.cake.save()
+        response = self.client.get('/api/v1/cart/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='bakejoy-test-media-'))
+class InvoiceCacheTests(TestCase):
+    """PDF فاکتور یک بار ساخته و از کش سرو می‌شود و با تغییر آیتم‌های سفارش (بعد از commit) پاک می‌شود."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(shutil.rmtree, settings.MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user(
+            username='admin', password='x', phone='09120000007', is_staff=True,
+        )
+        cls.cake, cls.flavor, cls.size_variant, cls.supply, cls.addon = create_catalog()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.order = Order.objects.create(user=self.admin, status=Order.OrderStatusChoices.PROCESSING)
+        self.item = OrderItem.objects.create(
+            order=self.order, content_type=ContentType.objects.get_for_model(Cake), object_id=self.cake.pk,
+            flavor=self.flavor, size_variant=self.size_variant,
+        )
+        self.url = f'/api/v1/admin/orders/list/{self.order.pk}/generate-invoice-pdf/'
+        html_to_pdf = mock.patch('orders.render_jobs.html_to_pdf', return_value=b'%PDF-1.4 invoice')
+        self.html_to_pdf = html_to_pdf.start()
+        self.addCleanup(html_to_pdf.stop)
+
+    def render_queued_jobs(self):
+        for job_id in claim_jobs(10):
+            execute_render_job(job_id)
+
+    def test_miss_then_hit(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.render_queued_jobs()
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.invoice_cached)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 invoice')
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304
+        )
+        self.assertEqual(self.html_to_pdf.call_count, 1)
+
+    def test_item_change_invalidates_after_commit(self):
+        self.client.get(self.url)
+        self.render_queued_jobs()
+        job = RenderJob.objects.get()
+        path = job.file.name
+        self.assertTrue(default_storage.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderAddon.objects.create(order_item=self.item, addon=self.addon)
+            # تا commit چیزی پاک نمی‌شود
+            self.assertTrue(default_storage.exists(path))
+        self.assertFalse(default_storage.exists(path))
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.invoice_cached)
+
+        response = self.client.get(f'/api/v1/admin/orders/render-jobs/{job.pk}/download/')
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+
+    def test_orders_without_cached_invoice_skip_storage(self):
+        with mock.patch('orders.invoice_cache.invalidate_invoice_cache') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.item.quantity = 2
+                self.item.save()
+        invalidate.assert_not_called()
+
+
+class AdminOrderSearchTests(TestCase):
+    """?search= ادمین سفارش‌ها: شماره سفارش، کد رهگیری، هر شکل موبایل مشتری و کلمات search_document."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_user(username='admin', password='x', phone='09120000008', is_staff=True)
+        cls.customer = User.objects.create_user(username='sara', password='x', phone='09121234567')
+        cls.other = User.objects.create_user(username='reza', password='x', phone='09129876543')
+        cls.order = Order.objects.create(
+            user=cls.customer, status=Order.OrderStatusChoices.PROCESSING, tracking_code='TRK-778899',
+        )
+        cls.other_order = Order.objects.create(user=cls.other, status=Order.OrderStatusChoices.PROCESSING)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def search(self, term):
+        response = self.client.get('/api/v1/admin/orders/list/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_order_number(self):
+        self.order.refresh_from_db()
+        self.assertEqual(self.search(self.order.order_number), [self.order.pk])
+        self.assertEqual(self.search(self.order.order_number.lstrip('#').lower()), [self.order.pk])
+
+    def test_tracking_code(self):
+        self.assertEqual(self.search('TRK-778899'), [self.order.pk])
+
+    def test_phone_variants(self):
+        for phone in ('09121234567', '9121234567', '989121234567', '+989121234567', '۰۹۱۲۱۲۳۴۵۶۷'):
+            with self.subTest(phone=phone):
+                self.assertEqual(self.search(phone), [self.order.pk])
+
+    def test_search_document_terms(self):
+        self.assertEqual(self.search('sara'), [self.order.pk])
+        self.assertEqual(self.search('nobody'), [])
+
+    def test_customer_change_refreshes_document(self):
+        self.customer.phone = '09351112233'
+        self.customer.save(update_fields=['phone'])
+        self.assertEqual(self.search('9351112233'), [self.order.pk])
+        self.assertEqual(self.search('09121234567'), [])
+
+    def test_unrelated_customer_fields_skip_refresh(self):
+        with mock.patch('orders.order_search.refresh_search_documents') as refresh:
+            self.customer.save(update_fields=['last_login'])
+        refresh.assert_not_called()
+
+
+class CartLineUpsertTests(TestCase):
+    """add_cart_line روی دیتابیس‌های بدون INSERT ... ON CONFLICT (مسیر قفل و ذخیره عادی)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='customer', password='x', phone='09120000009')
+        cls.cake, cls.flavor, cls.size_variant, cls.supply, cls.addon = create_catalog()
+
+    def setUp(self):
+        self.cart = get_or_create_cart(self.user)
+        # روی PostgreSQL هم همین مسیر جایگزین تست می‌شود
+        locked = mock.patch('orders.cart_service._upsert_line_postgresql', side_effect=cart_service._upsert_line_locked)
+        locked.start()
+        self.addCleanup(locked.stop)
+
+    def assertCartTotal(self, expected):
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_price, Decimal(expected))
+        self.cart.update_total_price()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_price, Decimal(expected))
+
+    def test_same_product_merges_into_one_line(self):
+        first = add_cart_line(self.cart, self.cake, 2, flavor=self.flavor, size_variant=self.size_variant)
+        self.assertTrue(first.created)
+        self.assertEqual(first.cart_total, Decimal('220'))
+
+        second = add_cart_line(self.cart, self.cake, 1, flavor=self.flavor, size_variant=self.size_variant)
+        self.assertFalse(second.created)
+        self.assertEqual(second.item.pk, first.item.pk)
+        self.assertEqual(second.item.quantity, 3)
+        self.assertEqual(second.cart_total, Decimal('330'))
+        self.assertEqual(self.cart.items.count(), 1)
+        self.assertCartTotal('330')
+
+    def test_different_options_and_products_get_their_own_lines(self):
+        add_cart_line(self.cart, self.cake, 1, flavor=self.flavor, size_variant=self.size_variant)
+        other_flavor = Flavor.objects.create(name='Vanilla')
+        add_cart_line(self.cart, self.cake, 1, flavor=other_flavor, size_variant=self.size_variant)
+        add_cart_line(self.cart, self.supply, 2)
+        result = add_cart_line(self.cart, self.supply, 3)
+        self.assertEqual(result.item.quantity, 5)
+        self.assertEqual(self.cart.items.count(), 3)
+        self.assertCartTotal('245')
+
+    def test_merge_reprices_existing_line(self):
+        add_cart_line(self.cart, self.cake, 2, flavor=self.flavor, size_variant=self.size_variant)
+        CakeSizeVariant.objects.filter(pk=self.size_variant.pk).update(price_modifier=Decimal('20'))
+        self.size_variant.refresh_from_db()
+
+        result = add_cart_line(self.cart, self.cake, 1, flavor=self.flavor, size_variant=self.size_variant)
+        self.assertEqual(result.item.price_at_order, Decimal('120'))
+        self.assertEqual(result.cart_total, Decimal('360'))
+        self.assertCartTotal('360')
+
+
+class BulkStatusUpdateTests(TestCase):
+    """تغییر وضعیت گروهی: نتیجه هر شناسه، پاسخ 207 و لاگ، rollup فروش، صف مشابه‌ها و صف پیامک."""
+
+    URL = '/api/v1/admin/orders/list/bulk-update-status/'
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_user(username='admin', password='x', phone='09120000010', is_staff=True)
+        cls.customer = User.objects.create_user(username='customer', password='x', phone='09120000011')
+        cls.cake, cls.flavor, cls.size_variant, cls.supply, cls.addon = create_catalog()
+        SMSTemplate.objects.create(
+            event_trigger=SMSTemplate.EventTriggerChoices.PROCESSING,
+            message_template='سفارش {{order_id}} شما در حال آماده‌سازی است.',
+        )
+
+    def setUp(self):
+        # registry قالب‌ها داخل پردازه است و با rollback تست پاک نمی‌شود
+        self.addCleanup(invalidate_sms_templates)
+        self.client.force_login(self.admin)
+        self.pending = Order.objects.create(user=self.customer, status=Order.OrderStatusChoices.PENDING_PAYMENT)
+        OrderItem.objects.create(
+            order=self.pending, content_type=ContentType.objects.get_for_model(Cake), object_id=self.cake.pk,
+            flavor=self.flavor, size_variant=self.size_variant,
+        )
+        self.processing = Order.objects.create(user=self.customer, status=Order.OrderStatusChoices.PROCESSING)
+
+    def rollup(self):
+        return DailySalesRollup.objects.filter(date=timezone.localdate(self.pending.created_at)).values_list(
+            'order_count', 'total_sales'
+        ).first() or (0, Decimal('0'))
+
+    def test_mixed_outcomes(self):
+        order_count, total_sales = self.rollup()
+        missing_id = self.processing.pk + 1000
+        response = self.client.post(self.URL, {
+            'order_ids': [self.pending.pk, self.processing.pk, missing_id, self.pending.pk],
+            'status': Order.OrderStatusChoices.PROCESSING,
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual(body['results'], [
+            {'id': self.pending.pk, 'outcome': 'updated'},
+            {'id': self.processing.pk, 'outcome': 'unchanged'},
+            {'id': missing_id, 'outcome': 'not_found'},
+        ])
+        self.assertEqual(body['updated_ids'], [self.pending.pk])
+
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, Order.OrderStatusChoices.PROCESSING)
+        self.assertEqual(
+            list(OrderStatusLog.objects.filter(order=self.pending, new_status=Order.OrderStatusChoices.PROCESSING)
+                 .values_list('changed_by', flat=True)),
+            [self.admin.pk],
+        )
+        self.assertFalse(OrderStatusLog.objects.filter(order=self.processing).exclude(changed_by=None).exists())
+
+        # فقط سفارشی که تازه فروش حساب شده به rollup اضافه می‌شود
+        self.assertEqual(self.rollup(), (order_count + 1, total_sales + Decimal('110')))
+        self.assertTrue(CakeSimilarityRefresh.objects.filter(cake=self.cake).exists())
+
+        notifications = Notification.objects.filter(type=Notification.NotificationTypeChoices.SMS)
+        self.assertEqual(list(notifications.values_list('order', 'status')), [
+            (self.pending.pk, Notification.NotificationStatusChoices.PENDING),
+        ])
+        self.assertIn(str(self.pending.pk), notifications.get().message)
+
+    def test_all_found_returns_200(self):
+        response = self.client.post(self.URL, {
+            'order_ids': [self.pending.pk, self.processing.pk], 'status': Order.OrderStatusChoices.CANCELLED,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated_ids'], [self.pending.pk, self.processing.pk])
+        self.assertFalse(Notification.objects.exists()) # قالبی برای لغو تعریف نشده
+
+    def test_invalid_input(self):
+        for payload in (
+            {'order_ids': [], 'status': Order.OrderStatusChoices.PROCESSING},
+            {'order_ids': [self.pending.pk], 'status': 'NOPE'},
+            {'order_ids': ['x'], 'status': Order.OrderStatusChoices.PROCESSING},
+        ):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.client.post(self.URL, payload, content_type='application/json').status_code, 400)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, Order.OrderStatusChoices.PENDING_PAYMENT)
+
+
+class SMSTemplateTests(TestCase):
+    """اعتبارسنجی متغیرهای قالب پیامک (مدل و سریالایزر) و render قالب کامپایل شده."""
+
+    CONTEXT = {
+        'customer_name': 'سارا', 'order_id': '42', 'order_total': '150000',
+        'store_name': 'BAKEJÖY', 'tracking_number': 'TRK-1',
+    }
+
+    def test_clean_rejects_unknown_placeholders(self):
+        template = SMSTemplate(
+            event_trigger=SMSTemplate.EventTriggerChoices.SHIPPED,
+            message_template='{{custmer_name}} عزیز، سفارش {{order_id}} ارسال شد. {{ tracking }}',
+        )
+        with self.assertRaises(ValidationError) as raised:
+            template.full_clean()
+        message = raised.exception.message_dict['message_template'][0]
+        self.assertTrue(message.startswith('Unknown placeholders: {{custmer_name}}, {{tracking}}.'), message)
+
+        template.message_template = '{{ customer_name }} عزیز، سفارش {{order_id}} ارسال شد.'
+        template.full_clean()
+
+    def test_serializer_rejects_unknown_placeholders(self):
+        serializer = SMSTemplateSerializer(data={
+            'event_trigger': SMSTemplate.EventTriggerChoices.SHIPPED, 'message_template': 'کد: {{tracking_code}}',
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('{{tracking_code}}', str(serializer.errors['message_template'][0]))
+
+        serializer = SMSTemplateSerializer(data={
+            'event_trigger': SMSTemplate.EventTriggerChoices.SHIPPED, 'message_template': 'کد: {{tracking_number}}',
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_render(self):
+        cases = [
+            ('بدون متغیر، با ۱۰٪ تخفیف', 'بدون متغیر، با ۱۰٪ تخفیف'),
+            ('تخفیف 10%', 'تخفیف 10%'),
+            ('{{order_id}}', '42'),
+            ('سفارش {{ order_id }} با 100% رضایت', 'سفارش 42 با 100% رضایت'),
+            (
+                '{{customer_name}} عزیز، سفارش {{order_id}} ({{order_total}} ریال) از {{store_name}}: {{tracking_number}} - {{order_id}}',
+                'سارا عزیز، سفارش 42 (150000 ریال) از BAKEJÖY: TRK-1 - 42',
+            ),
+            # متغیر ناشناخته (قالب‌های قدیمی) دست‌نخورده می‌ماند
+            ('{{coupon}} و {{order_id}} و %s', '{{coupon}} و 42 و %s'),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(CompiledSMSTemplate(text).render(self.CONTEXT), expected)
+
+    def test_render_matches_order_context(self):
+        user = get_user_model().objects.create_user(
+            username='sara', password='x', phone='09120000012', first_name='سارا', last_name='رضایی',
+        )
+        order = Order.objects.create(user=user, tracking_code='TRK-9')
+        compiled = CompiledSMSTemplate('{{customer_name}}: {{order_id}} / {{tracking_number}} / {{order_total}}')
+        self.assertEqual(compiled.render(order_sms_context(order)), f'سارا رضایی: {order.pk} / TRK-9 / 0')
+
+
+@override_settings(USE_SMS_IR_SANDBOX=False, SMS_IR_API_KEY_PRODUCTION='test-key', SMS_IR_LINE_NUMBER='30001234')
+class SmsDeliveryTests(StubServerMixin, TestCase):
+    """ارسال صف پیامک به sms.ir جعلی: انتخاب endpoint، نگاشت messageIds و تلاش دوباره خطای موقت."""
+
+    BULK_PATH = '/v1/send/bulk'
+    LIKE_TO_LIKE_PATH = '/v1/send/likeToLike'
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = [
+            User.objects.create_user(username=f'customer{index}', password='x', phone=f'0912000002{index}')
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.reset_stub()
+        base_url = override_settings(SMS_IR_API_BASE_URL=self.stub.url('/v1/'))
+        base_url.enable()
+        self.addCleanup(base_url.disable)
+
+    def queue(self, *messages):
+        return Notification.objects.bulk_create([
+            Notification(
+                user=user, message=message, type=Notification.NotificationTypeChoices.SMS,
+                status=Notification.NotificationStatusChoices.PENDING,
+            )
+            for user, message in zip(self.users, messages)
+        ])
+
+    def run_worker_once(self):
+        # همان کار run_sms_worker (claim_pending_sms و deliver_claimed_sms) بدون بستن اتصال تست
+        notification_ids = claim_pending_sms(10)
+        return dict(deliver_sms_batch(
+            Notification.objects.select_related('user').filter(pk__in=notification_ids).order_by('pk')
+        ))
+
+    def test_identical_texts_use_bulk(self):
+        self.queue('حراج آخر هفته', 'حراج آخر هفته')
+        self.assertEqual(self.run_worker_once(), {Notification.NotificationStatusChoices.SENT: 2})
+        calls = self.stub_calls(self.BULK_PATH)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][2]['messageText'], 'حراج آخر هفته')
+        self.assertEqual(calls[0][2]['mobiles'], ['9120000020', '9120000021'])
+        self.assertEqual(self.stub_calls(self.LIKE_TO_LIKE_PATH), [])
+
+    def test_mixed_texts_use_like_to_like(self):
+        self.queue('سارا عزیز، سفارش شما ارسال شد', 'رضا عزیز، سفارش شما ارسال شد')
+        self.run_worker_once()
+        calls = self.stub_calls(self.LIKE_TO_LIKE_PATH)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][2]['messageTexts'], ['سارا عزیز، سفارش شما ارسال شد', 'رضا عزیز، سفارش شما ارسال شد'])
+        self.assertEqual(self.stub_calls(self.BULK_PATH), [])
+
+    def test_message_ids_map_to_recipients(self):
+        self.stub.respond('POST', self.LIKE_TO_LIKE_PATH, body={
+            'status': 1, 'message': 'موفق', 'data': {'packId': 'pack-1', 'messageIds': [501, 0, 503], 'cost': 3.0},
+        })
+        first, rejected, third = self.queue('a', 'b', 'c')
+        self.assertEqual(self.run_worker_once(), {
+            Notification.NotificationStatusChoices.SENT: 2, Notification.NotificationStatusChoices.FAILED: 1,
+        })
+        for notification, message_ids in ((first, [501]), (third, [503])):
+            notification.refresh_from_db()
+            self.assertEqual(notification.status, Notification.NotificationStatusChoices.SENT)
+            self.assertEqual(notification.gateway_message_ids, message_ids)
+            self.assertEqual(notification.gateway_pack_id, 'pack-1')
+        rejected.refresh_from_db()
+        self.assertEqual(rejected.status, Notification.NotificationStatusChoices.FAILED)
+        self.assertEqual(rejected.gateway_response_message, 'Recipient rejected by gateway.')
+
+    def test_server_error_is_retried_until_max_attempts(self):
+        self.stub.respond('POST', self.BULK_PATH, status=503, body={'detail': 'busy'})
+        notification, = self.queue('حراج آخر هفته')
+
+        for attempt in range(1, SMS_MAX_ATTEMPTS + 1):
+            started = timezone.now()
+            self.run_worker_once()
+            notification.refresh_from_db()
+            self.assertEqual(notification.attempts, attempt)
+            if attempt == SMS_MAX_ATTEMPTS:
+                break
+            self.assertEqual(notification.status, Notification.NotificationStatusChoices.PENDING)
+            self.assertGreaterEqual(notification.next_attempt_at, started + SMS_RETRY_DELAYS[attempt - 1])
+            # تا زمان تلاش بعدی برداشته نمی‌شود
+            self.assertEqual(claim_pending_sms(10), [])
+            Notification.objects.filter(pk=notification.pk).update(next_attempt_at=timezone.now())
+
+        self.assertEqual(notification.status, Notification.NotificationStatusChoices.FAILED)
+        # POST در خود http_client تکرار نمی‌شود؛ هر تلاش صف یک درخواست است
+        self.assertEqual(len(self.stub_calls(self.BULK_PATH)), SMS_MAX_ATTEMPTS)
+        self.assertEqual(claim_pending_sms(10), [])
+
+
+class HttpClientTests(StubServerMixin, SimpleTestCase):
+    """Session مشترک http_client: تلاش دوباره فقط برای GET، استفاده دوباره از اتصال و آمار تأخیر."""
+
+    PATH = '/probe'
+
+    def setUp(self):
+        self.reset_stub()
+        self.url = self.stub.url(self.PATH)
+
+    def test_server_errors_retry_get_but_not_post(self):
+        self.stub.respond('GET', self.PATH, status=503, body={})
+        self.stub.respond('POST', self.PATH, status=503, body={})
+        self.assertEqual(http_client.get(self.url).status_code, 503)
+        self.assertEqual(len(self.stub_calls(self.PATH)), 3) # یک درخواست و دو تلاش دوباره (status=2)
+
+        self.stub.calls.clear()
+        self.assertEqual(http_client.post(self.url, json={'mobiles': []}).status_code, 503)
+        self.assertEqual(len(self.stub_calls(self.PATH)), 1)
+
+    def test_read_timeouts_retry_get_but_not_post(self):
+        self.stub.respond('GET', self.PATH, body={}, delay=0.5)
+        self.stub.respond('POST', self.PATH, body={}, delay=0.5)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            http_client.get(self.url, timeout=0.1)
+        self.assertEqual(len(self.stub_calls(self.PATH)), 2) # read=1
+
+        self.stub.calls.clear()
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            http_client.post(self.url, timeout=0.1)
+        self.assertEqual(len(self.stub_calls(self.PATH)), 1)
+
+    def test_connection_is_reused(self):
+        for _ in range(3):
+            self.assertEqual(http_client.post(self.stub.url('/v1/send/bulk'), json={'mobiles': ['9120000000']}).status_code, 200)
+            self.assertEqual(http_client.get(self.stub.url('/v1/credit')).status_code, 200)
+        connection_ids = {call[3] for call in self.stub.calls}
+        self.assertEqual(len(self.stub.calls), 6)
+        self.assertEqual(len(connection_ids), 1)
+
+    def test_latency_stats(self):
+        host = urlsplit(self.url).netloc
+        before = http_client.latency_stats().get(host, {'calls': 0, 'errors': 0})
+        self.stub.respond('POST', self.PATH, status=500, body={})
+        http_client.get(self.stub.url('/v1/credit'))
+        http_client.post(self.url)
+        stats = http_client.latency_stats()[host]
+        self.assertEqual(stats['calls'], before['calls'] + 2)
+        self.assertEqual(stats['errors'], before['errors'] + 1)
+        self.assertGreater(stats['max_ms'], 0)
+        self.assertGreaterEqual(stats['max_ms'], stats['avg_ms'])
+
+
+class SalesRollupTests(TestCase):
+    """بازه نامعتبر گزارش فروش 400 می‌دهد و rebuild_sales_rollups --days ویرایش سفارش‌های فروش شده را اعمال می‌کند."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user(
+            username='admin', password='x', phone='09120000030', is_staff=True,
+        )
+        cls.cake, cls.flavor, cls.size_variant, cls.supply, cls.addon = create_catalog()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_unknown_period_is_rejected(self):
+        for url in ('/api/v1/admin/orders/sales-chart-data/', '/api/v1/admin/orders/top-selling-products/'):
+            for period in ('7x', 'last_week', '0d'):
+                with self.subTest(url=url, period=period):
+                    self.assertEqual(self.client.get(url, {'period': period}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/admin/orders/sales-chart-data/', {'period': '30d'}).status_code, 200)
+
+    def test_scheduled_rebuild_applies_item_edits(self):
+        order = Order.objects.create(user=self.admin, status=Order.OrderStatusChoices.PENDING_PAYMENT)
+        item = OrderItem.objects.create(
+            order=order, content_type=ContentType.objects.get_for_model(Cake), object_id=self.cake.pk,
+            flavor=self.flavor, size_variant=self.size_variant,
+        )
+        order.change_status(Order.OrderStatusChoices.PROCESSING)
+        day = timezone.localdate(order.created_at)
+        self.assertEqual(DailySalesRollup.objects.get(date=day).total_sales, Decimal('110'))
+
+        # ویرایش آیتم سفارشی که از قبل فروش حساب شده فقط با بازسازی زمان‌بندی شده اعمال می‌شود
+        item.quantity = 3
+        item.save()
+        call_command('rebuild_sales_rollups', days=1, stdout=io.StringIO())
+        rollup = DailySalesRollup.objects.get(date=day)
+        self.assertEqual((rollup.order_count, rollup.total_sales), (1, Decimal('330')))
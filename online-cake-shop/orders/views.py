@@ -18,17 +18,13 @@ from django_filters.rest_framework import DjangoFilterBackend # برای فیل
 from rest_framework.pagination import PageNumberPagination
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models.functions import TruncDate
-import jdatetime
-from weasyprint import HTML, CSS
 from django.conf import settings
-from django.template.loader import render_to_string
 from django.db import transaction
-from django.contrib.contenttypes.models import ContentType
+from . import cart_service, http_client
 
 
 import traceback
-from django.db.models import Sum, Count, Q # برای کوئری های تجمعی و شرطی
+from django.db.models import Count, Q # برای کوئری های تجمعی و شرطی
 from django.contrib.auth.models import User # برای آمار کاربران
 # ایمپورت مدل‌ها
 from .models import Order, OrderItem, Transaction, Cake, Flavor, Size,Notification,OrderStatusLog # مدل‌ها # Transaction فعلا فقط در pay استفاده شده
@@ -36,10 +32,8 @@ from .models import Order, OrderItem, Transaction, Cake, Flavor, Size,Notificati
 from products.models import Cake, Flavor, Size # فرض بر اینکه مدل محصول Cake است
 from django.contrib.auth import get_user_model
 from django.shortcuts import redirect, get_object_or_404
-from django.http import HttpResponse, Http404 # Http404 را هم اضافه کنید
 from django.conf import settings
 import requests
-import json
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Count, Q
 
@@ -48,14 +42,30 @@ from .serializers import (
    OrderStatusLogSerializer,InternalOrderNoteSerializer,NotificationLogSerializer,SMSTemplateSerializer,AdminDashboardStatsSerializer,OrderItemReadSerializer,CartItemUpdateSerializer, OrderSerializer, OrderItemSerializer, OrderItemAddSerializer,AdminOrderStatusUpdateSerializer, OrderCheckoutUpdateSerializer  # سریالایزر جدید برای افزودن آیتم
 )
 # -------------------------
-from .sms_service import send_order_status_sms # اگر در همین اپ orders است
-from .models import SMSTemplate
+from .sms_service import enqueue_order_status_sms # اگر در همین اپ orders است
+from .models import SMSTemplate, RenderJob, DailySalesRollup
+from .serializers import RenderJobSerializer
 frontend_base_url = getattr(settings, 'FRONTEND_URL', '/')
 failure_url = f"{frontend_base_url}/payment/failure"
 User = get_user_model()
 
-import csv # <--- ماژول csv پایتون را وارد کنید
-from django.http import HttpResponse # <--- برای ارسال پاسخ CSV
+from .prefetch import GenericProductPrefetcher
+from .exports import gzip_stream, iter_orders_csv, parse_columns
+from .render_jobs import enqueue_render_job, normalize_query_params
+from .dashboard import get_dashboard_stats, invalidate_dashboard_stats
+from .date_presets import filter_by_preset
+from .order_search import AdminOrderSearchFilter
+from .order_validators import order_validators
+from .pagination import CreatedAtKeysetPagination
+from products.conditional import ConditionalGetMixin
+from .sales_rollups import SALES_STATUSES, apply_orders_to_rollups, resolve_sales_period
+from .status_service import OUTCOME_NOT_FOUND, OUTCOME_UNCHANGED, OUTCOME_UPDATED, bulk_change_status
+from .invoice_cache import cached_invoice_path, invoice_file_response, render_invoice_html
+from .payment_service import process_zarinpal_callback
+from django.http import FileResponse, StreamingHttpResponse
+from django.core.files.storage import default_storage
+
+
 class AdminDashboardStatsView(APIView):
     """
     Provides key statistics for the admin dashboard.
@@ -63,52 +73,8 @@ class AdminDashboardStatsView(APIView):
     permission_classes = [permissions.IsAdminUser] # فقط دسترسی ادمین
 
     def get(self, request, *args, **kwargs):
-        now = timezone.now()
-        current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        # وضعیت هایی که نشانه درآمد قطعی هستند (مثال)
-        # شما باید این را با وضعیت های نهایی و موفق خودتان تنظیم کنید
-        revenue_statuses = [Order.OrderStatusChoices.DELIVERED, Order.OrderStatusChoices.PROCESSING]
-        # یا اگر وضعیت COMPLETED دارید:
-        # revenue_statuses = [Order.OrderStatusChoices.DELIVERED, Order.OrderStatusChoices.COMPLETED]
-
-        # محاسبه آمارها
-        cancelled_orders_count = Order.objects.filter(status=Order.OrderStatusChoices.CANCELLED).count()
-        delivered_orders_count = Order.objects.filter(status=Order.OrderStatusChoices.DELIVERED).count()
-        todays_orders_count = Order.objects.filter(created_at__date=now.date()).exclude(status=Order.OrderStatusChoices.CART).count()
-
-        pending_payment_orders_count = Order.objects.filter(status=Order.OrderStatusChoices.PENDING_PAYMENT).count()
-        processing_orders_count = Order.objects.filter(status=Order.OrderStatusChoices.PROCESSING).count()
-        total_orders_count = Order.objects.exclude(status=Order.OrderStatusChoices.CART).count()
-        total_users_count = User.objects.count()
-        active_products_count = Cake.objects.filter(is_active=True).count()
-
-        total_revenue_month_agg = Order.objects.filter(
-            status__in=revenue_statuses,
-            created_at__gte=current_month_start
-        ).aggregate(total=Sum('total_price'))
-        total_revenue_month = total_revenue_month_agg['total'] or 0
-
-        today_revenue_agg = Order.objects.filter(
-            status__in=revenue_statuses,
-            created_at__gte=today_start
-        ).aggregate(total=Sum('total_price'))
-        today_revenue = today_revenue_agg['total'] or 0
-
-        # آماده سازی داده برای سریالایزر
-        data = {
-            'todays_orders_count': todays_orders_count,
-            'delivered_orders_count': delivered_orders_count,
-            'cancelled_orders_count': cancelled_orders_count,
-            'pending_orders_count': pending_payment_orders_count, # اسم را به pending_payment تغییر دادم
-            'processing_orders_count': processing_orders_count,
-            'total_orders_count': total_orders_count,
-            'total_users_count': total_users_count,
-            'active_products_count': active_products_count,
-            'total_revenue_month': total_revenue_month,
-            'today_revenue': today_revenue,
-        }
+        # همه آمار سفارش‌ها در یک کوئری و با کش کوتاه‌مدت (orders/dashboard.py)
+        data = get_dashboard_stats()
 
         serializer = AdminDashboardStatsSerializer(data=data)
         # توجه: چون خودمان داده را ساخته‌ایم و از دیتابیس نخوانده‌ایم،
@@ -124,18 +90,22 @@ class CustomAdminOrderPagination(PageNumberPagination):
     page_size = 10  # اندازه صفحه پیش‌فرض اگر limit ارسال نشود (برای لیست کامل سفارشات)
     max_page_size = 100 # اختیاری
 
+class AdminOrderPagination(CreatedAtKeysetPagination):
+    # صفحه‌بندی keyset روی (created_at, id)؛ ?page= یا مرتب‌سازی روی فیلدهای دیگر همان صفحه‌بندی شماره‌ای قبلی است
+    fallback_pagination_class = CustomAdminOrderPagination
+
 class AdminOrderViewSet(viewsets.ReadOnlyModelViewSet):
     queryset =Order.objects.filter(is_deleted=False).select_related(
-        'user', 'address'
+        'user', 'address__user', 'address__city__province'
     ).prefetch_related(
-        'items__content_object', 'items__flavor', 'items__size_variant', 'transactions'
+        'transactions', 'status_logs__changed_by'
     ).order_by('-created_at')
     serializer_class = OrderSerializer # سریالایزر اصلی برای خواندن سفارش
     permission_classes = [permissions.IsAdminUser]
-    pagination_class = CustomAdminOrderPagination
+    pagination_class = AdminOrderPagination
     filter_backends = [
         DjangoFilterBackend, # برای فیلترهای دقیق مانند status
-        filters.SearchFilter,  # برای جستجو در متن
+        AdminOrderSearchFilter,  # جستجو در search_document و تطبیق دقیق شماره سفارش/رهگیری/موبایل
         filters.OrderingFilter # برای مرتب‌سازی (شما قبلاً ordering پیش‌فرض دارید)
     ]
 
@@ -147,191 +117,74 @@ class AdminOrderViewSet(viewsets.ReadOnlyModelViewSet):
         # 'user__id': ['exact'], // برای فیلتر بر اساس شناسه کاربر
     }
 
-    # تعریف فیلدهایی که پارامتر query 'search' باید در آن‌ها جستجو کند
-    search_fields = [
-        'id',                 # جستجو در شماره سفارش (اگر شماره سفارش همان id است)
-        'user__username',     # جستجو در نام کاربری
-        'user__first_name',   # جستجو در نام مشتری
-        'user__last_name',    # جستجو در نام خانوادگی مشتری
-        'user__email',        # جستجو در ایمیل مشتری
-        'address__street',    # جستجو در آدرس خیابان
-        'address__city',      # جستجو در شهر آدرس
-        # می‌توانید فیلدهای دیگری هم برای جستجو اضافه کنید
-    ]
+    # پارامتر query 'search' در search_document سفارش جستجو می‌شود که این فیلدها را در خود دارد:
+    # شماره و ID سفارش، کد رهگیری، نام کاربری/نام/ایمیل/موبایل مشتری و گیرنده/تلفن/خیابان/کد پستی/شهر آدرس
+    # (orders/order_search.py)
+
     ordering_fields = ['created_at', 'total_price', 'status', 'user__username']
     ordering = ['-created_at'] # مرتب‌سازی پیش‌فرض شما
     
 
     def get_queryset(self):
         queryset = super().get_queryset().filter(is_deleted=False)
+        # محصول آیتم‌ها به تفکیک نوع و با plan متناسب با ?expand=product
+        queryset = queryset.prefetch_related(GenericProductPrefetcher.for_request(self.request).items_prefetch())
         date_filter_param = self.request.query_params.get('date_filter', None)
 
         if date_filter_param:
-            today_gregorian = timezone.now().date() # تاریخ میلادی امروز
-
-            if date_filter_param == 'today': # فیلتر "امروز" همچنان می‌تواند میلادی باشد
-                queryset = queryset.filter(created_at__date=today_gregorian)
-            
-            elif date_filter_param == 'last_7_days': # فیلتر "۷ روز گذشته" میلادی
-                seven_days_ago = today_gregorian - timedelta(days=6)
-                queryset = queryset.filter(created_at__date__gte=seven_days_ago, created_at__date__lte=today_gregorian)
-
-            # --- مدیریت گزینه‌های شمسی ---
-            elif date_filter_param == 'this_shamsi_month':
-                current_shamsi_date = jdatetime.date.today()
-                start_of_shamsi_month_gregorian = jdatetime.date(current_shamsi_date.year, current_shamsi_date.month, 1).togregorian()
-                
-                # محاسبه روز آخر ماه شمسی
-                if current_shamsi_date.month <= 6:
-                    last_day_of_shamsi_month = 31
-                elif current_shamsi_date.month <= 11:
-                    last_day_of_shamsi_month = 30
-                else: # اسفند
-                    last_day_of_shamsi_month = 29 if not current_shamsi_date.isleap() else 30
-                
-                end_of_shamsi_month_gregorian = jdatetime.date(current_shamsi_date.year, current_shamsi_date.month, last_day_of_shamsi_month).togregorian()
-                
-                queryset = queryset.filter(created_at__date__gte=start_of_shamsi_month_gregorian, 
-                                           created_at__date__lte=end_of_shamsi_month_gregorian)
-
-            elif date_filter_param == 'last_shamsi_month':
-                current_shamsi_date = jdatetime.date.today()
-                # محاسبه ماه و سال شمسی قبلی
-                if current_shamsi_date.month == 1:
-                    last_month_year_shamsi = current_shamsi_date.year - 1
-                    last_month_month_shamsi = 12
-                else:
-                    last_month_year_shamsi = current_shamsi_date.year
-                    last_month_month_shamsi = current_shamsi_date.month - 1
-                
-                start_of_last_shamsi_month_gregorian = jdatetime.date(last_month_year_shamsi, last_month_month_shamsi, 1).togregorian()
-                
-                if last_month_month_shamsi <= 6:
-                    last_day_of_last_shamsi_month = 31
-                elif last_month_month_shamsi <= 11:
-                    last_day_of_last_shamsi_month = 30
-                else: # اسفند
-                    # برای سال کبیسه شمسی، باید سال شمسی که در آن هستیم را بررسی کنیم
-                    last_day_of_last_shamsi_month = 29 if not jdatetime.date(last_month_year_shamsi, 1, 1).isleap() else 30 
-                                                        # (یا از خود jdatetime.date(last_month_year_shamsi, last_month_month_shamsi, 1).isleap() اگر دقیق‌تر است)
-                
-                end_of_last_shamsi_month_gregorian = jdatetime.date(last_month_year_shamsi, last_month_month_shamsi, last_day_of_last_shamsi_month).togregorian()
+            # today, last_7_days, this_shamsi_month, last_shamsi_month, this_shamsi_year, ...
+            # بازه [شروع، پایان) مستقیماً روی created_at فیلتر می‌شود تا ایندکس (is_deleted, status, created_at) استفاده شود
+            try:
+                queryset = filter_by_preset(queryset, date_filter_param)
+            except ValueError:
+                pass # گزینه ناشناخته مثل قبل نادیده گرفته می‌شود
 
-                queryset = queryset.filter(created_at__date__gte=start_of_last_shamsi_month_gregorian, 
-                                           created_at__date__lte=end_of_last_shamsi_month_gregorian)
-            # می‌توانید سایر گزینه‌های تاریخ شمسی را به همین ترتیب اضافه کنید
-            
         return queryset
     @action(detail=False, methods=['get'], url_path='export-csv', permission_classes=[permissions.IsAdminUser])
     def export_csv(self, request):
+        """
+        خروجی CSV سفارش‌های فیلتر شده به صورت جریانی (StreamingHttpResponse).
+        ?columns=id,status,total_price برای انتخاب ستون‌ها و ?compress=gzip برای خروجی فشرده.
+        """
         # ۱. دریافت کوئری‌ست فیلتر شده (همان کوئری‌ستی که در لیست نمایش داده می‌شود)
         # متد filter_queryset از DRF، فیلترهای تعریف شده در filter_backends 
         # (مانند search, status, و ordering) را روی get_queryset اعمال می‌کند.
         queryset = self.filter_queryset(self.get_queryset()) 
                                     # get_queryset شما هم فیلتر تاریخ را اعمال می‌کند.
 
-        # ۲. ایجاد پاسخ HTTP با content_type مناسب برای CSV
-        response = HttpResponse(
-            content_type='text/csv; charset=utf-8', # charset=utf-8 برای پشتیبانی از فارسی
-            headers={'Content-Disposition': 'attachment; filename="orders_export.csv"'},
-        )
-        response.write(u'\ufeff'.encode('utf8')) # BOM برای نمایش صحیح فارسی در Excel
-
-        # ۳. ایجاد یک CSV writer
-        writer = csv.writer(response)
-
-        # ۴. نوشتن ردیف هدر (عناوین ستون‌ها)
-        # این فیلدها را مطابق با نیاز خودتان انتخاب کنید
-        headers = [
-            'ID سفارش', 'نام کاربری مشتری', 'ایمیل مشتری', 'نام مشتری', 'نام خانوادگی مشتری',
-            'وضعیت سفارش', 'مبلغ کل (تومان)', 'تاریخ ایجاد', 'زمان ایجاد',
-            'آدرس کامل', 'شهر', 'کد پستی', 'یادداشت‌های سفارش', 'کد رهگیری پستی'
-            # می‌توانید جزئیات آیتم‌ها را هم به صورت خلاصه اضافه کنید، اما ممکن است پیچیده شود
-        ]
-        writer.writerow(headers)
-
-        # ۵. نوشتن داده‌های سفارشات در CSV
-        for order in queryset:
-            user_username = order.user.username if order.user else 'N/A'
-            user_email = order.user.email if order.user else 'N/A'
-            user_first_name = order.user.first_name if order.user else ''
-            user_last_name = order.user.last_name if order.user else ''
-
-            full_address = ""
-            city = ""
-            postal_code = ""
-            if order.address:
-                full_address = order.address.street # فرض کنید street همان آدرس کامل است
-                city = order.address.city
-                postal_code = order.address.postal_code
-
-            writer.writerow([
-                order.id,
-                user_username,
-                user_email,
-                user_first_name,
-                user_last_name,
-                order.get_status_display(), # نمایش لیبل فارسی وضعیت
-                order.total_price,
-                order.created_at.strftime('%Y-%m-%d') if order.created_at else '', # فرمت تاریخ
-                order.created_at.strftime('%H:%M:%S') if order.created_at else '', # فرمت زمان
-                full_address,
-                city,
-                postal_code,
-                order.notes,
-                order.tracking_code
-            ])
-
+        # ۲. ستون‌های انتخاب شده
+        try:
+            columns = parse_columns(request.query_params.get('columns'))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # ۳. تولید سطرها به صورت جریانی؛ هیچ‌وقت کل سفارش‌ها در حافظه نگه داشته نمی‌شوند
+        rows = iter_orders_csv(queryset, columns)
+        if request.query_params.get('compress') == 'gzip':
+            response = StreamingHttpResponse(gzip_stream(rows), content_type='application/gzip')
+            response['Content-Disposition'] = 'attachment; filename="orders_export.csv.gz"'
+        else:
+            response = StreamingHttpResponse(
+                (chunk.encode('utf-8') for chunk in rows),
+                content_type='text/csv; charset=utf-8', # charset=utf-8 برای پشتیبانی از فارسی
+            )
+            response['Content-Disposition'] = 'attachment; filename="orders_export.csv"'
         return response
-    @action(detail=False, methods=['get'], url_path='export-pdf', permission_classes=[permissions.IsAdminUser])
+    @action(detail=False, methods=['get', 'post'], url_path='export-pdf', permission_classes=[permissions.IsAdminUser])
     def export_pdf(self, request):
-        # ۱. وارد کردن WeasyPrint (بهتر است در بالای فایل باشد، اما برای نمایش اینجا گذاشتم)
-        try:
-            from weasyprint import HTML, CSS
-            from django.conf import settings # برای دسترسی به STATIC_URL یا مسیر فونت‌ها
-        except ImportError:
-            # اگر WeasyPrint یا وابستگی‌هایش نصب نشده باشند
-            return HttpResponse("خطا: کتابخانه WeasyPrint به درستی نصب نشده است.", status=500)
-
-        # ۲. دریافت کوئری‌ست فیلتر شده
-        queryset = self.filter_queryset(self.get_queryset())
-
-        # ۳. آماده‌سازی context برای ارسال به قالب HTML
-        context = {
-            'orders': queryset,
-            # می‌توانید اطلاعات دیگری هم به context اضافه کنید، مثلاً تاریخ گزارش، نام کاربر ادمین و ...
+        """
+        ساخت PDF لیست سفارش‌های فیلتر شده را در صف RenderJob قرار می‌دهد (توسط run_render_worker ساخته می‌شود).
+        پاسخ 202 شامل شناسه کار، آدرس بررسی وضعیت و پس از آماده شدن، آدرس دانلود است.
+        """
+        # فیلترهای فعلی لیست (status, search, ordering, date_filter و ...) همراه کار ذخیره می‌شوند
+        params = {
+            'query': normalize_query_params(request.query_params),
+            'base_url': request.build_absolute_uri('/'),
         }
-
-        # ۴. رندر کردن قالب HTML به رشته
-        try:
-            html_string = render_to_string('orders/admin_order_list_pdf.html', context)
-        except Exception as e:
-            return HttpResponse(f"خطا در رندر کردن قالب HTML برای PDF: {e}", status=500)
-
-        # ۵. تبدیل رشته HTML به PDF با WeasyPrint
-        try:
-            # اگر فونت‌های شما در مسیر استاتیک هستند و می‌خواهید WeasyPrint به آن‌ها دسترسی داشته باشد:
-            # font_config = FontConfiguration()
-            # css = CSS(string='@font-face { font-family: Vazirmatn; src: url(%sfonts/Vazirmatn-Regular.ttf); }' % settings.STATIC_URL, font_config=font_config)
-            # به جای STATIC_URL می‌توانید از مسیر کامل فایل فونت استفاده کنید اگر در جای دیگری است.
-            # یا اگر @font-face را مستقیماً در HTML template خود تعریف کرده‌اید، معمولاً WeasyPrint آن را پیدا می‌کند.
-
-            # ساده‌ترین حالت (اگر @font-face در HTML است و مسیرها درست هستند):
-            html = HTML(string=html_string, base_url=request.build_absolute_uri('/')) # base_url برای یافتن فایل‌های استاتیک (مثل فونت یا تصاویر) مهم است
-            pdf_file = html.write_pdf()
-            # اگر از CSS جداگانه استفاده می‌کنید:
-            # pdf_file = html.write_pdf(stylesheets=[CSS(settings.STATIC_ROOT + '/css/your_pdf_styles.css')])
-
-        except Exception as e:
-            # لاگ کردن خطا برای بررسی بیشتر
-            print(f"خطا در تولید PDF با WeasyPrint: {e}") # این را با سیستم لاگ‌گیری جایگزین کنید
-            return HttpResponse(f"خطا در تولید فایل PDF: {e}. لطفاً وابستگی‌های WeasyPrint را بررسی کنید.", status=500)
-
-        # ۶. ایجاد پاسخ HTTP با محتوای PDF
-        response = HttpResponse(pdf_file, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="لیست_سفارشات.pdf"' # یا "orders_export.pdf"
-
-        return response           
+        job, created = enqueue_render_job(RenderJob.KindChoices.ORDER_LIST_PDF, params, user=request.user)
+        print(f"Order list PDF job {job.id} {'queued' if created else 'reused'} (status={job.status})")
+        serializer = RenderJobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
     @action(detail=False, methods=['post'], url_path='bulk-update-status', permission_classes=[permissions.IsAdminUser])
     def bulk_update_status(self, request):
         order_ids = request.data.get('order_ids')
@@ -357,72 +210,43 @@ class AdminOrderViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # ۲. به‌روزرسانی سفارشات
-        updated_count = 0
-        not_found_ids = []
-        error_during_update_ids = []
+        try:
+            order_ids = [int(order_id) for order_id in order_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {'detail': 'شناسه‌های سفارش (order_ids) باید عدد صحیح باشند.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # برای اجرای متد save() و سیگنال‌های احتمالی هر سفارش، روی آن‌ها پیمایش می‌کنیم.
-        # اگر تعداد سفارشات بسیار زیاد است، روش bulk_update جنگو کارآمدتر است،
-        # اما متد save() را فراخوانی نمی‌کند.
-        queryset = Order.objects.filter(id__in=order_ids)
-        
-        # بررسی اینکه آیا تمام ID های درخواستی معتبر هستند
-        if queryset.count() != len(set(order_ids)): # استفاده از set برای حذف ID های تکراری احتمالی از ورودی
-            found_ids = set(queryset.values_list('id', flat=True))
-            not_found_ids = [order_id for order_id in set(order_ids) if order_id not in found_ids]
-            if not_found_ids:
-                 return Response(
-                    {'detail': f"یک یا چند شناسه سفارش نامعتبر یا یافت نشد: {not_found_ids}"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        for order in queryset:
-            old_status = order.status
-            if old_status != new_status_key:
-                order.status = new_status_key
-                try:
-                    order.save(update_fields=['status', 'updated_at']) # فقط فیلدهای لازم را آپدیت کن
-                    updated_count += 1
-                    print(f"Order ID {order.id} status updated to '{new_status_key}' by admin {request.user.username}.")
-                    try:
-                        OrderStatusLog.objects.create(
-                            order=order, 
-                            new_status=order.status, # وضعیت جدید که ذخیره شده
-                            changed_by=request.user, 
-                            notes=f"وضعیت از '{old_status}' به '{order.get_status_display()}' توسط ادمین {request.user.username} تغییر کرد."
-                        )
-                        print(f"Status change logged for Order ID {order.id}.")
-                    except Exception as log_e:
-                        # اگر در لاگ کردن خطا رخ داد، نباید کل عملیات را متوقف کند
-                        # اما باید این خطا را در سیستم لاگ‌گیری اصلی خود ثبت کنید
-                            print(f"CRITICAL: Failed to log status change for Order ID {order.id}: {log_e}")
-                    # TODO (اختیاری): ارسال پیامک برای هر سفارش آپدیت شده
-                    # این بخش را با دقت در نظر بگیرید چون ممکن است تعداد زیادی پیامک ارسال شود.
-                    # شاید بخواهید برای عملیات گروهی، پیامک ارسال نکنید یا یک نوع پیامک متفاوت ارسال کنید.
-                    # try:
-                    #     send_order_status_sms(order, new_status_key)
-                    # except Exception as sms_e:
-                    #     print(f"CRITICAL: Error sending SMS for bulk updated order {order.id}: {sms_e}")
-                    #     # این خطا نباید مانع از ادامه عملیات گروهی شود
-                    
-                except Exception as e:
-                    print(f"Error updating order {order.id} during bulk update: {e}")
-                    error_during_update_ids.append(order.id)
-        
-        if error_during_update_ids:
-             return Response(
-                {
-                    'detail': f"{updated_count} سفارش به‌روز شد، اما برای سفارشات با ID {error_during_update_ids} خطایی رخ داد.",
-                    'updated_count': updated_count,
-                    'failed_ids': error_during_update_ids
-                }, 
-                status=status.HTTP_207_MULTI_STATUS # یا یک وضعیت مناسب دیگر
+        # ۲. به‌روزرسانی گروهی: یک UPDATE، لاگ‌ها و پیامک‌ها با bulk_create در یک تراکنش
+        try:
+            outcomes = bulk_change_status(order_ids, new_status_key, changed_by=request.user)
+        except Exception as e:
+            print(f"Error during bulk status update: {e}")
+            traceback.print_exc()
+            return Response(
+                {'detail': 'خطا در به‌روزرسانی گروهی وضعیت سفارشات؛ هیچ سفارشی تغییر نکرد.'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        updated_ids = [order_id for order_id, outcome in outcomes.items() if outcome == OUTCOME_UPDATED]
+        unchanged_ids = [order_id for order_id, outcome in outcomes.items() if outcome == OUTCOME_UNCHANGED]
+        not_found_ids = [order_id for order_id, outcome in outcomes.items() if outcome == OUTCOME_NOT_FOUND]
+        print(f"Bulk status update to '{new_status_key}' by admin {request.user.username}: "
+              f"{len(updated_ids)} updated, {len(unchanged_ids)} unchanged, {len(not_found_ids)} not found.")
+
+        status_label = dict(Order.OrderStatusChoices.choices).get(new_status_key, new_status_key)
         return Response(
-            {'detail': f'{updated_count} سفارش با موفقیت به وضعیت "{dict(Order.OrderStatusChoices.choices).get(new_status_key, new_status_key)}" به‌روز شدند.'},
-            status=status.HTTP_200_OK
+            {
+                'detail': f'{len(updated_ids)} سفارش با موفقیت به وضعیت "{status_label}" به‌روز شدند.',
+                'updated_count': len(updated_ids),
+                'updated_ids': updated_ids,
+                'unchanged_ids': unchanged_ids,
+                'not_found_ids': not_found_ids,
+                'results': [{'id': order_id, 'outcome': outcome} for order_id, outcome in outcomes.items()],
+            },
+            # اگر بعضی شناسه‌ها پیدا نشدند، نتیجه ترکیبی است
+            status=status.HTTP_207_MULTI_STATUS if not_found_ids else status.HTTP_200_OK
         )
     @action(detail=True, methods=['patch'], url_path='update-status', serializer_class=AdminOrderStatusUpdateSerializer)
     def update_status(self, request, pk=None):
@@ -453,17 +277,16 @@ class AdminOrderViewSet(viewsets.ReadOnlyModelViewSet):
                     updated_order = update_serializer.save() 
                     print(f"Order ID {updated_order.id} status successfully updated to '{updated_order.status}' in database by admin {request.user.username}.")
 
-                    # --- ارسال پیامک اطلاع‌رسانی ---
+                    # --- ثبت پیامک اطلاع‌رسانی در صف ارسال (run_sms_worker) ---
                     try:
                         # event_trigger_key (updated_order.status) باید با مقادیر در SMSTemplate.event_trigger مطابقت داشته باشد
-                        sms_sent, sms_gateway_message, sms_gateway_data = send_order_status_sms(updated_order, updated_order.status)
-                        
-                        if sms_sent:
-                            print(f"SMS notification for order {updated_order.id} (new status: {updated_order.status}) submitted successfully. Gateway Msg: {sms_gateway_message}")
+                        notification = enqueue_order_status_sms(updated_order, updated_order.status)
+                        if notification is not None:
+                            print(f"SMS notification for order {updated_order.id} (new status: {updated_order.status}) queued as Notification {notification.id} ({notification.status}).")
                         else:
-                            print(f"SMS notification for order {updated_order.id} (new status: {updated_order.status}) failed or no template/recipient. Gateway Msg: {sms_gateway_message}")
+                            print(f"No SMS template for order {updated_order.id} (new status: {updated_order.status}); nothing queued.")
                     except Exception as e_sms: 
-                        print(f"CRITICAL: Unexpected error sending SMS for order {updated_order.id} after status update: {e_sms}")
+                        print(f"CRITICAL: Unexpected error queueing SMS for order {updated_order.id} after status update: {e_sms}")
                     
                     # --- ثبت لاگ تغییر وضعیت ---
                     try:
@@ -494,69 +317,30 @@ class AdminOrderViewSet(viewsets.ReadOnlyModelViewSet):
             # اگر داده‌های ورودی برای AdminOrderStatusUpdateSerializer معتبر نبود
             print(f"Admin status update validation failed for Order ID {order.id if order else 'N/A'}: {update_serializer.errors}")
             return Response(update_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    @action(detail=True, methods=['get'], url_path='generate-invoice-pdf', permission_classes=[permissions.IsAdminUser])
+    @action(detail=True, methods=['get', 'post'], url_path='generate-invoice-pdf', permission_classes=[permissions.IsAdminUser])
     def generate_invoice_pdf(self, request, pk=None):
+        """
+        اگر PDF فاکتور با محتوای فعلی سفارش در کش باشد، همان فایل (با ETag و Last-Modified) برگردانده می‌شود؛
+        در غیر این صورت ساخت آن در صف RenderJob قرار می‌گیرد و وضعیت کار برمی‌گردد (202).
+        """
         order = self.get_object()
         print(f"--- اکشن generate_invoice_pdf فراخوانی شد برای سفارش ID: {pk} ---")
-
-        try:
-            print(">>> مرحله ۱: تلاش برای ایمپورت WeasyPrint...")
-            from weasyprint import HTML, CSS
-            from django.conf import settings
-            print(">>> WeasyPrint با موفقیت ایمپورت شد.")
-        except ImportError as e_import:
-            print(f"!!! خطای ImportError برای WeasyPrint: {e_import}")
-            print(traceback.format_exc())
-            return HttpResponse(f"خطا در ایمپورت کتابخانه WeasyPrint: {e_import}", status=500)
-        except OSError as e_os:
-            print(f"!!! خطای OSError هنگام ایمپورت WeasyPrint: {e_os}")
-            print(traceback.format_exc())
-            return HttpResponse(f"خطای سیستمی هنگام بارگذاری WeasyPrint (OSError): {e_os}", status=500)
-        except Exception as e_general_import:
-            print(f"!!! خطای عمومی هنگام ایمپورت WeasyPrint: {e_general_import}")
-            print(traceback.format_exc())
-            return HttpResponse(f"خطای نامشخص هنگام ایمپورت WeasyPrint: {e_general_import}", status=500)
-        # می‌توانید هرگونه اطلاعات اضافی که در قالب فاکتور لازم دارید را اینجا آماده کنید
-        # مثلاً اطلاعات فروشگاه شما از تنظیمات یا یک مدل دیگر
-        context = {
-            'order': order,
-            'shop_name': 'BAKEJÖY', # مثال
-            'shop_address': 'تهران، خیابان شیرینی، پلاک ۱۰', # مثال
-            'shop_phone': '۰۲۱-۱۲۳۴۵۶۷۸', # مثال
-            # سایر اطلاعات لازم برای فاکتور
+        # رندر HTML ارزان است؛ هش آن کلید کش PDF است
+        _, content_hash = render_invoice_html(order)
+        cached_path = cached_invoice_path(order.id, content_hash)
+        if cached_path:
+            print(f"Invoice PDF cache hit for order {order.id} ({content_hash[:12]})")
+            return invoice_file_response(request, cached_path, f"invoice_order_{order.id}.pdf")
+
+        params = {
+            'order_id': order.id,
+            'content_hash': content_hash,
+            'base_url': request.build_absolute_uri('/'),
         }
-
-        print(f">>> مرحله ۲: Context آماده شد: {list(context.keys())}")
-        html_string = None
-        try:
-            print(f">>> مرحله ۳: تلاش برای رندر کردن قالب 'orders/admin_order_invoice_pdf.html'...")
-            html_string = render_to_string('orders/admin_order_invoice_pdf.html', context)
-            print(">>> قالب HTML با موفقیت رندر شد.")
-        except Exception as e_template:
-            print(f"!!! خطا در رندر کردن قالب HTML برای PDF: {e_template}")
-            print(traceback.format_exc())
-            return HttpResponse(f"خطا در رندر کردن قالب HTML برای PDF: {e_template}", status=500)
-
-        pdf_file = None
-        if html_string:
-            try:
-                print(">>> مرحله ۴: تلاش برای تولید PDF با WeasyPrint...")
-                html_doc = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-                pdf_file = html_doc.write_pdf()
-                print(">>> فایل PDF با موفقیت توسط WeasyPrint تولید شد.")
-            except Exception as e_weasyprint:
-                print(f"!!! خطا در تولید PDF با WeasyPrint: {e_weasyprint}")
-                print(traceback.format_exc())
-                return HttpResponse(f"خطا در تولید فایل PDF با WeasyPrint: {e_weasyprint}", status=500)
-
-        if pdf_file:
-            print(">>> مرحله ۵: ارسال پاسخ PDF...")
-            response = HttpResponse(pdf_file, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="invoice_order_{order.id}.pdf"'
-            return response
-        else:
-            print("!!! فایل PDF ساخته نشد!")
-            return HttpResponse("خطای نامشخص در سرور هنگام تولید PDF.", status=500)
+        job, created = enqueue_render_job(RenderJob.KindChoices.INVOICE_PDF, params, user=request.user)
+        print(f"Invoice PDF job {job.id} {'queued' if created else 'reused'} (status={job.status})")
+        serializer = RenderJobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
     @action(detail=False, methods=['post'], url_path='bulk-delete-orders', permission_classes=[permissions.IsAdminUser])
     def bulk_delete_orders(self, request):
         order_ids_str = request.data.get('order_ids')
@@ -581,8 +365,14 @@ class AdminOrderViewSet(viewsets.ReadOnlyModelViewSet):
         # متد update() برای کوئری‌ست، متد save() هر آبجکت را فراخوانی نمی‌کند
         # و سیگنال‌ها را نیز ارسال نمی‌کند، اما برای عملیات گروهی سریع‌تر است.
         # اگر نیاز به اجرای منطق خاصی در save() یا سیگنال‌ها هنگام "حذف نرم" دارید، باید روی سفارشات پیمایش کنید.
-        updated_count = Order.objects.filter(id__in=order_ids, is_deleted=False).update(is_deleted=True, updated_at=timezone.now())
-        # updated_at را هم دستی آپدیت می‌کنیم چون update() متد save را صدا نمی‌زند.
+        with transaction.atomic():
+            # سفارش‌هایی که در فروش شمرده شده‌اند باید از rollup های فروش کم شوند
+            sale_ids = list(Order.objects.filter(id__in=order_ids, status__in=SALES_STATUSES).values_list('id', flat=True))
+            updated_count = Order.objects.filter(id__in=order_ids, is_deleted=False).update(is_deleted=True, updated_at=timezone.now())
+            # updated_at را هم دستی آپدیت می‌کنیم چون update() متد save را صدا نمی‌زند.
+            apply_orders_to_rollups(sale_ids, -1)
+        if updated_count:
+            invalidate_dashboard_stats() # سیگنال post_save اجرا نمی‌شود
 
         if updated_count == 0 and order_ids:
             # ممکن است ID ها معتبر نباشند یا قبلاً is_deleted=True شده باشند
@@ -634,7 +424,8 @@ class AdminOrderViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = OrderStatusLogSerializer(status_logs_queryset, many=True, context={'request': request})
         return Response(serializer.data)
 
-class OrderViewSet(mixins.CreateModelMixin,
+class OrderViewSet(ConditionalGetMixin,
+                   mixins.CreateModelMixin,
                    mixins.ListModelMixin,
                    mixins.RetrieveModelMixin,
                     mixins.UpdateModelMixin,
@@ -650,6 +441,8 @@ class OrderViewSet(mixins.CreateModelMixin,
     # سریالایزر پیش‌فرض برای list و retrieve
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtKeysetPagination
+    conditional_private = True # ETag/Last-Modified برای retrieve (ConditionalGetMixin)
     
     # --- تعیین سریالایزر بر اساس اکشن ---
     def get_serializer_class(self):
@@ -702,10 +495,12 @@ class OrderViewSet(mixins.CreateModelMixin,
              return Response({"detail": "Failed to update order details."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-        # 5. تغییر وضعیت به "در انتظار پرداخت"
-        updated_order.status = Order.OrderStatusChoices.PENDING_PAYMENT
-        updated_order.save(update_fields=['status'])
-        print(f"Order {updated_order.id} status changed to PENDING_PAYMENT.")
+        # 5. ثابت کردن اطلاعات محصولات آیتم‌ها و تغییر وضعیت به "در انتظار پرداخت"
+        with transaction.atomic():
+            frozen_count = updated_order.freeze_item_snapshots()
+            updated_order.status = Order.OrderStatusChoices.PENDING_PAYMENT
+            updated_order.save(update_fields=['status'])
+        print(f"Order {updated_order.id} status changed to PENDING_PAYMENT ({frozen_count} item snapshot(s) frozen).")
 
         # 6. برگرداندن پاسخ با داده‌های کامل سفارش آپدیت شده (با سریالایزر اصلی)
         # !! نکته: سریالایزر پاسخ را OrderSerializer می‌گذاریم تا تمام اطلاعات برگردد !!
@@ -723,41 +518,28 @@ class OrderViewSet(mixins.CreateModelMixin,
         user = request.user
 
         # ۱. پیدا کردن یا ایجاد سبد خرید کاربر
-        cart_order, _ = Order.objects.get_or_create(
-            user=user,
-            status=Order.OrderStatusChoices.CART
-        )
-        
+        cart_order = cart_service.get_or_create_cart(user)
+
         # ۲. گرفتن آبجکت محصول از داده‌های اعتبارسنجی شده
         # (این آبجکت در متد validate سریالایزر OrderItemAddSerializer ساخته شده)
         product_instance = validated_data.get('content_object')
-        
-        # ۳. پیدا کردن آیتم مشابه برای جلوگیری از تکرار
-        # ما بر اساس content_type و object_id جستجو می‌کنیم
-        content_type = ContentType.objects.get_for_model(product_instance)
-        
-        item_in_cart, created = OrderItem.objects.get_or_create(
-            order=cart_order,
-            content_type=content_type,
-            object_id=product_instance.id,
-            # برای کیک‌ها، طعم و سایز هم باید در کلید یکتایی در نظر گرفته شوند
+
+        # ۳. افزودن یا افزایش تعداد ردیف مشابه (همان محصول، طعم و سایز) و به‌روزرسانی
+        # قیمت کل سبد؛ روی PostgreSQL همه در یک کوئری INSERT ... ON CONFLICT انجام می‌شود
+        result = cart_service.add_cart_line(
+            cart_order,
+            product_instance,
+            validated_data.get('quantity', 1),
             flavor=validated_data.get('flavor'),
             size_variant=validated_data.get('size_variant'),
-            defaults={
-                'quantity': validated_data.get('quantity'),
-                'notes': validated_data.get('notes'),
-            }
+            notes=validated_data.get('notes'),
         )
-        
-        # ۴. اگر آیتم از قبل موجود بود، فقط تعداد را اضافه کن
-        if not created:
-            item_in_cart.quantity += validated_data.get('quantity', 1)
-            # متد save را فراخوانی می‌کنیم تا قیمت کل سبد هم آپدیت شود
-            item_in_cart.save() 
-        
-        # ۵. برگرداندن پاسخ
-        response_serializer = OrderItemReadSerializer(item_in_cart, context={'request': request})
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+        # ۴. برگرداندن پاسخ (به همراه قیمت کل به‌روز سبد تا فرانت‌اند درخواست جدا نزند)
+        response_serializer = OrderItemReadSerializer(result.item, context={'request': request})
+        response_data = dict(response_serializer.data)
+        response_data['cart_total_price'] = str(result.cart_total)
+        return Response(response_data, status=status.HTTP_201_CREATED)
     def get_queryset(self):
         """
         فقط سفارش‌های نهایی کاربر را برمی‌گرداند (نه سبد خرید).
@@ -766,6 +548,9 @@ class OrderViewSet(mixins.CreateModelMixin,
         # برای حذف سبد خرید از لیست:
         return Order.objects.filter(user=self.request.user).exclude(
         status=Order.OrderStatusChoices.CART
+    ).select_related('user', 'address__user', 'address__city__province').prefetch_related(
+        GenericProductPrefetcher.for_request(self.request).items_prefetch(),
+        'transactions', 'status_logs__changed_by'
     ).order_by('-created_at')
         # برای نمایش همه (شامل سبد خرید):
         # return Order.objects.filter(user=self.request.user).order_by('-created_at')
@@ -773,6 +558,20 @@ class OrderViewSet(mixins.CreateModelMixin,
     # perform_create دیگر استفاده نمی‌شود چون create را بازنویسی کردیم
     # def perform_create(self, serializer):
     #     pass # حذف شود
+    def retrieve(self, request, *args, **kwargs):
+        """
+        جزئیات سفارش؛ اگر کلاینت ETag یا Last-Modified فعلی را بفرستد 304 برمی‌گردد
+        (validator با یک کوئری و بدون سریالایز کردن سفارش محاسبه می‌شود).
+        """
+        try:
+            validators = order_validators(Order.objects.filter(user=request.user, pk=kwargs.get('pk')), request)
+        except (ValueError, TypeError): # pk نامعتبر؛ get_object خودش 404 می‌دهد
+            validators = None
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            request, validators, lambda: super(OrderViewSet, self).retrieve(request, *args, **kwargs)
+        )
     def get_object(self):
         """
         یک سفارش خاص (شامل سبد خرید) را برای کاربر فعلی بر اساس pk برمی‌گرداند.
@@ -881,7 +680,7 @@ class OrderViewSet(mixins.CreateModelMixin,
             print(f"DEBUG pay: Sending request to Zarinpal URL: {zarinpal_url} with payload: {payload}")
 
             try:
-                response = requests.post(zarinpal_url, json=payload, timeout=15) # افزایش timeout
+                response = http_client.post(zarinpal_url, json=payload) # Session مشترک با keep-alive
                 response.raise_for_status() # خطاهای HTTP مثل 4xx/5xx
                 zarinpal_data = response.json()
                 print(f"DEBUG pay: Received response from Zarinpal: {zarinpal_data}")
@@ -955,102 +754,108 @@ class OrderViewSet(mixins.CreateModelMixin,
             )
 
         # ۳. سبد خرید فعال کاربر را پیدا کن یا یک سبد جدید برایش بساز
-        cart, created = Order.objects.get_or_create(
-            user=request.user,
-            status=Order.OrderStatusChoices.CART
-        )
-
-        # ۴. آیتم‌های سفارش قدیمی را به سبد خرید جدید اضافه کن
-        for old_item in original_order.items.all():
-            # بررسی کن آیا آیتم مشابه (همان کیک، سایز و طعم) از قبل در سبد خرید وجود دارد؟
-            item_in_cart, item_created = cart.items.get_or_create(
-                cake=old_item.cake,
-                size_variant=old_item.size_variant,
+        cart = cart_service.get_or_create_cart(request.user)
+
+        # ۴. آیتم‌های سفارش قدیمی را به سبد خرید اضافه کن
+        # (ردیف مشابه فقط افزایش تعداد می‌گیرد و قیمت با قیمت روز محصول حساب می‌شود)
+        for old_item in original_order.items.select_related('flavor', 'size_variant'):
+            product = old_item.content_object
+            if product is None:
+                # محصول سفارش قدیمی حذف شده است
+                continue
+            cart_service.add_cart_line(
+                cart,
+                product,
+                old_item.quantity,
                 flavor=old_item.flavor,
-                defaults={'quantity': old_item.quantity} # اگر آیتم جدید است، این مقدار را بگذار
+                size_variant=old_item.size_variant,
+                notes=old_item.notes,
             )
 
-            # اگر آیتم از قبل در سبد خرید بود، فقط تعدادش را اضافه کن
-            if not item_created:
-                item_in_cart.quantity += old_item.quantity
-                item_in_cart.save()
-            
-            # نکته: قیمت جدید (price_at_order) باید به صورت خودکار با قیمت روز محصول
-            # در متد save() مدل OrderItem محاسبه شود، نه اینکه از سفارش قدیمی کپی شود.
-
-        # ۵. قیمت کل سبد خرید را به‌روزرسانی کن
-        cart.update_total_price() # فرض می‌کنیم متدی برای این کار در مدل Order دارید
+        # ۵. قیمت کل سبد توسط cart_service به‌روز شده است
         cart.refresh_from_db()
         # ۶. سبد خرید به‌روز شده را به کاربر برگردان
         serializer = self.get_serializer(cart)
         return Response(serializer.data, status=status.HTTP_200_OK)
+class RenderJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    وضعیت کارهای ساخت PDF (export-pdf و generate-invoice-pdf) و دانلود فایل آماده شده.
+    """
+    queryset = RenderJob.objects.all()
+    serializer_class = RenderJobSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != RenderJob.StatusChoices.DONE or not job.file:
+            return Response(
+                {'detail': 'فایل هنوز آماده نیست.', 'status': job.status, 'error': job.error or None},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not default_storage.exists(job.file.name):
+            # فایل بعد از اتمام کار پاک شده (مثلاً کش فاکتور با تغییر سفارش)؛ کلاینت باید دوباره درخواست ساخت بدهد
+            return Response(
+                {'detail': 'فایل این کار دیگر موجود نیست؛ لطفاً دوباره درخواست ساخت PDF بدهید.', 'status': job.status},
+                status=status.HTTP_410_GONE
+            )
+        if job.kind == RenderJob.KindChoices.INVOICE_PDF:
+            # فایل فاکتور در کش محتوا-محور است؛ ETag و Last-Modified دارد
+            return invoice_file_response(request, job.file.name, job.download_filename)
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.download_filename, content_type='application/pdf')
+
+
 class SalesDataAPIView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request, *args, **kwargs):
-        # پارامترهای کوئری برای بازه زمانی (مثلاً ?period=7d, ?period=30d, ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD)
-        period = request.query_params.get('period', '7d') # پیش‌فرض: ۷ روز اخیر
-        # statuses_for_revenue = [Order.OrderStatusChoices.DELIVERED, Order.OrderStatusChoices.PROCESSING, Order.OrderStatusChoices.COMPLETED]
-        # شما باید این وضعیت‌ها را با مدل خودتان تطبیق دهید
-        statuses_for_revenue = [
-            Order.OrderStatusChoices.PROCESSING,
-            Order.OrderStatusChoices.SHIPPED,
-            Order.OrderStatusChoices.DELIVERED,
-            # Order.OrderStatusChoices.COMPLETED, # اگر دارید
-        ]
-
-
-        end_date = timezone.now()
-        if period == '7d':
-            start_date = end_date - timedelta(days=6) # شامل امروز، پس ۶ روز قبل
-        elif period == '30d':
-            start_date = end_date - timedelta(days=29)
-        # TODO: می‌توانید منطق بیشتری برای بازه‌های سفارشی با start_date و end_date اضافه کنید
-        else: # پیش‌فرض یا دوره نامعتبر
-            start_date = end_date - timedelta(days=6)
-
-        # کوئری برای گرفتن مجموع فروش روزانه در بازه مشخص
-        # فقط سفارش‌هایی با وضعیت نهایی شده (پرداخت موفق و تکمیل یا ارسال شده) را در نظر می‌گیریم
-        sales_data = Order.objects.filter(
-            created_at__date__gte=start_date.date(), # استفاده از created_at__date برای مقایسه فقط تاریخ
-            created_at__date__lte=end_date.date(),
-            status__in=statuses_for_revenue # فیلتر بر اساس وضعیت‌های درآمدزا
-        ).annotate(
-            date=TruncDate('created_at') # تاریخ را به روز گرد کن (بدون ساعت و دقیقه)
-        ).values(
-            'date' # بر اساس تاریخ گروه‌بندی کن
-        ).annotate(
-            total_sales=Sum('total_price') # مجموع قیمت کل سفارشات در هر روز
-        ).order_by('date') # مرتب‌سازی بر اساس تاریخ
+        # بازه: ?period=7d|30d|90d|1y ، ?jalali_month=1403-05 یا ?start_date=...&end_date=... (پیش‌فرض: ۷ روز اخیر)
+        # داده‌ها از جدول DailySalesRollup خوانده می‌شوند؛ هزینه فقط به تعداد روزهای بازه بستگی دارد
+        try:
+            start_date, end_date = resolve_sales_period(request.query_params)
+        except ValueError as e:
+            return Response({'detail': f"بازه زمانی نامعتبر است: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        sales_dict = dict(
+            DailySalesRollup.objects.filter(date__gte=start_date, date__lte=end_date).values_list('date', 'total_sales')
+        )
 
         # فرمت کردن داده‌ها برای نمودار
         # اطمینان از وجود تمام روزها در بازه، حتی اگر فروشی نداشته‌اند (با مقدار صفر)
         formatted_data = []
-        current_date = start_date.date()
-        sales_dict = {item['date']: item['total_sales'] for item in sales_data}
-
-        while current_date <= end_date.date():
+        current_date = start_date
+        while current_date <= end_date:
             formatted_data.append({
                 # تاریخ را به فرمت YYYY-MM-DD برای کتابخانه‌های نمودار تبدیل می‌کنیم
                 'date': current_date.strftime('%Y-%m-%d'),
                 'total_sales': float(sales_dict.get(current_date, 0)) # اگر روزی فروش نداشته، صفر در نظر بگیر
             })
             current_date += timedelta(days=1)
-            
+
         return Response(formatted_data)
 
-class CartDetailView(APIView):
+class CartDetailView(ConditionalGetMixin, APIView):
     """
     API endpoint to retrieve the current user's shopping cart (Order with CART status).
     Handles GET requests to /api/v1/cart/ (یا هر مسیری که تعریف شود).
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = OrderSerializer # برای مستندات و browsable API مفید است
+    conditional_private = True
 
     def get(self, request, *args, **kwargs):
         """
         Handles GET request to fetch the user's cart.
+        اگر سبد از آخرین دریافت تغییر نکرده باشد (If-None-Match) پاسخ 304 برمی‌گردد.
         """
+        validators = order_validators(
+            Order.objects.filter(user=request.user, status=Order.OrderStatusChoices.CART), request
+        )
+        if validators is None:
+            return self.render_cart(request)
+        return self.conditional_response(request, validators, lambda: self.render_cart(request))
+
+    def render_cart(self, request):
         user = request.user
         print(f"--- CartDetailView: Fetching cart for user {user.username} ---")
 
@@ -1061,11 +866,11 @@ class CartDetailView(APIView):
         cart_order = Order.objects.filter(
             user=user,
             status=Order.OrderStatusChoices.CART
-        ).prefetch_related(
-            'items', # آیتم‌های سفارش را prefetch کن
-            'items__content_object', # خود آبجکت محصول (کیک یا لوازم جشن) را prefetch کن
-            'items__flavor',         # طعم (برای کیک‌ها)
-            'items__size_variant__size' # سایز (برای کیک‌ها)
+        ).select_related('user', 'address__user', 'address__city__province').prefetch_related(
+            # آیتم‌ها به همراه محصول (کیک یا لوازم جشن)، طعم و سایز
+            GenericProductPrefetcher.for_request(request).items_prefetch(),
+            'transactions',
+            'status_logs__changed_by',
         ).first()
 
         if cart_order:
@@ -1116,6 +921,7 @@ class NotificationLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = NotificationLogSerializer
     permission_classes = [permissions.IsAdminUser] # فقط ادمین‌ها دسترسی دارند
+    pagination_class = CreatedAtKeysetPagination
 
     # فیلترها برای جستجو و فیلترینگ پیشرفته
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -1202,11 +1008,11 @@ class SmsCreditBalanceView(APIView):
         if not api_key:
             return Response({"error": "کلید API پنل پیامک تعریف نشده است."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        api_url = 'https://api.sms.ir/v1/credit'
+        api_url = f"{settings.SMS_IR_API_BASE_URL.rstrip('/')}/credit"
         headers = {'X-API-KEY': api_key}
         
         try:
-            response = requests.get(api_url, headers=headers, timeout=10)
+            response = http_client.get(api_url, headers=headers, timeout=10)
             response.raise_for_status()
             data = response.json()
 
@@ -1229,7 +1035,8 @@ class SmsCreditBalanceView(APIView):
 def zarinpal_payment_callback(request):
     """
     این ویو توسط زرین‌پال بعد از اتمام عملیات پرداخت فراخوانی می‌شود.
-    پرداخت را با زرین‌پال وریفای کرده و وضعیت تراکنش/سفارش را آپدیت می‌کند.
+    پرداخت را با زرین‌پال وریفای کرده و وضعیت تراکنش/سفارش را آپدیت می‌کند
+    (idempotent: callback تکراری همان نتیجه را بدون وریفای دوباره برمی‌گرداند؛ payment_service را ببینید).
     """
     
     print("--- Zarinpal Payment Callback Received ---")
@@ -1244,169 +1051,24 @@ def zarinpal_payment_callback(request):
         print(f"Redirecting to frontend failure URL: {failure_url}")
         return redirect(failure_url)
 
-    # 2. پیدا کردن تراکنش منتظر تایید با استفاده از Authority
+    # 2. پردازش قفل‌شده و اتمی تراکنش این Authority
     try:
-        # تراکنشی را پیدا کن که این Authority برایش ثبت شده و هنوز منتظر تایید است
-        transaction = get_object_or_404(
-            Transaction,
-            gateway_reference_id=authority, # فیلدی که Authority در آن ذخیره شده
-            status=Transaction.TransactionStatusChoices.PENDING # وضعیت منتظر تایید
-        )
-        order = transaction.order # سفارش مرتبط با تراکنش
-        final_failure_url = f"{failure_url}?orderId={order.id}"
-        amount_rial = int(transaction.amount) # مبلغ تراکنش (که باید به ریال ذخیره شده باشد)
-        print(f"Found pending Transaction ID: {transaction.id} for Order ID: {order.id} with amount (Rial): {amount_rial}")
-
-    except Http404:
-        print(f"Callback ERROR: No pending transaction found for Authority: {authority}. Checking if already SUCCESS...")
-        # ممکن است کاربر صفحه را رفرش کرده یا Authority نامعتبر باشد
-        # بررسی کنید آیا تراکنش با این Authority قبلا موفق شده؟
-        if Transaction.objects.filter(gateway_reference_id=authority, status=Transaction.TransactionStatusChoices.SUCCESS).exists():
-             print("Transaction already verified and completed.")
-             # اگر قبلا موفق شده، به صفحه موفقیت هدایت کن
-             success_url = f"{frontend_base_url}/payment/success?orderId={order.id}"
-             print(f"Redirecting to frontend success URL: {success_url}")
-             return redirect(success_url)
-        else:
-             return redirect(final_failure_url)
+        payment = process_zarinpal_callback(authority, status)
     except Exception as e:
-        # خطای پیش‌بینی نشده در یافتن تراکنش
-        print(f"CRITICAL ERROR finding transaction for Authority {authority}: {e}")
+        # خطای پیش‌بینی نشده؛ تراکنش دیتابیس rollback شده و تراکنش پرداخت PENDING مانده است
+        print(f"CRITICAL ERROR processing callback for Authority {authority}: {e}")
         traceback.print_exc()
-        return redirect(final_failure_url)
-
-
-    # 3. بررسی وضعیت بازگشتی از درگاه ('OK' or 'NOK')
-    if status == 'OK':
-        print("Callback status is OK. Proceeding with verification API call...")
-
-        # 4. آماده‌سازی برای فراخوانی API وریفای زرین‌پال
-        merchant_id = os.environ.get('ZARINPAL_MERCHANT_ID') # یا settings.ZARINPAL_MERCHANT_ID
-        # !!! مطمئن شوید ZARINPAL_VERIFY_URL در settings.py تعریف شده (برای سندباکس و اصلی) !!!
-        verify_url = getattr(settings, 'ZARINPAL_VERIFY_URL', None)
-
-        if not merchant_id or not verify_url:
-             print("CRITICAL ERROR: Zarinpal Merchant ID or Verify URL not configured in settings.")
-             # تراکنش و سفارش را ناموفق کن چون نمی‌توان وریفای کرد
-             transaction.status = Transaction.TransactionStatusChoices.FAILED
-             transaction.gateway_response = "Configuration Error: Cannot verify."
-             transaction.save()
-             order.status = Order.OrderStatusChoices.PAYMENT_FAILED # وضعیت مناسب برای سفارش
-             order.save()
-             return redirect(final_failure_url)
-
-        verify_payload = {
-            "merchant_id": merchant_id,
-            "amount": amount_rial, # مبلغ به ریال از تراکنش خوانده شد
-            "authority": authority,
-        }
-        headers = {'content-type': 'application/json'}
-        print(f"Sending verification request to {verify_url} with payload: {verify_payload}")
+        return redirect(failure_url)
 
-        # 5. فراخوانی API وریفای زرین‌پال
-        try:
-            response = requests.post(verify_url, data=json.dumps(verify_payload), headers=headers, timeout=15) # timeout مناسب
-            response.raise_for_status() # بررسی خطاهای HTTP مثل 4xx/5xx
-            res_json = response.json() # پاسخ را به صورت دیکشنری بخوان
-            res_data = res_json.get('data', {})
-            res_errors = res_json.get('errors', [])
-            print(f"Verification response received: data={res_data}, errors={res_errors}")
-
-            # 6. پردازش پاسخ وریفای
-            # کد ۱۰۰ معمولا موفقیت است، کد ۱۰۱ یعنی قبلا وریفای شده
-            verification_code = res_data.get('code') if isinstance(res_data, dict) else None
-
-            if verification_code == 100:
-                # ==== پرداخت با موفقیت تایید شد ====
-                ref_id = res_data.get('ref_id')
-                card_pan = res_data.get('card_pan', 'N/A') # شماره کارت (ماسک شده)
-                print(f"Verification SUCCESS! Ref ID: {ref_id}, Card PAN: {card_pan}")
-
-                transaction.status = Transaction.TransactionStatusChoices.SUCCESS
-                transaction.ref_id = ref_id # ذخیره کد رهگیری نهایی
-                transaction.gateway_response = json.dumps(res_data) # ذخیره پاسخ کامل موفقیت
-                transaction.save()
-
-                order.change_status(
-                new_status=Order.OrderStatusChoices.PROCESSING,
-                 notes="پرداخت با موفقیت توسط درگاه تایید شد."
-                )
-                print(f"Transaction {transaction.id} and Order {order.id} updated successfully.")
-                success_url = f"{frontend_base_url}/payment/success?orderId={order.id}"
-                # TODO: کاربر را به صفحه پرداخت موفق هدایت کنید
-                return redirect(success_url)
-
-            elif verification_code == 101:
-                 # ==== پرداخت قبلاً تایید شده بود ====
-                 ref_id = res_data.get('ref_id', transaction.ref_id)
-                 print(f"Verification WARNING: Payment already verified (Code 101). Ref ID: {ref_id}")
-                 # اطمینان از صحت وضعیت‌ها
-                 if transaction.status != Transaction.TransactionStatusChoices.SUCCESS:
-                    transaction.status = Transaction.TransactionStatusChoices.SUCCESS
-                    transaction.ref_id = ref_id
-                    transaction.gateway_response = json.dumps(res_data)
-                    transaction.save()
-                    order.change_status(
-                    new_status=Order.OrderStatusChoices.PROCESSING,
-                    notes="پرداخت قبلاً تایید شده بود، وضعیت سفارش همگام‌سازی شد."
-                )
-                 # TODO: کاربر را به صفحه پرداخت موفق هدایت کنید
-                 success_url = f"{frontend_base_url}/payment/success?orderId={order.id}"
-                 return redirect(success_url)
+    if payment is None:
+        return redirect(failure_url)
 
-            else:
-                 # ==== تایید پرداخت ناموفق بود ====
-                 error_code = verification_code if verification_code else (res_errors.get('code') if isinstance(res_errors, dict) else 'N/A')
-                 error_message = res_data.get('message') if isinstance(res_data, dict) else (res_errors.get('message') if isinstance(res_errors, dict) else 'Verification Failed')
-                 print(f"Verification FAILED! Code: {error_code}, Message: {error_message}, Errors: {res_errors}")
-
-                 transaction.status = Transaction.TransactionStatusChoices.FAILED
-                 transaction.gateway_response = json.dumps(res_json) # ذخیره پاسخ کامل خطا
-                 transaction.save()
-
-                 order.change_status(
-                new_status=Order.OrderStatusChoices.PAYMENT_FAILED,
-                notes=f"تایید پرداخت ناموفق بود: {error_message}"
-            )
-                 print(f"Transaction {transaction.id} and Order {order.id} marked as failed.")
-                 # TODO: کاربر را به صفحه پرداخت ناموفق هدایت کنید
-                 return redirect(final_failure_url)
-
-        except (requests.exceptions.Timeout, requests.exceptions.RequestException, json.JSONDecodeError) as e:
-        # ==== مدیریت تمام خطاهای ارتباطی و ساختاری در یک بلاک ====
-            error_note = "خطای پیش‌بینی نشده در ارتباط با درگاه پرداخت."
-            if isinstance(e, requests.exceptions.Timeout):
-                error_note = "خطای Timeout در ارتباط با درگاه پرداخت."
-            elif isinstance(e, requests.exceptions.RequestException):
-                error_note = f"خطای شبکه در ارتباط با درگاه پرداخت: {e}"
-            elif isinstance(e, json.JSONDecodeError):
-                error_note = "پاسخ دریافتی از درگاه پرداخت معتبر نبود."
-            
-            print(f"Verification ERROR: {error_note}")
-            
-            transaction.status = Transaction.TransactionStatusChoices.FAILED
-            transaction.gateway_response = error_note
-            transaction.save()
-            
-            order.change_status(
-                new_status=Order.OrderStatusChoices.PAYMENT_FAILED,
-                notes=error_note
-            )
-            return redirect(final_failure_url)
-
-    else: # status == 'NOK' یا وضعیت نامعتبر دیگر
-        # ==== پرداخت توسط کاربر لغو شده یا در درگاه ناموفق بوده ====
-        print(f"Callback status is '{status}'. Payment failed or cancelled by user.")
-        transaction.status = Transaction.TransactionStatusChoices.FAILED
-        transaction.gateway_response = f"Callback Status: {status}"
-        transaction.save()
-        order.change_status(
-        new_status=Order.OrderStatusChoices.PAYMENT_FAILED,
-        notes=f"پرداخت توسط کاربر لغو شد یا در درگاه ناموفق بود. وضعیت بازگشتی: {status}"
-    )
-        print(f"Transaction {transaction.id} and Order {order.id} marked as failed due to callback status.")
-        # TODO: کاربر را به صفحه پرداخت ناموفق هدایت کنید
-        return redirect(final_failure_url)
+    # 3. هدایت کاربر بر اساس وضعیت نهایی تراکنش
+    if payment.status == Transaction.TransactionStatusChoices.SUCCESS:
+        success_url = f"{frontend_base_url}/payment/success?orderId={payment.order_id}"
+        print(f"Redirecting to frontend success URL: {success_url}")
+        return redirect(success_url)
+    return redirect(f"{failure_url}?orderId={payment.order_id}")
 
 class CartItemViewSet(mixins.UpdateModelMixin, # برای PATCH (partial_update)
                       mixins.DestroyModelMixin, # برای DELETE (destroy)
@@ -1451,27 +1113,14 @@ class CartItemViewSet(mixins.UpdateModelMixin, # برای PATCH (partial_update)
 
     def perform_update(self, serializer):
         """
-        بعد از آپدیت تعداد آیتم، قیمت کل سبد خرید را دوباره محاسبه می‌کند.
+        تعداد آیتم را آپدیت می‌کند؛ تفاضل قیمت در OrderItem.save به صورت اتمی
+        به قیمت کل سبد خرید اعمال می‌شود.
         """
-        order_item = serializer.save() # آپدیت را انجام بده و آیتم آپدیت شده را بگیر
-        # قیمت کل سفارش والد را آپدیت کن
-        if hasattr(order_item.order, 'update_total_price'):
-            print(f"Updating total price for cart (Order ID: {order_item.order.id}) after updating item {order_item.id}")
-            order_item.order.update_total_price()
-        else:
-             print(f"Warning: Cannot update order total price after item update (method missing).")
-
+        serializer.save()
 
     def perform_destroy(self, instance):
         """
-        بعد از حذف آیتم، قیمت کل سبد خرید را دوباره محاسبه می‌کند.
+        آیتم را حذف می‌کند؛ مبلغ آن توسط سیگنال post_delete از قیمت کل سبد کم می‌شود.
         """
-        order = instance.order # سفارش والد را قبل از حذف نگه دار
-        print(f"Deleting item {instance.id} from cart (Order ID: {order.id})")
-        instance.delete() # آیتم را حذف کن
-        # قیمت کل سفارش والد را آپدیت کن
-        if hasattr(order, 'update_total_price'):
-             print(f"Updating total price for cart (Order ID: {order.id}) after deleting item")
-             order.update_total_price()
-        else:
-             print(f"Warning: Cannot update order total price after item deletion (method missing).")
+        print(f"Deleting item {instance.id} from cart (Order ID: {instance.order_id})")
+        instance.delete()
@@ -1,6 +1,6 @@
 # admin.py
 from django.contrib import admin
-from .models import SupplyType, Color, Theme,Category, Flavor, Size, Cake, Addon, ProductImage,CakeSizeVariant,Tag,PartySupply
+from .models import SupplyType, Color, Theme,Category, Flavor, Size, Cake, Addon, ProductImage,CakeSizeVariant,Tag,PartySupply,CakeSimilarity
 
 
 admin.site.register(Size)
@@ -119,3 +119,12 @@ class PartySupplyAdmin(admin.ModelAdmin):
         }),
     )
 
+
+
+@admin.register(CakeSimilarity)
+class CakeSimilarityAdmin(admin.ModelAdmin):
+    # فقط برای مشاهده؛ ردیف‌ها توسط فرمان rebuild_cake_similarities و بعد از پرداخت سفارش‌ها نوشته می‌شوند
+    list_display = ('cake', 'rank', 'similar', 'score')
+    list_select_related = ('cake', 'similar')
+    search_fields = ('cake__name', 'similar__name')
+    readonly_fields = ('cake', 'similar', 'score', 'rank')
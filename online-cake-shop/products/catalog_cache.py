@@ -0,0 +1,123 @@
+# products/catalog_cache.py
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Subquery
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .conditional import ConditionalGetMixin, make_etag
+from .models import CatalogVersion
+
+# پاسخ‌های کش شده کاتالوگ حداکثر این مدت نگه داشته می‌شوند (با تغییر داده‌ها زودتر کهنه می‌شوند)
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_SECONDS', 60 * 10)
+
+RESPONSE_KEY_PREFIX = 'catalog_response'
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def catalog_state(*models):
+    """
+    (نسخه، زمان آخرین تغییر) کاتالوگ برای مدل‌های داده شده، با یک کوئری روی CatalogVersion.
+    نسخه رشته‌ای مثل "3.1.7" است و هر ذخیره/حذف یکی از این مدل‌ها آن را عوض می‌کند؛
+    مدلی که هنوز ردیفی ندارد (هیچ وقت تغییر نکرده) نسخه 0 دارد و اگر هیچ کدام تغییری
+    ثبت نکرده باشند زمان تغییر None است (بدون Last-Modified؛ ETag کافی است).
+    """
+    labels = [_label(model) for model in models]
+    rows = {
+        label: (version, changed_at)
+        for label, version, changed_at in CatalogVersion.objects.filter(pk__in=labels).values_list(
+            'pk', 'version', 'changed_at'
+        )
+    }
+    version = '.'.join(str(rows[label][0]) if label in rows else '0' for label in labels)
+    last_modified = max((changed_at for _, changed_at in rows.values()), default=None)
+    return version, last_modified
+
+
+def catalog_version(*models):
+    """نسخه فعلی کاتالوگ برای مدل‌های داده شده (مثلاً "3.1.7")؛ نگاه کنید به catalog_state."""
+    return catalog_state(*models)[0]
+
+
+def catalog_version_subquery(model):
+    """نسخه کاتالوگ یک مدل به صورت Subquery، برای وقتی که باید در کوئری دیگری خوانده شود (NULL یعنی 0)."""
+    return Subquery(CatalogVersion.objects.filter(pk=_label(model)).values('version')[:1])
+
+
+def bump_catalog_version(model):
+    """
+    نسخه کاتالوگ مدل را در همان تراکنش دیتابیس تغییر داده‌ها بالا می‌برد: درخواست هم‌زمان
+    یا داده و نسخه قدیمی را می‌بیند یا هر دو را جدید، پس داده قدیمی با نسخه جدید کش نمی‌شود.
+    """
+    label = _label(model)
+    changes = {'version': F('version') + 1, 'changed_at': timezone.now()}
+    if not CatalogVersion.objects.filter(pk=label).update(**changes):
+        # اولین تغییر این مدل؛ ignore_conflicts برای وقتی که درخواست هم‌زمان ردیف را ساخته باشد
+        CatalogVersion.objects.bulk_create([CatalogVersion(label=label)], ignore_conflicts=True)
+        CatalogVersion.objects.filter(pk=label).update(**changes)
+
+
+def catalog_cache_key(request, version):
+    """کلید کش پاسخ بر اساس مسیر، پارامترهای query مرتب شده و نسخه کاتالوگ."""
+    params = sorted((name, value) for name in request.query_params for value in request.query_params.getlist(name))
+    raw = f'{request.path}?{urlencode(params)}#{version}'
+    return f'{RESPONSE_KEY_PREFIX}:{hashlib.sha256(raw.encode()).hexdigest()}'
+
+
+class CatalogCacheMixin(ConditionalGetMixin):
+    """
+    کش پاسخ‌های فقط خواندنی کاتالوگ که برای همه بازدیدکنندگان یکسان است.
+    - catalog_models: مدل‌هایی که داده پاسخ به آن‌ها وابسته است (نسخه‌شان جزو کلید کش است)؛
+    - overlay_user_fields: فیلدهای وابسته به کاربر (مثل is_wishlisted) بعد از خواندن از کش
+      روی پاسخ نوشته می‌شوند تا کش بین همه کاربران مشترک باشد.
+    ETag و Last-Modified هم از همین نسخه‌ها ساخته می‌شوند، پس 304 فقط با یک کوئری روی CatalogVersion برمی‌گردد.
+    """
+    catalog_models = ()
+    catalog_cache_timeout = CATALOG_CACHE_TIMEOUT
+
+    def overlay_user_fields(self, request, data):
+        return data
+
+    def get_conditional_validators(self, request, state=None):
+        """(ETag، Last-Modified) پاسخ از روی مسیر، پارامترها و نسخه کاتالوگ."""
+        version, last_modified = state or catalog_state(*self.catalog_models)
+        return make_etag(catalog_cache_key(request, version)), last_modified
+
+    def catalog_response(self, request, render):
+        # نسخه یک بار خوانده می‌شود و هم برای validator ها و هم برای کلید کش پاسخ استفاده می‌شود
+        state = catalog_state(*self.catalog_models)
+        return self.conditional_response(
+            request, self.get_conditional_validators(request, state),
+            lambda: self.cached_catalog_response(request, render, state[0]),
+        )
+
+    def cached_catalog_response(self, request, render, version):
+        key = catalog_cache_key(request, version)
+        data = cache.get(key)
+        if data is None:
+            response = render()
+            if response.status_code != 200:
+                return response
+            cache.set(key, response.data, self.catalog_cache_timeout)
+            response.data = self.overlay_user_fields(request, response.data)
+            response['X-Catalog-Cache'] = 'MISS'
+            return response
+        response = Response(self.overlay_user_fields(request, data))
+        response['X-Catalog-Cache'] = 'HIT'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.catalog_response(
+            request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.catalog_response(
+            request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs)
+        )
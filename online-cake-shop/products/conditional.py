@@ -0,0 +1,54 @@
+# products/conditional.py
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+# هدرهایی که از پاسخ 304 هم باید برگردانده شوند
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+def make_etag(*parts):
+    """ETag قوی از روی مقادیری که نسخه پاسخ را مشخص می‌کنند (نه از روی بدنه پاسخ)."""
+    return '"%s"' % hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+class ConditionalGetMixin:
+    """
+    پشتیبانی از GET شرطی (If-None-Match / If-Modified-Since) برای view های DRF.
+    validator ها (ETag، Last-Modified) باید بدون سریالایز کردن پاسخ و با کوئری/کش ارزان
+    محاسبه شوند تا 304 واقعاً ارزان باشد؛ بدنه فقط وقتی ساخته می‌شود که تغییری رخ داده باشد.
+    """
+    # پاسخ‌های مخصوص کاربر (سفارش، سبد خرید) نباید در کش‌های مشترک (proxy/CDN) ذخیره شوند
+    conditional_private = False
+
+    def conditional_response(self, request, validators, render):
+        """
+        validators: (etag، last_modified) که last_modified یک timestamp یا datetime یا None است.
+        render: تابعی که پاسخ کامل را می‌سازد.
+        """
+        etag, last_modified = validators
+        if last_modified is not None and not isinstance(last_modified, (int, float)):
+            last_modified = last_modified.timestamp()
+        last_modified = int(last_modified) if last_modified is not None else None
+
+        headers = HttpResponse()
+        headers['ETag'] = etag
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+        headers['Cache-Control'] = 'private, no-cache' if self.conditional_private else 'no-cache'
+        patch_vary_headers(headers, ['Authorization'])
+
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified, response=headers
+        )
+        if not_modified is not headers:
+            return not_modified
+
+        response = render()
+        if response.status_code == 200:
+            for name in VALIDATOR_HEADERS:
+                if name in headers:
+                    response[name] = headers[name]
+        return response
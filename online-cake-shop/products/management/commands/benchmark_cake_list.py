@@ -0,0 +1,90 @@
+# products/management/commands/benchmark_cake_list.py
+import json
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from products.models import Cake, CakeSizeVariant, Category, Flavor, ProductImage, Size, Tag
+from products.views import CakeViewSet
+
+# سناریوهای لیست کیک‌ها: (عنوان، پارامترهای query)
+SCENARIOS = (
+    ('list', {}),
+    ('?fields=', {'fields': 'id,slug,name,image,base_price'}),
+    ('?expand=', {'expand': 'images,size_variants,description'}),
+)
+
+
+class UncachedCakeViewSet(CakeViewSet):
+    """همان CakeViewSet بدون کش پاسخ و ETag، تا هر اجرا سریالایزر و کوئری‌ها را واقعاً اندازه بگیرد."""
+
+    def catalog_response(self, request, render):
+        return render()
+
+
+class Command(BaseCommand):
+    help = (
+        "حجم پاسخ، تعداد کوئری و زمان لیست کیک‌ها (CakeListSerializer و ?fields= / ?expand=) را روی داده نمونه "
+        "اندازه می‌گیرد. داده نمونه در یک تراکنش ساخته و در پایان rollback می‌شود."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cakes', type=int, default=24, help="تعداد کیک نمونه؛ پیش‌فرض: 24.")
+        parser.add_argument('--limit', type=int, default=12, help="اندازه صفحه (?limit=)؛ پیش‌فرض: 12.")
+        parser.add_argument('--repeat', type=int, default=20, help="تعداد اجرای هر سناریو برای میانگین زمان؛ پیش‌فرض: 20.")
+
+    def handle(self, *args, **options):
+        if options['cakes'] < 1 or options['limit'] < 1 or options['repeat'] < 1:
+            raise CommandError("--cakes, --limit and --repeat must be at least 1.")
+
+        with transaction.atomic():
+            user = self.create_sample_data(options['cakes'])
+            self.stdout.write(
+                f"{options['cakes']} cakes (3 gallery images, a variant, a flavor and a tag each), "
+                f"?limit={options['limit']}, logged-in user, {connection.vendor}"
+            )
+            for title, params in SCENARIOS:
+                size, queries, avg_ms = self.measure(user, {'limit': options['limit'], **params}, options['repeat'])
+                self.stdout.write(f"  {title:<10} {size:>8,} bytes  {queries:>3} queries  {avg_ms:>7.1f} ms")
+            transaction.set_rollback(True)
+
+    def create_sample_data(self, count):
+        category = Category.objects.create(name='Benchmark category', slug='benchmark-category')
+        flavor = Flavor.objects.create(name='Benchmark flavor')
+        size = Size.objects.create(name='Benchmark size', estimated_weight_kg=Decimal('1.50'))
+        tag = Tag.objects.create(name='Benchmark tag')
+        for index in range(count):
+            cake = Cake.objects.create(
+                name=f'Benchmark cake {index}', slug=f'benchmark-cake-{index}', category=category,
+                base_price=Decimal('450000'), description='کیک نمونه برای اندازه‌گیری. ' * 20,
+                short_description='کیک نمونه', image=f'cakes/benchmark-{index}.jpg',
+            )
+            cake.available_flavors.add(flavor)
+            cake.tags.add(tag)
+            CakeSizeVariant.objects.create(cake=cake, size=size, price_modifier=Decimal('50000'))
+            ProductImage.objects.bulk_create([
+                ProductImage(cake=cake, image=f'cakes/gallery/benchmark-{index}-{number}.jpg', alt_text=cake.name)
+                for number in range(3)
+            ])
+        return get_user_model().objects.create_user(username='benchmark-user', password=None)
+
+    def measure(self, user, params, repeat):
+        """(حجم بدنه JSON، تعداد کوئری، میانگین زمان به میلی‌ثانیه) برای یک درخواست لیست."""
+        factory = APIRequestFactory()
+        view = UncachedCakeViewSet.as_view({'get': 'list'})
+        elapsed, size, queries = 0.0, 0, 0
+        for _ in range(repeat):
+            request = factory.get('/api/v1/products/cakes/', params)
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = view(request)
+                body = json.dumps(response.data, ensure_ascii=False).encode()
+                elapsed += time.perf_counter() - started
+            size, queries = len(body), len(captured)
+        return size, queries, elapsed * 1000 / repeat
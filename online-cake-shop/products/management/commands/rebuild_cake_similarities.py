@@ -0,0 +1,22 @@
+# products/management/commands/rebuild_cake_similarities.py
+from django.core.management.base import BaseCommand, CommandError
+
+from products.similarity import SIMILAR_CAKES_PER_CAKE, rebuild_cake_similarities
+
+
+class Command(BaseCommand):
+    help = "جدول CakeSimilarity (محصولات پیشنهادی) را از روی خریدهای مشترک، تگ‌ها، طعم‌ها و دسته‌بندی از نو می‌سازد."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=SIMILAR_CAKES_PER_CAKE,
+            help=f"تعداد کیک‌های مشابه برای هر کیک؛ پیش‌فرض: {SIMILAR_CAKES_PER_CAKE}.",
+        )
+        parser.add_argument('--cake', type=int, action='append', dest='cake_ids', help="فقط این کیک(ها)؛ قابل تکرار.")
+
+    def handle(self, *args, **options):
+        if options['top'] < 1:
+            raise CommandError("--top must be at least 1.")
+
+        created = rebuild_cake_similarities(options['cake_ids'], options['top'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} cake similarity row(s)."))
@@ -0,0 +1,44 @@
+# products/management/commands/run_similarity_worker.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.similarity import SIMILAR_CAKES_PER_CAKE, process_similarity_queue
+
+
+class Command(BaseCommand):
+    help = "صف CakeSimilarityRefresh (کیک‌های سفارش‌های تازه پرداخت شده) را خالی کرده و مشابه‌هایشان را دوباره می‌سازد."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="حداکثر کیک در هر بازسازی.")
+        parser.add_argument(
+            '--top', type=int, default=SIMILAR_CAKES_PER_CAKE,
+            help=f"تعداد کیک‌های مشابه برای هر کیک؛ پیش‌فرض: {SIMILAR_CAKES_PER_CAKE}.",
+        )
+        parser.add_argument('--poll-interval', type=float, default=5.0, help="فاصله بررسی صف (ثانیه).")
+        parser.add_argument('--once', action='store_true', help="صف فعلی را خالی کن و خارج شو.")
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        top_n = max(options['top'], 1)
+        poll_interval = max(options['poll_interval'], 0.1)
+        self.stdout.write("Similarity worker started.")
+
+        try:
+            while True:
+                try:
+                    processed = process_similarity_queue(batch_size, top_n)
+                except Exception as e:
+                    # کیک‌ها در صف می‌مانند و در دور بعد دوباره برداشته می‌شوند
+                    self.stderr.write(f"Similarity refresh failed: {e}")
+                    processed = 0
+                    if options['once']:
+                        break
+                if processed:
+                    self.stdout.write(f"Rebuilt similarities for {processed} cake(s).")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping similarity worker...")
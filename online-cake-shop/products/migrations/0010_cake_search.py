@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 07:53
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def create_search_indexes(apps, schema_editor):
+    # ایندکس‌های GIN فقط روی PostgreSQL (روی SQLite جستجو به SearchFilter معمولی برمی‌گردد)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS cake_search_vector_gin ON products_cake USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS cake_search_name_trgm ON products_cake USING gin (search_name gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS cake_search_vector_gin')
+    schema_editor.execute('DROP INDEX IF EXISTS cake_search_name_trgm')
+
+
+def backfill_search_columns(apps, schema_editor):
+    from products.search import cake_search_vector, normalize_persian
+
+    Cake = apps.get_model('products', 'Cake')
+    is_postgresql = schema_editor.connection.vendor == 'postgresql'
+    for cake in Cake.objects.select_related('category').prefetch_related('tags').iterator(chunk_size=500):
+        values = {'search_name': normalize_persian(cake.name)}
+        if is_postgresql:
+            values['search_vector'] = cake_search_vector(
+                cake.name,
+                cake.category.name if cake.category else '',
+                [tag.name for tag in cake.tags.all()],
+                ' '.join(filter(None, [cake.short_description, cake.description])),
+            )
+        Cake.objects.filter(pk=cake.pk).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_populate_initial_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cake',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200, verbose_name='Normalized Name'),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Search Vector'),
+        ),
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+        migrations.RunPython(backfill_search_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 08:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_review_product_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CakeSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Score')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rank')),
+                ('cake', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='products.cake', verbose_name='Cake')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggested_in', to='products.cake', verbose_name='Similar Cake')),
+            ],
+            options={
+                'verbose_name': 'Cake Similarity',
+                'verbose_name_plural': 'Cake Similarities',
+                'ordering': ['cake', 'rank'],
+                'indexes': [models.Index(fields=['cake', 'rank'], name='cake_similarity_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cake', 'similar'), name='unique_cake_similarity')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 08:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_cake_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CakeSimilarityRefresh',
+            fields=[
+                ('cake', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='products.cake', verbose_name='Cake')),
+                ('queued_at', models.DateTimeField(auto_now_add=True, verbose_name='Queued At')),
+            ],
+            options={
+                'verbose_name': 'Cake Similarity Refresh',
+                'verbose_name_plural': 'Cake Similarity Refreshes',
+                'ordering': ['queued_at'],
+            },
+        ),
+    ]
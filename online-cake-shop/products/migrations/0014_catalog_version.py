@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 08:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_cake_similarity_refresh'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Model Label')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Version')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Changed At')),
+            ],
+            options={
+                'verbose_name': 'Catalog Version',
+                'verbose_name_plural': 'Catalog Versions',
+            },
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _ # برای استفاده از Choices
 from django.utils.text import slugify
+from django.utils import timezone
 from django.conf import settings # برای ForeignKey به User
+from django.contrib.postgres.search import SearchVectorField
 
 # مدل برای دسته‌بندی کیک‌ها
 class Category(models.Model):
@@ -183,6 +185,11 @@ class Cake(models.Model):
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True) # فقط در زمان ایجاد ثبت می‌شود
     updated_at = models.DateTimeField(_("Updated At"), auto_now=True)    # در هر بار ذخیره آپدیت می‌شود
 
+    # --- جستجو (products/search.py) ---
+    # این دو ستون توسط سیگنال‌ها پر می‌شوند؛ ایندکس‌های GIN آن‌ها فقط روی PostgreSQL ساخته می‌شوند
+    search_name = models.CharField(_("Normalized Name"), max_length=200, blank=True, default='', editable=False)
+    search_vector = SearchVectorField(_("Search Vector"), null=True, editable=False)
+
     class Meta:
         verbose_name = _("Cake")
         verbose_name_plural = _("Cakes")
@@ -369,8 +376,73 @@ class Review(models.Model):
         ordering = ['-created_at']
         # هر کاربر برای هر محصول فقط یک نظر بتواند ثبت کند
         unique_together = ('product', 'user')
+        indexes = [
+            # صفحه‌بندی keyset نظرات یک محصول (orders/pagination.py)
+            models.Index(fields=['product', 'created_at', 'id'], name='review_product_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.user} for {self.product}"
 
-    # TODO: در متد save یا با استفاده از signal، فیلدهای average_rating و review_count مدل Cake را آپدیت کنید.
\ No newline at end of file
+    # TODO: در متد save یا با استفاده از signal، فیلدهای average_rating و review_count مدل Cake را آپدیت کنید.
+
+class CakeSimilarity(models.Model):
+    """
+    شاخص «محصولات مشابه»: برای هر کیک حداکثر N کیک مشابه به ترتیب امتیاز.
+    توسط products/similarity.py (دستور rebuild_cake_similarities و، بعد از پرداخت سفارش‌ها، run_similarity_worker) نوشته می‌شود.
+    """
+    cake = models.ForeignKey(Cake, on_delete=models.CASCADE, related_name='similarities', verbose_name=_("Cake"))
+    similar = models.ForeignKey(Cake, on_delete=models.CASCADE, related_name='suggested_in', verbose_name=_("Similar Cake"))
+    score = models.FloatField(_("Score"))
+    rank = models.PositiveSmallIntegerField(_("Rank")) # ۱ = مشابه‌ترین
+
+    class Meta:
+        verbose_name = _("Cake Similarity")
+        verbose_name_plural = _("Cake Similarities")
+        ordering = ['cake', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['cake', 'similar'], name='unique_cake_similarity'),
+        ]
+        indexes = [
+            # محصولات پیشنهادی یک کیک با یک lookup روی (cake, rank)
+            models.Index(fields=['cake', 'rank'], name='cake_similarity_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cake_id} ~ {self.similar_id} (#{self.rank})"
+
+
+class CakeSimilarityRefresh(models.Model):
+    """
+    صف کیک‌هایی که فهرست مشابه‌هایشان باید دوباره ساخته شود (بعد از پرداخت سفارش‌ها).
+    در همان تراکنش پرداخت نوشته و توسط دستور run_similarity_worker خالی می‌شود؛ هر کیک حداکثر یک ردیف دارد.
+    """
+    cake = models.OneToOneField(
+        Cake, on_delete=models.CASCADE, primary_key=True, related_name='+', verbose_name=_("Cake")
+    )
+    queued_at = models.DateTimeField(_("Queued At"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Cake Similarity Refresh")
+        verbose_name_plural = _("Cake Similarity Refreshes")
+        ordering = ['queued_at']
+
+    def __str__(self):
+        return f"Refresh similarities of cake {self.cake_id}"
+
+
+class CatalogVersion(models.Model):
+    """
+    نسخه کاتالوگ هر مدل برای کلید کش پاسخ‌ها، ETag و Last-Modified (products/catalog_cache.py).
+    در دیتابیس نگه داشته می‌شود تا همه پروسه‌ها (worker های gunicorn) یک نسخه ببینند.
+    """
+    label = models.CharField(_("Model Label"), max_length=100, primary_key=True) # مثل products.cake
+    version = models.PositiveBigIntegerField(_("Version"), default=0)
+    changed_at = models.DateTimeField(_("Changed At"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Catalog Version")
+        verbose_name_plural = _("Catalog Versions")
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
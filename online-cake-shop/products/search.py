@@ -0,0 +1,115 @@
+# products/search.py
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Q, Value
+from rest_framework import filters
+
+# فیلتر غلط تایپی با عملگر % در pg_trgm انجام می‌شود (ایندکس GIN cake_search_name_trgm را استفاده می‌کند)؛
+# حداقل شباهت آن pg_trgm.similarity_threshold است (پیش‌فرض 0.3)
+# جستجوی متنی برای فارسی stemmer ندارد؛ پیکربندی simple فقط کلمات را جدا و کوچک می‌کند
+SEARCH_CONFIG = 'simple'
+
+_CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی', # ی عربی
+    'ك': 'ک',
+    'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ', '\u200f': ' ', '\u200e': ' ', # نیم‌فاصله و علامت‌های جهت
+    'ـ': None, # کشیده (ـ)
+    **{chr(0x06F0 + i): str(i) for i in range(10)}, # ارقام فارسی
+    **{chr(0x0660 + i): str(i) for i in range(10)}, # ارقام عربی
+})
+_DIACRITICS_RE = re.compile('[\u064B-\u065F\u0670]') # اعراب
+_SPACES_RE = re.compile(r'\s+')
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize_persian(text):
+    """
+    متن را برای جستجو یکسان‌سازی می‌کند: ی/ک عربی به فارسی، حذف اعراب و کشیده،
+    نیم‌فاصله به فاصله، ارقام به لاتین و حروف کوچک.
+    """
+    if not text:
+        return ''
+    text = _DIACRITICS_RE.sub('', str(text).translate(_CHAR_MAP))
+    return _SPACES_RE.sub(' ', text).strip().lower()
+
+
+def cake_search_vector(name, category_name='', tag_names=(), description=''):
+    """
+    عبارت SearchVector وزن‌دار کیک از متن‌های نرمال شده:
+    نام (A)، دسته‌بندی و برچسب‌ها (B)، توضیحات (C).
+    """
+    def part(text, weight):
+        return SearchVector(Value(normalize_persian(text)), weight=weight, config=SEARCH_CONFIG)
+
+    return (
+        part(name, 'A')
+        + part(' '.join(filter(None, [category_name, *tag_names])), 'B')
+        + part(description, 'C')
+    )
+
+
+def update_cake_search_index(cake_ids):
+    """
+    ستون‌های search_name و (روی PostgreSQL) search_vector کیک‌های داده شده را به‌روز می‌کند.
+    با update() نوشته می‌شود تا save و سیگنال‌ها دوباره اجرا نشوند.
+    """
+    from .models import Cake
+
+    cakes = Cake.objects.filter(pk__in=list(cake_ids)).select_related('category').prefetch_related('tags')
+    for cake in cakes:
+        values = {'search_name': normalize_persian(cake.name)}
+        if connection.vendor == 'postgresql':
+            values['search_vector'] = cake_search_vector(
+                cake.name,
+                cake.category.name if cake.category else '',
+                [tag.name for tag in cake.tags.all()],
+                ' '.join(filter(None, [cake.short_description, cake.description])),
+            )
+        Cake.objects.filter(pk=cake.pk).update(**values)
+
+
+def _prefix_query(normalized):
+    """«کیک شکل» -> کیک:* & شکل:* تا کلمه نیمه‌کاره کاربر هم پیدا شود."""
+    tokens = _TOKEN_RE.findall(normalized)
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+class CakeSearchFilter(filters.SearchFilter):
+    """
+    جستجوی کاتالوگ کیک با همان پارامتر ?search=:
+    - روی PostgreSQL: جستجوی متنی روی search_vector (ایندکس GIN) به همراه شباهت trigram
+      روی نام نرمال شده (برای غلط تایپی)، مرتب شده بر اساس ارتباط؛
+    - روی سایر دیتابیس‌ها (مثلاً SQLite در تست‌ها): همان SearchFilter پیش‌فرض DRF روی search_fields
+      (به علاوه search_name) با عبارت نرمال شده.
+    """
+
+    def get_search_terms(self, request):
+        return [term for term in (normalize_persian(term) for term in super().get_search_terms(request)) if term]
+
+    def get_search_fields(self, view, request):
+        return [*super().get_search_fields(view, request), 'search_name']
+
+    def filter_queryset(self, request, queryset, view):
+        normalized = ' '.join(self.get_search_terms(request))
+        if not normalized:
+            return queryset
+        if connection.vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        raw_query = _prefix_query(normalized)
+        if not raw_query:
+            return queryset.none()
+        query = SearchQuery(raw_query, config=SEARCH_CONFIG, search_type='raw')
+        # هر دو شرط با ایندکس GIN قابل اجرا هستند (BitmapOr)؛ TrigramSimilarity فقط برای مرتب‌سازی
+        # ردیف‌های پیدا شده محاسبه می‌شود، نه به عنوان فیلتر (که همه جدول را اسکن می‌کرد)
+        return queryset.filter(
+            Q(search_vector=query) | Q(search_name__trigram_similar=normalized)
+        ).annotate(
+            search_rank=SearchRank('search_vector', query),
+            name_similarity=TrigramSimilarity('search_name', normalized),
+        ).order_by('-search_rank', '-name_similarity', 'name')
@@ -137,7 +137,109 @@ class TagFindOrCreateSerializer(serializers.Serializer):
         help_text="لیستی از نام تگ‌ها برای پیدا کردن یا ساختن"
     )
 
-class CakeSerializer(serializers.ModelSerializer):
+def wishlisted_cake_ids(context):
+    """
+    شناسه کیک‌های علاقه‌مندی کاربر درخواست، با یک کوئری برای کل درخواست
+    (روی خود request کش می‌شود تا همه CakeSerializer های تودرتو هم از آن استفاده کنند).
+    """
+    request = context.get('request')
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return frozenset()
+    ids = getattr(request, '_wishlisted_cake_ids', None)
+    if ids is None:
+        ids = frozenset(WishlistItem.objects.filter(user=user).values_list('product_id', flat=True))
+        request._wishlisted_cake_ids = ids
+    return ids
+
+
+def query_param_set(context, name):
+    """مقادیر جدا شده با کاما در پارامتر query (مثلاً ?fields=id,name) به صورت set."""
+    request = context.get('request') if context else None
+    if request is None:
+        return set()
+    raw = request.query_params.get(name, '')
+    return {part.strip() for part in raw.split(',') if part.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    پشتیبانی از ?fields=id,name (فقط همین فیلدها) و ?expand=images,... (افزودن فیلدهای expandable_fields).
+    فقط وقتی اعمال می‌شود که view در context مقدار sparse_fieldsets=True گذاشته باشد،
+    تا همین سریالایزر وقتی تودرتو در پاسخ‌های دیگر (مثلاً سفارش‌ها) استفاده می‌شود دست نخورد.
+    """
+    # نام فیلد -> تابعی که نمونه فیلد را می‌سازد
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get('sparse_fieldsets'):
+            return fields
+        for name in query_param_set(self.context, 'expand') & set(self.expandable_fields):
+            fields[name] = self.expandable_fields[name]()
+        requested = query_param_set(self.context, 'fields')
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+
+class CategoryMiniSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug']
+
+
+class CakeListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    نمایش سبک کیک برای کارت‌های کاتالوگ (لیست و محصولات پیشنهادی)؛
+    جزئیات کامل با CakeSerializer در صفحه محصول برگردانده می‌شود.
+    """
+    category = CategoryMiniSerializer(read_only=True)
+    is_wishlisted = serializers.SerializerMethodField()
+
+    expandable_fields = {
+        'description': lambda: serializers.CharField(read_only=True, allow_null=True),
+        'images': lambda: ProductImageSerializer(many=True, read_only=True),
+        'size_variants': lambda: CakeSizeVariantSerializer(many=True, read_only=True),
+        'available_flavors': lambda: FlavorSerializer(many=True, read_only=True),
+        'tags_details': lambda: TagSerializer(source='tags', many=True, read_only=True),
+    }
+    # ستون‌ها و prefetch هایی که هر فیلد expand شده لازم دارد (برای list_queryset)
+    EXPANSION_COLUMNS = {'description': ['description']}
+    EXPANSION_PREFETCHES = {
+        'images': 'images',
+        'size_variants': 'size_variants__size',
+        'available_flavors': 'available_flavors',
+        'tags_details': 'tags',
+    }
+
+    class Meta:
+        model = Cake
+        fields = [
+            'id', 'name', 'slug', 'short_description', 'image', 'category',
+            'base_price', 'price_type', 'sale_price', 'is_featured',
+            'average_rating', 'review_count', 'is_wishlisted',
+        ]
+        read_only_fields = fields
+
+    @classmethod
+    def list_queryset(cls, queryset, context):
+        """
+        queryset را فقط با ستون‌های لازم این سریالایزر (.only) و prefetch فیلدهای expand شده بارگذاری می‌کند.
+        """
+        expansions = query_param_set(context, 'expand')
+        columns = [name for name in cls.Meta.fields if name not in ('category', 'is_wishlisted')]
+        columns += ['category__id', 'category__name', 'category__slug']
+        for name in expansions:
+            columns += cls.EXPANSION_COLUMNS.get(name, [])
+        prefetches = [cls.EXPANSION_PREFETCHES[name] for name in expansions if name in cls.EXPANSION_PREFETCHES]
+        return queryset.select_related('category').only(*columns).prefetch_related(*prefetches)
+
+    def get_is_wishlisted(self, obj: Cake) -> bool:
+        return obj.pk in wishlisted_cake_ids(self.context)
+
+
+class CakeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # --- بخش خواندنی (برای پاسخ GET) ---
     category = CategorySerializer(read_only=True)
     available_flavors = FlavorSerializer(many=True, read_only=True)
@@ -194,10 +296,7 @@ class CakeSerializer(serializers.ModelSerializer):
         """
         بررسی می‌کند که آیا کاربر فعلی این محصول را به علاقه‌مندی‌ها اضافه کرده است یا خیر.
         """
-        user = self.context.get('request').user
-        if user and user.is_authenticated:
-            return WishlistItem.objects.filter(user=user, product=obj).exists()
-        return False
+        return obj.pk in wishlisted_cake_ids(self.context)
     @transaction.atomic
     def create(self, validated_data):
         # جدا کردن تمام داده‌های روابط چند-به-چند و پیچیده
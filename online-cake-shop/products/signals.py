@@ -0,0 +1,75 @@
+# products/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog_cache import bump_catalog_version
+from .models import (
+    Addon, Cake, CakeSizeVariant, Category, Color, Flavor, PartySupply, ProductImage, Size, SupplyType, Tag, Theme,
+)
+from .search import update_cake_search_index
+
+
+@receiver(post_save, sender=Cake)
+def refresh_cake_search_index(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    update_cake_search_index([instance.pk])
+
+
+@receiver(m2m_changed, sender=Cake.tags.through)
+def refresh_search_index_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # بعد از clear دیگر نمی‌دانیم کدام کیک‌ها این تگ را داشتند
+        instance._search_cake_ids = list(instance.cakes.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # از سمت تگ (tag.cakes.add(...))
+        cake_ids = pk_set if action != 'post_clear' else getattr(instance, '_search_cake_ids', [])
+    else:
+        cake_ids = [instance.pk]
+    update_cake_search_index(cake_ids)
+
+
+@receiver(post_save, sender=Category)
+def refresh_search_index_on_category_change(sender, instance, created, raw, **kwargs):
+    if raw or created:
+        return
+    update_cake_search_index(instance.cakes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+def refresh_search_index_on_tag_rename(sender, instance, created, raw, **kwargs):
+    if raw or created:
+        return
+    update_cake_search_index(instance.cakes.values_list('pk', flat=True))
+
+
+# --- نسخه کاتالوگ برای کش پاسخ‌ها (products/catalog_cache.py) ---
+
+CATALOG_MODELS = (Cake, Category, Flavor, Size, Addon, PartySupply, Tag, Color, Theme, SupplyType)
+# تغییر این مدل‌ها در پاسخ کیک دیده می‌شود، پس نسخه Cake را بالا می‌برد
+CAKE_PART_MODELS = (CakeSizeVariant, ProductImage)
+
+
+def bump_catalog_on_change(sender, raw=False, **kwargs):
+    if raw:
+        return
+    bump_catalog_version(Cake if sender in CAKE_PART_MODELS else sender)
+
+
+def bump_catalog_on_m2m_change(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog_version(type(instance))
+
+
+for model in CATALOG_MODELS + CAKE_PART_MODELS:
+    post_save.connect(bump_catalog_on_change, sender=model, dispatch_uid=f'catalog_save_{model._meta.label_lower}')
+    post_delete.connect(bump_catalog_on_change, sender=model, dispatch_uid=f'catalog_delete_{model._meta.label_lower}')
+
+for through in (
+    Cake.tags.through, Cake.available_flavors.through, Cake.available_sizes.through,
+    PartySupply.colors.through, PartySupply.themes.through,
+):
+    m2m_changed.connect(bump_catalog_on_m2m_change, sender=through, dispatch_uid=f'catalog_m2m_{through._meta.label_lower}')
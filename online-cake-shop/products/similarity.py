@@ -0,0 +1,182 @@
+# products/similarity.py
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import Count
+
+from orders.models import OrderItem
+from orders.sales_rollups import SALES_STATUSES
+from .models import Cake, CakeSimilarity, CakeSimilarityRefresh
+
+# تعداد کیک‌های مشابهی که برای هر کیک نگه داشته می‌شود
+SIMILAR_CAKES_PER_CAKE = getattr(settings, 'SIMILAR_CAKES_PER_CAKE', 12)
+
+# وزن هر سیگنال در امتیاز شباهت (هر سیگنال خودش عددی بین ۰ و ۱ است)
+SIMILARITY_WEIGHTS = {
+    'co_purchase': 3.0, # با هم خریده شدن (cosine روی تعداد سفارش‌ها)
+    'tags': 1.0,        # Jaccard تگ‌ها
+    'flavors': 0.5,     # Jaccard طعم‌های قابل انتخاب
+    'category': 1.0,    # دسته‌بندی یکسان
+}
+
+
+def _jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _paid_cake_items():
+    """آیتم‌های کیک در سفارش‌هایی که فروش قطعی حساب می‌شوند."""
+    return OrderItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Cake),
+        order__status__in=SALES_STATUSES,
+        order__is_deleted=False,
+    )
+
+
+def _cake_features():
+    """دسته‌بندی، تگ‌ها و طعم‌های همه کیک‌های فعال (با سه کوئری)."""
+    categories = dict(Cake.objects.filter(is_active=True).values_list('pk', 'category_id'))
+    tags, flavors = defaultdict(set), defaultdict(set)
+    for cake_id, tag_id in Cake.tags.through.objects.filter(cake_id__in=categories).values_list('cake_id', 'tag_id'):
+        tags[cake_id].add(tag_id)
+    for cake_id, flavor_id in Cake.available_flavors.through.objects.filter(
+        cake_id__in=categories
+    ).values_list('cake_id', 'flavor_id'):
+        flavors[cake_id].add(flavor_id)
+    return categories, tags, flavors
+
+
+def _co_purchases(cake_ids):
+    """
+    (تعداد سفارش‌های مشترک هر جفت، تعداد سفارش‌های هر کیک).
+    جفت‌ها فقط از سبدهایی خوانده می‌شوند که یکی از cake_ids در آن‌ها هست (None یعنی همه سفارش‌ها)؛
+    تعداد سفارش‌ها هم فقط برای کیک‌های همین سبدها (کیک‌های هدف و هم‌خریدهایشان) شمرده می‌شود،
+    که برای نرمال‌سازی cosine کافی است و نیازی به اسکن کل تاریخچه فروش ندارد.
+    """
+    items = _paid_cake_items()
+    if cake_ids is not None:
+        items = items.filter(order__in=_paid_cake_items().filter(object_id__in=cake_ids).values('order_id'))
+
+    baskets = defaultdict(set)
+    for order_id, cake_id in items.values_list('order_id', 'object_id').iterator(chunk_size=2000):
+        baskets[order_id].add(cake_id)
+
+    counted = _paid_cake_items()
+    if cake_ids is not None:
+        involved = set(cake_ids).union(*baskets.values())
+        if not involved:
+            return defaultdict(Counter), {}
+        counted = counted.filter(object_id__in=involved)
+    order_counts = dict(
+        counted.values('object_id').annotate(orders=Count('order_id', distinct=True)).values_list('object_id', 'orders')
+    )
+
+    pairs = defaultdict(Counter)
+    for basket in baskets.values():
+        for first, second in combinations(basket, 2):
+            pairs[first][second] += 1
+            pairs[second][first] += 1
+    return pairs, order_counts
+
+
+def compute_similarities(cake_ids=None, top_n=SIMILAR_CAKES_PER_CAKE):
+    """
+    {cake_id: [(similar_id, score), ...]} برای کیک‌های فعال cake_ids (یا همه)، به ترتیب نزولی امتیاز.
+    فقط کیک‌های فعال و با امتیاز مثبت پیشنهاد می‌شوند.
+    """
+    categories, tags, flavors = _cake_features()
+    targets = list(categories) if cake_ids is None else [pk for pk in cake_ids if pk in categories]
+    pairs, order_counts = _co_purchases(None if cake_ids is None else targets)
+
+    result = {}
+    for cake_id in targets:
+        scored = []
+        for other_id, category_id in categories.items():
+            if other_id == cake_id:
+                continue
+            score = 0.0
+            together = pairs[cake_id].get(other_id)
+            if together:
+                score += SIMILARITY_WEIGHTS['co_purchase'] * together / math.sqrt(
+                    order_counts[cake_id] * order_counts[other_id]
+                )
+            score += SIMILARITY_WEIGHTS['tags'] * _jaccard(tags[cake_id], tags[other_id])
+            score += SIMILARITY_WEIGHTS['flavors'] * _jaccard(flavors[cake_id], flavors[other_id])
+            if category_id is not None and category_id == categories[cake_id]:
+                score += SIMILARITY_WEIGHTS['category']
+            if score > 0:
+                scored.append((score, other_id))
+        # امتیاز برابر: کیک جدیدتر (شناسه بزرگ‌تر) اول
+        result[cake_id] = [(other_id, score) for score, other_id in heapq.nlargest(top_n, scored)]
+    return result
+
+
+def rebuild_cake_similarities(cake_ids=None, top_n=SIMILAR_CAKES_PER_CAKE):
+    """
+    ردیف‌های CakeSimilarity کیک‌های cake_ids (یا کل جدول) را پاک کرده و از نو می‌سازد.
+    کیک‌های غیرفعال فقط پاک می‌شوند. تعداد ردیف‌های ساخته شده را برمی‌گرداند.
+    """
+    if cake_ids is not None:
+        cake_ids = set(cake_ids)
+        if not cake_ids:
+            return 0
+    similarities = compute_similarities(cake_ids, top_n)
+    rows = [
+        CakeSimilarity(cake_id=cake_id, similar_id=similar_id, score=score, rank=rank)
+        for cake_id, similar in similarities.items()
+        for rank, (similar_id, score) in enumerate(similar, start=1)
+    ]
+    with transaction.atomic():
+        existing = CakeSimilarity.objects.all()
+        if cake_ids is not None:
+            existing = existing.filter(cake_id__in=cake_ids)
+        existing.delete()
+        CakeSimilarity.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def schedule_similarity_refresh(order_ids):
+    """
+    کیک‌های داخل سفارش‌های تازه پرداخت شده را در صف CakeSimilarityRefresh می‌گذارد (در همان تراکنش پرداخت،
+    پس با rollback آن حذف می‌شوند). خود محاسبه در run_similarity_worker و خارج از درخواست انجام می‌شود:
+    خرید مشترک جدید فقط بین همین کیک‌ها اضافه شده است. تغییر جزئی نرمال‌سازی برای بقیه کیک‌ها و
+    تغییر تگ/طعم/دسته‌بندی با اجرای دوره‌ای rebuild_cake_similarities اعمال می‌شود.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    cake_ids = set(
+        OrderItem.objects.filter(
+            order_id__in=order_ids, content_type=ContentType.objects.get_for_model(Cake)
+        ).values_list('object_id', flat=True)
+    )
+    # کیکی که از قبل در صف است دوباره اضافه نمی‌شود
+    CakeSimilarityRefresh.objects.bulk_create(
+        [CakeSimilarityRefresh(cake_id=cake_id) for cake_id in cake_ids], ignore_conflicts=True
+    )
+    return len(cake_ids)
+
+
+def process_similarity_queue(limit=200, top_n=SIMILAR_CAKES_PER_CAKE):
+    """
+    حداکثر limit کیک از صف برمی‌دارد و مشابه‌هایشان را (با یک بار خواندن ویژگی‌ها برای کل دسته) دوباره می‌سازد.
+    برداشتن از صف و بازسازی در یک تراکنش است: اگر بازسازی خطا بدهد ردیف‌ها در صف می‌مانند.
+    روی PostgreSQL با SKIP LOCKED چند worker هم‌زمان کیک تکراری برنمی‌دارند.
+    تعداد کیک‌های پردازش شده را برمی‌گرداند.
+    """
+    with transaction.atomic():
+        queued = CakeSimilarityRefresh.objects.order_by('queued_at')
+        if connection.features.has_select_for_update_skip_locked:
+            queued = queued.select_for_update(skip_locked=True)
+        cake_ids = list(queued.values_list('cake_id', flat=True)[:limit])
+        if cake_ids:
+            CakeSimilarityRefresh.objects.filter(cake_id__in=cake_ids).delete()
+            rebuild_cake_similarities(cake_ids, top_n)
+    return len(cake_ids)
@@ -1,3 +1,38 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .catalog_cache import catalog_version
+from .models import CatalogVersion, Category, Flavor
+
+
+class CatalogVersionTests(TestCase):
+    """نسخه کاتالوگ در دیتابیس است، پس ETag و کش پاسخ‌ها در همه پروسه‌ها با تغییر داده عوض می‌شوند."""
+
+    URL = '/api/v1/products/categories/'
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_version_is_bumped_in_database(self):
+        self.assertEqual(catalog_version(Category, Flavor), '0.0')
+        Category.objects.create(name='Birthday', slug='birthday')
+        Category.objects.create(name='Wedding', slug='wedding')
+        self.assertEqual(catalog_version(Category, Flavor), '2.0')
+        self.assertEqual(CatalogVersion.objects.get(pk='products.category').version, 2)
+
+    def test_etag_changes_after_catalog_change(self):
+        first = self.client.get(self.URL)
+        self.assertEqual(first['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.URL)['X-Catalog-Cache'], 'HIT')
+
+        # کش محلی پروسه دیگر خالی است ولی همان نسخه را از دیتابیس می‌خواند
+        cache.clear()
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        Category.objects.create(name='Birthday', slug='birthday')
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 1)
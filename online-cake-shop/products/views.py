@@ -13,6 +13,7 @@ from .serializers import (PartySupplySerializer,
     FlavorSerializer,
     SizeSerializer,
     CakeSerializer,
+    CakeListSerializer,
     AddonSerializer,
     ReviewSerializer,
     TagSerializer, TagFindOrCreateSerializer,WishlistItemSerializer,SupplyTypeSerializer, ColorSerializer, ThemeSerializer
@@ -25,15 +26,22 @@ from django.db.models import Sum
 from django.contrib.contenttypes.models import ContentType
 
 # مدل‌های لازم را از اپلیکیشن orders ایمپورت کنید
-from orders.models import Order, OrderItem
+from orders.models import DailyProductSales
+from orders.sales_rollups import has_period_params, resolve_sales_period
+from orders.pagination import CreatedAtKeysetPagination
+from .search import CakeSearchFilter
+from .catalog_cache import CatalogCacheMixin, bump_catalog_version
+from .conditional import make_etag
+from .serializers import wishlisted_cake_ids
 from .models import Cake
 # سریالایزر مناسب برای نمایش محصول را ایمپورت کنید
 from .serializers import ProductMiniSerializer # یا هر سریالایزر دیگری که دارید
 
-class PartySupplyViewSet(viewsets.ReadOnlyModelViewSet):
+class PartySupplyViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     لیست لوازم جشن را با قابلیت فیلتر بر اساس نوع، رنگ و تم نمایش می‌دهد.
     """
+    catalog_models = (PartySupply, SupplyType, Color, Theme)
     queryset = PartySupply.objects.filter(is_active=True)
     serializer_class = PartySupplySerializer
     filter_backends = [DjangoFilterBackend] # فعال‌سازی فیلتر
@@ -46,13 +54,18 @@ class PartySupplyViewSet(viewsets.ReadOnlyModelViewSet):
         
     }
     permission_classes = [permissions.AllowAny]
-class SupplyFilterOptionsView(APIView):
+class SupplyFilterOptionsView(CatalogCacheMixin, APIView):
     """
     لیست تمام گزینه‌های موجود برای فیلتر کردن لوازم جشن را برمی‌گرداند.
     """
     permission_classes = [permissions.AllowAny] # برای کاربران مهمان هم قابل مشاهده است
 
+    catalog_models = (SupplyType, Color, Theme)
+
     def get(self, request, *args, **kwargs):
+        return self.catalog_response(request, self.build_response)
+
+    def build_response(self):
         types = SupplyType.objects.all()
         colors = Color.objects.all()
         themes = Theme.objects.all()
@@ -117,26 +130,25 @@ class TopSellingProductsView(APIView):
         except ContentType.DoesNotExist:
             return Response({"error": "Content type for Cake not found."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # ۳. وضعیت‌هایی که نشانه فروش قطعی هستند را مشخص کنید
-        successful_statuses = [
-            Order.OrderStatusChoices.PROCESSING,
-            Order.OrderStatusChoices.SHIPPED,
-            Order.OrderStatusChoices.DELIVERED,
-        ]
-
-        # ۴. آیتم‌های سفارش فروخته شده که از نوع کیک هستند را پیدا کرده،
-        # بر اساس شناسه محصول گروه‌بندی کرده و جمع تعداد فروش را محاسبه کنید.
-        top_products_query = OrderItem.objects.filter(
-            content_type=cake_content_type,
-            order__status__in=successful_statuses
-        ).values(
+        # ۳. فروش از جدول rollup روزانه خوانده می‌شود (orders/sales_rollups.py)؛
+        # بدون پارامتر بازه، کل تاریخچه و با ?period / ?jalali_month / ?start_date&end_date فقط همان بازه
+        sales_rows = DailyProductSales.objects.filter(content_type=cake_content_type)
+        if has_period_params(request.query_params):
+            try:
+                start_date, end_date = resolve_sales_period(request.query_params)
+            except ValueError as e:
+                return Response({"error": f"بازه زمانی نامعتبر است: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+            sales_rows = sales_rows.filter(date__gte=start_date, date__lte=end_date)
+
+        # ۴. جمع تعداد فروش هر کیک در بازه
+        top_products_query = sales_rows.values(
             'object_id' # object_id همان شناسه کیک (cake.id) است
         ).annotate(
-            total_sold=Sum('quantity') # جمع تعداد فروش هر محصول
-        ).order_by('-total_sold')
+            total_sold=Sum('quantity_sold') # جمع تعداد فروش هر محصول
+        ).filter(total_sold__gt=0).order_by('-total_sold')
 
         # ۵. نتایج را بر اساس limit محدود کنید
-        top_products_data = top_products_query[:limit]
+        top_products_data = list(top_products_query[:limit])
 
         # ۶. آبجکت‌های کامل کیک را بر اساس ID های پرفروش استخراج کنید
         top_product_ids = [item['object_id'] for item in top_products_data]
@@ -163,6 +175,7 @@ class ReviewListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = ReviewSerializer
     # دسترسی: همه می‌توانند لیست را ببینند (GET)، فقط کاربران لاگین کرده می‌توانند نظر ثبت کنند (POST)
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtKeysetPagination
 
     def get_product(self):
         """Helper method to get the cake object based on URL kwargs."""
@@ -208,38 +221,42 @@ class ReviewListCreateAPIView(generics.ListCreateAPIView):
         cake.save(update_fields=['average_rating', 'review_count']) # فقط همین فیلدها آپدیت شوند
 
 # ViewSet برای Category (فقط خواندنی)
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows categories to be viewed.
     """
+    catalog_models = (Category,)
     queryset = Category.objects.all().order_by('name') # تمام دسته‌بندی‌ها، مرتب شده بر اساس نام
     serializer_class = CategorySerializer
     lookup_field = 'slug' # <--- این خط رو اضافه کنید
     permission_classes = [permissions.IsAuthenticatedOrReadOnly] # دسترسی برای همه (پیش‌فرض DRF هم معمولا همینه)
 
 # ViewSet برای Flavor (فقط خواندنی)
-class FlavorViewSet(viewsets.ReadOnlyModelViewSet):
+class FlavorViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows flavors to be viewed.
     """
+    catalog_models = (Flavor,)
     queryset = Flavor.objects.all().order_by('name')
     serializer_class = FlavorSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 # ViewSet برای Size (فقط خواندنی)
-class SizeViewSet(viewsets.ReadOnlyModelViewSet):
+class SizeViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows sizes to be viewed.
     """
+    catalog_models = (Size,)
     queryset = Size.objects.all().order_by('name')
     serializer_class = SizeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 # ViewSet برای Addon (فقط خواندنی)
-class AddonViewSet(viewsets.ReadOnlyModelViewSet):
+class AddonViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows addons to be viewed.
     """
+    catalog_models = (Addon,)
     # فقط افزودنی‌های فعال رو نمایش بده
     queryset = Addon.objects.filter(is_active=True).order_by('name')
     serializer_class = AddonSerializer
@@ -255,7 +272,10 @@ class StandardResultsSetPagination(PageNumberPagination):
 
 # ViewSet برای Cake (فقط خواندنی)
 from .filters import CakeFilter
-class CakeViewSet(viewsets.ReadOnlyModelViewSet):
+
+SUGGESTED_PRODUCTS_COUNT = 4 # تعداد محصولات پیشنهادی در صفحه محصول
+
+class CakeViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows cakes to be viewed.
     Supports filtering by category_id.
@@ -266,7 +286,9 @@ class CakeViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     pagination_class = StandardResultsSetPagination
     
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # CakeSearchFilter روی PostgreSQL جستجوی متنی/trigram با مرتب‌سازی بر اساس ارتباط است
+    # و روی SQLite همان SearchFilter روی search_fields
+    filter_backends = [DjangoFilterBackend, CakeSearchFilter, filters.OrderingFilter]
     
     # --- ۲. به جای filterset_fields از filterset_class استفاده کنید ---
     filterset_class = CakeFilter
@@ -274,9 +296,45 @@ class CakeViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['name', 'description', 'category__name']
     ordering_fields = ['created_at', 'base_price', 'average_rating']
     lookup_field = 'slug'
+
+    # پاسخ لیست و جزئیات بین همه کاربران کش می‌شود؛ is_wishlisted در overlay_user_fields اعمال می‌شود
+    catalog_models = (Cake, Category, Flavor, Size, Tag)
+
+    def get_conditional_validators(self, request, state=None):
+        etag, last_modified = super().get_conditional_validators(request, state)
+        if request.user.is_authenticated:
+            # is_wishlisted به کاربر وابسته است؛ Last-Modified آن را نشان نمی‌دهد پس فقط ETag
+            return make_etag(etag, sorted(wishlisted_cake_ids({'request': request}))), None
+        return etag, last_modified
+
+    def overlay_user_fields(self, request, data):
+        wishlisted = wishlisted_cake_ids({'request': request})
+        items = data.get('results', [data]) if isinstance(data, dict) else data
+        for item in items:
+            if 'is_wishlisted' in item:
+                item['is_wishlisted'] = item['id'] in wishlisted
+        return data
     
+    def get_serializer_class(self):
+        # لیست و محصولات پیشنهادی فقط داده کارت محصول را لازم دارند
+        if self.action in ('list', 'suggested_products'):
+            return CakeListSerializer
+        return CakeSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sparse_fieldsets'] = True # ?fields= و ?expand= (SparseFieldsetMixin)
+        return context
+
     def get_queryset(self):
-        return Cake.objects.filter(is_active=True).select_related('category').prefetch_related('available_flavors')
+        queryset = Cake.objects.filter(is_active=True)
+        if self.action == 'list':
+            return CakeListSerializer.list_queryset(queryset, self.get_serializer_context())
+        if self.action == 'retrieve':
+            return queryset.select_related('category').prefetch_related(
+                'available_flavors', 'images', 'size_variants__size', 'tags'
+            )
+        return queryset.select_related('category')
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def add_to_wishlist(self, request, slug=None): # <--- اصلاح از pk به slug
         """
@@ -330,7 +388,8 @@ class CakeViewSet(viewsets.ReadOnlyModelViewSet):
     def suggested_products(self, request, slug=None): # slug از lookup_field می‌آید
         """
         محصولات پیشنهادی برای یک محصول خاص را برمی‌گرداند.
-        در حال حاضر، محصولاتی از همان دسته‌بندی (به جز خود محصول) را پیشنهاد می‌دهد.
+        از شاخص از پیش محاسبه شده CakeSimilarity (products/similarity.py) با یک lookup روی (cake, rank)
+        خوانده می‌شود؛ اگر برای این محصول هنوز ساخته نشده باشد، جدیدترین‌های همان دسته‌بندی.
         """
         try:
             # get_object از lookup_field (یعنی slug) برای پیدا کردن محصول فعلی استفاده می‌کند
@@ -338,21 +397,16 @@ class CakeViewSet(viewsets.ReadOnlyModelViewSet):
         except Cake.DoesNotExist: # یا Http404 اگر get_object آن را raise کند
             return Response({"detail": "محصول یافت نشد."}, status=status.HTTP_404_NOT_FOUND)
 
-        if not current_product.category:
-            # اگر محصول دسته‌بندی ندارد یا دسته‌بندی آن null است، لیست خالی برگردان
-            return Response([], status=status.HTTP_200_OK)
-
-        # محصولات دیگر از همان دسته‌بندی، که فعال هستند، به جز محصول فعلی
-        # می‌توانید برای تنوع بیشتر از order_by('?') استفاده کنید یا بر اساس تاریخ ایجاد و ...
-        # مثلاً ۴ محصول پیشنهادی
-        suggested_cakes = Cake.objects.filter(
-            category=current_product.category,
-            is_active=True
-        ).exclude(pk=current_product.pk).order_by('-created_at')[:4] # جدیدترین‌ها از همان دسته
+        context = self.get_serializer_context()
+        suggested_cakes = list(CakeListSerializer.list_queryset(
+            Cake.objects.filter(is_active=True, suggested_in__cake=current_product), context,
+        ).order_by('suggested_in__rank')[:SUGGESTED_PRODUCTS_COUNT])
 
-        # اگر تعداد محصولات پیشنهادی در همان دسته کم بود، می‌توانید منطق بیشتری اضافه کنید
-        # مثلاً اگر suggested_cakes.count() < 4 بود، چند محصول تصادفی دیگر از دسته‌های دیگر اضافه کنید.
-        # اما برای شروع، همین کافی است.
+        if not suggested_cakes and current_product.category_id:
+            # کیک جدیدی که هنوز در شاخص نیست: جدیدترین‌ها از همان دسته
+            suggested_cakes = CakeListSerializer.list_queryset(
+                Cake.objects.filter(category_id=current_product.category_id, is_active=True), context,
+            ).exclude(pk=current_product.pk).order_by('-created_at')[:SUGGESTED_PRODUCTS_COUNT]
 
         # از همان سریالایزر ViewSet برای سریالایز کردن محصولات پیشنهادی استفاده می‌کنیم
         serializer = self.get_serializer(suggested_cakes, many=True)
@@ -448,6 +502,7 @@ class AdminCakeViewSet(viewsets.ModelViewSet):
         with transaction.atomic():
             queryset = Cake.objects.filter(id__in=valid_ids)
             updated_count = queryset.update(is_active=new_is_active_status)
+            bump_catalog_version(Cake) # update() سیگنال save ندارد
 
         if updated_count > 0:
             status_text = "فعال" if new_is_active_status else "غیرفعال"